@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+from typing import Optional, Tuple
+
+import duckdb
+import pandas as pd
+
+from database import SummaryDatabase, SUMMARY_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Fixed Parquet column types, so a batch where a column is all NULL does not
+# write a part whose inferred type differs from the others
+PARQUET_TYPES = {
+    "id": "BIGINT",
+    "url": "VARCHAR",
+    "title": "VARCHAR",
+    "summary_text": "VARCHAR",
+    "summary_length": "VARCHAR",
+    "summary_tone": "VARCHAR",
+    "model_used": "VARCHAR",
+    "created_at": "TIMESTAMP",
+    "word_count": "INTEGER",
+    "video_duration": "VARCHAR",
+    "video_channel": "VARCHAR",
+}
+PARQUET_COLUMNS = ", ".join(f"CAST({field} AS {PARQUET_TYPES[field]}) AS {field}" for field in SUMMARY_FIELDS)
+
+class AnalyticsExporter:
+    """Incremental columnar (Parquet) export of the summaries table with DuckDB views on top"""
+
+    WATERMARK_FILE = "_watermark.json"
+
+    def __init__(self, db: Optional[SummaryDatabase] = None, export_dir: str = os.path.join("exports", "parquet")):
+        self.db = db or SummaryDatabase()
+        self.export_dir = export_dir
+
+    def get_watermark(self) -> int:
+        """Highest summary id already exported (0 if nothing has been exported yet)"""
+        try:
+            with open(os.path.join(self.export_dir, self.WATERMARK_FILE), encoding='utf-8') as f:
+                return int(json.load(f).get("last_id", 0))
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.error("Error reading export watermark, exporting everything: %s", e)
+            return 0
+
+    def _set_watermark(self, last_id: int) -> None:
+        path = os.path.join(self.export_dir, self.WATERMARK_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"last_id": last_id}, f)
+        os.replace(path + ".tmp", path)
+
+    def export_parquet(self, batch_size: int = 50000) -> Tuple[bool, int]:
+        """Append rows newer than the watermark as new Parquet part files.
+
+        Returns (success, number of rows exported).
+        """
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            last_id = self.get_watermark()
+            exported = 0
+            con = duckdb.connect()
+            for rows in self.db.iter_summary_batches_after(last_id, batch_size):
+                batch_df = pd.DataFrame(rows, columns=SUMMARY_FIELDS)
+                first_id, batch_last_id = int(batch_df["id"].iloc[0]), int(batch_df["id"].iloc[-1])
+                part_path = os.path.join(self.export_dir, f"summaries_{first_id:010d}_{batch_last_id:010d}.parquet")
+                con.register("batch_df", batch_df)
+                # COPY takes no bound parameters for its target, so quote the path as a literal
+                target = part_path.replace("'", "''")
+                con.execute(f'''
+                    COPY (SELECT {PARQUET_COLUMNS} FROM batch_df)
+                    TO '{target}' (FORMAT PARQUET, COMPRESSION ZSTD)
+                ''')
+                con.unregister("batch_df")
+                # Advance the watermark per part so an interrupted export resumes cleanly
+                self._set_watermark(batch_last_id)
+                exported += len(rows)
+            con.close()
+            return True, exported
+        except Exception as e:
+            logger.error("Error exporting Parquet: %s", e)
+            return False, 0
+
+    def connect(self, duckdb_path: str = ":memory:", attach_sqlite: bool = False):
+        """Open a DuckDB connection with a `summaries` view over the Parquet export.
+
+        With attach_sqlite=True the live summaries.db is also attached read-only
+        and exposed as the `live_summaries` view (requires DuckDB's sqlite extension).
+        summary_text is left out of that view since it is stored compressed; the
+        Parquet export has it in plain text.
+        """
+        con = duckdb.connect(duckdb_path)
+        pattern = os.path.join(self.export_dir, "*.parquet").replace("'", "''")
+        con.execute(f"CREATE OR REPLACE VIEW summaries AS SELECT * FROM read_parquet('{pattern}', union_by_name = true)")
+        if attach_sqlite:
+            con.execute("INSTALL sqlite")
+            con.execute("LOAD sqlite")
+            db_path = self.db.db_path.replace("'", "''")
+            con.execute(f"ATTACH '{db_path}' AS live (TYPE SQLITE, READ_ONLY)")
+            con.execute("CREATE OR REPLACE VIEW live_summaries AS SELECT * EXCLUDE (summary_text) FROM live.summaries")
+        return con
+
+    def summaries_per_channel(self) -> pd.DataFrame:
+        """Summary counts and average word count per channel"""
+        return self._query('''
+            SELECT coalesce(video_channel, '(web page)') AS channel,
+                   count(*) AS summaries, round(avg(word_count), 1) AS avg_words
+            FROM summaries GROUP BY 1 ORDER BY summaries DESC
+        ''')
+
+    def summaries_per_model(self) -> pd.DataFrame:
+        """Summary counts and average word count per model"""
+        return self._query('''
+            SELECT model_used AS model, count(*) AS summaries, round(avg(word_count), 1) AS avg_words
+            FROM summaries GROUP BY 1 ORDER BY summaries DESC
+        ''')
+
+    def word_count_distribution(self, bucket_size: int = 50) -> pd.DataFrame:
+        """Histogram of summary word counts in buckets of bucket_size words"""
+        return self._query(f'''
+            SELECT (word_count // {int(bucket_size)}) * {int(bucket_size)} AS words, count(*) AS summaries
+            FROM summaries GROUP BY 1 ORDER BY 1
+        ''')
+
+    def _query(self, sql: str) -> pd.DataFrame:
+        con = self.connect()
+        try:
+            return con.execute(sql).df()
+        finally:
+            con.close()
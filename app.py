@@ -1,45 +1,221 @@
-import validators,streamlit as st
-import re
-from urllib.parse import urlparse
-from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain.chains.summarize import load_summarize_chain
-from langchain_community.document_loaders import YoutubeLoader,UnstructuredURLLoader
-from langchain_huggingface import HuggingFaceEndpoint
+import uuid
+import streamlit as st
 from database import SummaryDatabase, ExportManager
+from cache import SummaryCache, extract_video_id, make_cache_key
+from pipeline import (DEFAULT_REPO_ID, LENGTH_CATEGORIES, LOCAL_BACKENDS, validate_and_fix_url,
+                      validate_word_count, build_prompt_template, build_prompt,
+                      load_documents, preprocess_documents, extract_metadata, find_reusable_summary,
+                      intermediate_cache_key, summarize_url_lengths)
+from segments import format_segment_summaries, parse_time_range, summarize_segments
+from tracing import STAGE_BUCKETS, Trace, start_metrics_server
 import os
-from datetime import datetime
 
+# LangChain, loaders, the LLM router and the job queue are imported lazily inside
+# the cached factories below, so the first page load does not pay for them.
 
-def is_youtube_url(url):
-    """Check if URL is a YouTube URL (youtube.com or youtu.be)"""
-    youtube_patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/',
-        r'(?:https?://)?(?:www\.)?youtu\.be/'
-    ]
-    return any(re.search(pattern, url, re.IGNORECASE) for pattern in youtube_patterns)
+SUMMARIZER_BACKENDS = {
+    "Remote LLM (Hugging Face / Groq)": DEFAULT_REPO_ID,
+    "Local extractive (CPU, offline)": "local/extractive",
+    "Local distilbart (CPU, offline)": "local/distilbart",
+}
 
 
-def validate_and_fix_url(url):
-    """Validate URL and provide helpful suggestions"""
-    if not url.strip():
-        return None, "Please enter a URL"
-    
-    # Check if URL has a scheme
-    parsed = urlparse(url)
-    if not parsed.scheme:
-        # Try adding https://
-        fixed_url = f"https://{url}"
-        if validators.url(fixed_url):
-            return fixed_url, f"Missing protocol. Did you mean: {fixed_url}?"
-        else:
-            return None, "Please include the protocol (http:// or https://) in your URL"
+@st.cache_resource
+def get_database():
+    """Process-wide database handle; each script thread reuses one pooled connection"""
+    return SummaryDatabase()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Serve Prometheus metrics on $METRICS_PORT (once per process), if set"""
+    port = os.getenv("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+
+@st.cache_resource
+def get_document_store():
+    """Process-wide store of loaded transcripts and pages"""
+    from document_store import DocumentStore
+    return DocumentStore(get_database())
+
+
+@st.cache_resource
+def get_summary_cache():
+    """Process-wide summary cache shared across reruns and sessions"""
+    return SummaryCache(get_database())
+
+
+@st.cache_resource
+def get_semantic_index():
+    """Process-wide embedding index over summaries and transcripts"""
+    from semantic_index import SemanticIndex
+    return SemanticIndex(get_database().db_path)
+
+
+@st.cache_resource
+def get_llm_router(hf_api_key, groq_api_key, repo_id):
+    """Router over the configured providers; cached so latency stats survive reruns"""
+    from llm_router import build_router
+    # Hedge only when there is a second provider to hedge to
+    hedge_after = 8.0 if hf_api_key.strip() and groq_api_key.strip() else None
+    return build_router(hf_api_key, repo_id, groq_api_key, hedge_after=hedge_after)
+
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide background job queue (one per process)"""
+    from jobs import JobQueue
+    return JobQueue(get_database(), cache=get_summary_cache(), store=get_document_store(),
+                    index=get_semantic_index())
+
+
+@st.cache_resource
+def get_prompt(word_count):
+    """Summary PromptTemplate for a target word count"""
+    return build_prompt(word_count)
+
+
+def get_summarizer(hf_api_key, groq_api_key, repo_id, word_count):
+    """Chunked summarizer bound to the router, prompt and generation budget for these parameters.
+
+    Built per run (the router and tokenizer are cached), so a tokenizer that
+    failed to load is retried with the sidebar's Hugging Face token.
+    """
+    from generation_budget import budget_for_model
+    from summarizer import ChunkedSummarizer
+    return ChunkedSummarizer(get_llm_router(hf_api_key, groq_api_key, repo_id), get_prompt(word_count),
+                             word_count=word_count, budget=budget_for_model(repo_id, hf_api_key))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_trace_aggregates():
+    """Sorted per-stage latencies and summed counters of the 200 most recent traces.
+
+    Cached for a minute so reruns do not reload and re-parse the traces.
+    """
+    traces = get_database().get_recent_traces(200)
+    stages, counters = {}, {}
+    budgeted_output_tokens = budgeted_max_new_tokens = 0
+    for trace in traces:
+        for stage, seconds in dict(trace["stages"], total=trace["total_seconds"]).items():
+            stages.setdefault(stage, []).append(seconds)
+        for name, value in trace["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+        if trace["counters"].get("max_new_tokens"):
+            budgeted_output_tokens += trace["counters"].get("output_tokens", 0)
+            budgeted_max_new_tokens += trace["counters"]["max_new_tokens"]
+    for samples in stages.values():
+        samples.sort()
+    return {
+        "traces": len(traces),
+        "stages": stages,
+        "counters": counters,
+        "db_seconds": sum(query["seconds"] for trace in traces for query in trace["db"].values()),
+        "budgeted_output_tokens": budgeted_output_tokens,
+        "budgeted_max_new_tokens": budgeted_max_new_tokens,
+    }
+
+
+def display_performance_panel():
+    """Stage latency percentiles and histograms from the traces of recent summaries"""
+    import altair as alt
+    import pandas as pd
+
+    aggregates = get_trace_aggregates()
+    traces = aggregates["traces"]
+    if not traces:
+        st.caption("No traced summaries yet")
+        return
+    stages = aggregates["stages"]
+    rows = []
+    for stage, samples in stages.items():
+        rows.append({"stage": stage, "runs": len(samples),
+                     "p50 (s)": samples[len(samples) // 2],
+                     "p95 (s)": samples[int(0.95 * (len(samples) - 1))]})
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    stage = st.selectbox("Latency histogram for stage", sorted(stages), index=sorted(stages).index("total"))
+    labels = [f"≤{bound}s" for bound in STAGE_BUCKETS] + [f">{STAGE_BUCKETS[-1]}s"]
+    counts = [0] * len(labels)
+    for seconds in stages[stage]:
+        counts[next((i for i, bound in enumerate(STAGE_BUCKETS) if seconds <= bound), len(STAGE_BUCKETS))] += 1
+    histogram = pd.DataFrame({"latency": labels, "summaries": counts})
+    st.altair_chart(alt.Chart(histogram).mark_bar().encode(x=alt.X("latency", sort=None), y="summaries"),
+                    use_container_width=True)
+
+    counters = aggregates["counters"]
+    cache_hits = counters.get("cache_hits", 0)
+    cache_lookups = cache_hits + counters.get("cache_misses", 0)
+    st.caption(f"Avg input tokens: {counters.get('input_tokens', 0) / traces:,.0f} · "
+               f"avg output tokens: {counters.get('output_tokens', 0) / traces:,.0f} · "
+               f"LLM retries: {counters.get('llm_retries', 0):.0f} · "
+               f"cache hit rate: {cache_hits / cache_lookups if cache_lookups else 0:.0%} · "
+               f"avg DB time: {aggregates['db_seconds'] / traces * 1000:.1f} ms")
+    if aggregates["budgeted_max_new_tokens"]:
+        # Output tokens as a share of the max_new_tokens granted (low means oversized budgets)
+        used = aggregates["budgeted_output_tokens"] / aggregates["budgeted_max_new_tokens"]
+        st.caption(f"Generation budget used: {used:.0%} · "
+                   f"early stops: {counters.get('early_stops', 0):.0f} · "
+                   f"input tokens trimmed to fit: {counters.get('input_tokens_trimmed', 0):,.0f}")
+
+
+def display_jobs_panel(session_id, polling=False):
+    """Show this session's background jobs"""
+    jobs = get_job_queue().get_jobs(session_id, limit=10)
+    if not jobs:
+        return
+    if polling and not any(job["status"] in ("queued", "running") for job in jobs):
+        # Everything finished: rerun the full page once so polling stops
+        st.rerun()
     
-    # Validate the URL
-    if not validators.url(url):
-        return None, "Please enter a valid URL format"
+    st.divider()
+    st.subheader("⏳ Background Jobs")
+    status_icons = {"queued": "🕒", "running": "⚙️", "done": "✅", "failed": "❌"}
+    for job in jobs:
+        label = f"{status_icons.get(job['status'], '')} #{job['id']} {job['url']} ({job['status']})"
+        with st.expander(label, expanded=False):
+            st.caption(f"{job['params']['summary_length']} · {job['params']['repo_id']} · updated {job['updated_at']}")
+            if job["status"] == "done":
+                st.write(job["result"])
+            elif job["status"] == "failed":
+                st.error(job["error"])
+
+
+def display_summary_entry(db, summary, snippet=None):
+    """Render one history entry; the summary body is only fetched when requested"""
+    id, url, title, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
     
-    return url, None
+    with st.expander(f"📄 {title or 'Untitled'} - {created_at[:10]}"):
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.write(f"**URL:** [{url}]({url})")
+            st.write(f"**Date:** {created_at}")
+            st.write(f"**Length:** {summary_length} | **Tone:** {summary_tone}")
+            st.write(f"**Word Count:** {word_count}")
+            if video_duration:
+                st.write(f"**Duration:** {video_duration}")
+            if video_channel:
+                st.write(f"**Channel:** {video_channel}")
+            if snippet:
+                st.caption(f"…{snippet}…")
+        
+        with col2:
+            if st.button("🗑️ Delete", key=f"delete_{id}"):
+                if db.delete_summary(id):
+                    get_semantic_index().remove([id])
+                    st.success("Summary deleted!")
+                    st.rerun()
+                else:
+                    st.error("Failed to delete summary")
+        
+        if st.toggle("Show summary", key=f"show_summary_{id}"):
+            st.write("**Summary:**")
+            st.write(db.get_summary_text(id))
+            variants = db.get_summary_variants(id)
+            if variants:
+                st.caption("Other lengths: " + ", ".join(f"#{variant_id} {length}" for variant_id, length in variants))
 
 
 def display_history_interface():
@@ -47,108 +223,186 @@ def display_history_interface():
     st.subheader("📚 Summary History")
     
     # Initialize database
-    db = SummaryDatabase()
+    db = get_database()
     
     # Search functionality
-    search_query = st.text_input("🔍 Search summaries", placeholder="Search by URL, title, or content...")
+    search_query = st.text_input(
+        "🔍 Search summaries",
+        placeholder="Search by title or content, or paste a URL...",
+        help='Use "quotes" for exact phrases and word* for prefix matches'
+    )
+    semantic = st.toggle("Semantic search", help="Match by meaning across summaries and transcripts")
+    # Archived rows keep their ids, so entries from both databases can be listed together
+    archive = db.open_archive()
+    databases = [db]
+    if archive is not None and st.toggle("Include archive", help="Also search summaries moved to the archive"):
+        databases.append(archive)
     
-    # Get summaries based on search
+    if search_query and semantic:
+        matches = get_semantic_index().search(search_query)
+        summaries = db.get_summaries_by_ids([summary_id for summary_id, score in matches])
+        st.info(f"Found {len(summaries)} summaries related to '{search_query}'")
+        for summary in summaries:
+            display_summary_entry(db, summary)
+        return
+    
+    # A pasted URL lists every summary of that video or page, whatever form its URL was saved in
+    if search_query and search_query.strip().startswith(("http://", "https://", "www.", "youtu")):
+        results = [(source, summary) for source in databases
+                   for summary in source.get_summaries_for_url(search_query.strip())]
+        st.info(f"Found {len(results)} summaries of this URL")
+        for source, summary in results:
+            display_summary_entry(source, summary)
+        return
+    
+    # Search results: best matches first, with highlighted snippets
     if search_query:
-        summaries = db.search_summaries(search_query)
-        st.info(f"Found {len(summaries)} summaries matching '{search_query}'")
-    else:
-        summaries = db.get_all_summaries()
+        results = [(source, result) for source in databases
+                   for result in source.search_summaries_with_snippets(search_query)]
+        st.info(f"Found {len(results)} summaries matching '{search_query}'")
+        if not results:
+            return
+        for source, (summary, snippet) in results:
+            # Drop summary_text so search rows match the list columns
+            display_summary_entry(source, summary[:3] + summary[4:], snippet)
+        return
+    
+    # Browsing: keyset pagination, one page of list columns at a time
+    page_size = st.selectbox("Summaries per page", [10, 20, 50], index=1)
+    if st.session_state.get('history_page_size') != page_size:
+        st.session_state.history_page_size = page_size
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    # Fetch one extra row to know whether a next page exists
+    summaries = db.get_summaries_page(page_size + 1, after=cursors[-1])
+    has_next = len(summaries) > page_size
+    summaries = summaries[:page_size]
     
     if not summaries:
         st.info("No summaries found. Create your first summary to see it here!")
         return
     
-    # Display summaries
     for summary in summaries:
-        id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
-        
-        with st.expander(f"📄 {title or 'Untitled'} - {created_at[:10]}"):
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.write(f"**URL:** [{url}]({url})")
-                st.write(f"**Date:** {created_at}")
-                st.write(f"**Length:** {summary_length} | **Tone:** {summary_tone}")
-                st.write(f"**Word Count:** {word_count}")
-                if video_duration:
-                    st.write(f"**Duration:** {video_duration}")
-                if video_channel:
-                    st.write(f"**Channel:** {video_channel}")
-            
-            with col2:
-                if st.button("🗑️ Delete", key=f"delete_{id}"):
-                    if db.delete_summary(id):
-                        st.success("Summary deleted!")
-                        st.rerun()
-                    else:
-                        st.error("Failed to delete summary")
-            
-            st.write("**Summary:**")
-            st.write(summary_text)
+        display_summary_entry(db, summary)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if st.button("Next ➡️", disabled=not has_next):
+            last = summaries[-1]
+            cursors.append((last[6], last[0]))
+            st.rerun()
+
+
+def display_stats_dashboard():
+    """Totals and top channels and models from the incrementally maintained summary stats"""
+    import pandas as pd
+
+    st.subheader("📊 Stats")
+    stats = get_database().get_summary_stats(top=20)
+    if not stats["summaries"]:
+        st.info("No summaries yet. Create your first one!")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Summaries", f"{stats['summaries']:,}")
+    col2.metric("Words written", f"{stats['words']:,}")
+    col3.metric("Average length", f"{stats['average_words']:.0f} words")
+
+    for key, label in (("channels", "Channel"), ("models", "Model")):
+        st.write(f"**Top {key}**")
+        rows = [{label: name or "Unknown", "Summaries": count, "Avg words": round(average_words)}
+                for name, count, average_words in stats[key]]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
 
 
 def export_summaries():
     """Handle export functionality"""
     st.subheader("📥 Export Summaries")
     
-    db = SummaryDatabase()
-    summaries = db.get_all_summaries()
+    db = get_database()
+    total = db.get_summary_count()
     
-    if not summaries:
+    if not total:
         st.warning("No summaries available for export.")
         return
     
-    col1, col2, col3 = st.columns(3)
+    compress = st.checkbox("Compress with gzip", help="Smaller files for large histories")
     
-    with col1:
-        if st.button("📄 Export as Markdown"):
-            markdown_content = ExportManager.export_to_markdown(summaries)
-            success, filepath = ExportManager.save_export_file(markdown_content, "summaries", "md")
-            if success:
-                st.success(f"✅ Exported to {filepath}")
-                st.download_button(
-                    label="📥 Download Markdown",
-                    data=markdown_content,
-                    file_name=f"summaries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown"
-                )
-            else:
-                st.error("Failed to export Markdown")
+    export_buttons = [
+        ("md", "📄 Export as Markdown", "Markdown"),
+        ("json", "📊 Export as JSON", "JSON"),
+        ("csv", "📈 Export as CSV", "CSV"),
+        ("ndjson", "🧾 Export as NDJSON", "NDJSON"),
+    ]
     
-    with col2:
-        if st.button("📊 Export as JSON"):
-            json_content = ExportManager.export_to_json(summaries)
-            success, filepath = ExportManager.save_export_file(json_content, "summaries", "json")
-            if success:
-                st.success(f"✅ Exported to {filepath}")
-                st.download_button(
-                    label="📥 Download JSON",
-                    data=json_content,
-                    file_name=f"summaries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json"
-                )
-            else:
-                st.error("Failed to export JSON")
+    for col, (format_type, button_label, format_name) in zip(st.columns(len(export_buttons)), export_buttons):
+        with col:
+            if st.button(button_label):
+                # Rows stream from the database cursor straight into the export file
+                chunks = ExportManager.iter_export(format_type, db.iter_summaries(), total)
+                success, filepath = ExportManager.save_export_stream(chunks, "summaries", format_type, compress)
+                if success:
+                    st.success(f"✅ Exported to {filepath}")
+                    _, mime = ExportManager.FORMATS[format_type]
+                    with open(filepath, "rb") as export_file:
+                        st.download_button(
+                            label=f"📥 Download {format_name}",
+                            data=export_file,
+                            file_name=os.path.basename(filepath),
+                            mime="application/gzip" if compress else mime
+                        )
+                else:
+                    st.error(f"Failed to export {format_name}")
     
-    with col3:
-        if st.button("📈 Export as CSV"):
-            csv_content = ExportManager.export_to_csv(summaries)
-            success, filepath = ExportManager.save_export_file(csv_content, "summaries", "csv")
-            if success:
-                st.success(f"✅ Exported to {filepath}")
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=csv_content,
-                    file_name=f"summaries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.error("Failed to export CSV")
+    # Columnar export for analytics; only rows newer than the last export are appended
+    st.divider()
+    st.write("**🗃️ Analytics export (Parquet + DuckDB)**")
+    if st.button("Export new rows to Parquet"):
+        from analytics import AnalyticsExporter
+        exporter = AnalyticsExporter(db)
+        success, exported = exporter.export_parquet()
+        if success:
+            st.success(f"✅ Appended {exported} new summaries to {exporter.export_dir}")
+            if os.path.exists(os.path.join(exporter.export_dir, exporter.WATERMARK_FILE)):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("Summaries per model")
+                    st.dataframe(exporter.summaries_per_model(), hide_index=True)
+                with col2:
+                    st.write("Summaries per channel")
+                    st.dataframe(exporter.summaries_per_channel(), hide_index=True)
+                st.write("Word count distribution")
+                st.bar_chart(exporter.word_count_distribution(), x="words", y="summaries")
+        else:
+            st.error("Failed to export Parquet")
+    
+    # Retention: keep the hot database small by compressing text and archiving old rows
+    st.divider()
+    st.write("**🗄️ Storage**")
+    stats = db.get_storage_stats()
+    st.caption(f"Database {stats['database_bytes'] / 1e6:.1f} MB · archive {stats['archive_bytes'] / 1e6:.1f} MB · "
+               f"{stats['compressed']:,} of {stats['summaries']:,} summaries compressed")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Compress stored summaries"):
+            with st.spinner("Compressing..."):
+                # A dictionary trained on this history compresses short summaries much better
+                dictionary_id = db.train_compression_dictionary() if stats["summaries"] >= 100 else None
+                rewritten = db.compress_summaries(recompress=dictionary_id is not None)
+            st.success(f"✅ Compressed {rewritten} summaries")
+    with col2:
+        archive_days = st.number_input("Archive summaries older than (days)", min_value=1, value=180)
+        if st.button("Archive old summaries"):
+            with st.spinner("Archiving..."):
+                moved = db.archive_summaries(int(archive_days), on_archived=get_semantic_index().remove)
+            st.success(f"✅ Moved {moved} summaries to {db.archive_path}")
 
 
 ## streamlit APP
@@ -161,6 +415,14 @@ st.subheader('Summarize URL')
 ## Get the Groq API Key and url(YT or website)to be summarized
 with st.sidebar:
     hf_api_key=st.text_input("Huggingface API Token",value="",type="password")
+    groq_api_key=st.text_input("Groq API Key (optional)",value="",type="password",
+                               help="Adds Groq as a second provider; requests go to the fastest healthy one")
+    backend = st.selectbox(
+        "Summarizer backend",
+        list(SUMMARIZER_BACKENDS),
+        help="Local backends run on this machine's CPU without an API token (extractive is fastest)"
+    )
+    repo_id = SUMMARIZER_BACKENDS[backend]
     
     # Summary Length Controls
     st.divider()
@@ -169,7 +431,7 @@ with st.sidebar:
     # Length category selection
     length_category = st.selectbox(
         "Choose length category:",
-        ["Short (100-150 words)", "Medium (200-300 words)", "Long (400-500 words)", "Custom"],
+        list(LENGTH_CATEGORIES) + ["Custom"],
         index=1  # Default to Medium
     )
     
@@ -186,55 +448,79 @@ with st.sidebar:
         word_count = custom_word_count
     else:
         # Extract word count from category
-        if "Short" in length_category:
-            word_count = 125  # Average of 100-150
-        elif "Medium" in length_category:
-            word_count = 250  # Average of 200-300
-        elif "Long" in length_category:
-            word_count = 450  # Average of 400-500
+        word_count = LENGTH_CATEGORIES[length_category]
     
     # Display selected word count
     st.info(f"📊 Target: ~{word_count} words")
+
+    input_budget = st.selectbox(
+        "Input token budget:",
+        ["Off", 2000, 4000, 8000],
+        help="Keep only the most informative transcript sentences up to this many tokens before summarizing"
+    )
+    token_budget = None if input_budget == "Off" else input_budget
+    all_lengths = st.checkbox(
+        "All lengths from one pass",
+        help="Condense the content once, then write Short, Medium and Long (plus Custom if selected) from it"
+    )
+    timestamped = st.checkbox(
+        "Timestamped segments",
+        help="YouTube only: summarize chapter by chapter (or every 10 minutes) with links to each timestamp"
+    )
+    time_range_text = ""
+    if timestamped:
+        time_range_text = st.text_input("Time range (optional)", placeholder="e.g. minutes 40-60")
     
     # History and Export Section
     st.divider()
     st.subheader("📚 History & Export")
     
-    # Initialize database for stats
-    db = SummaryDatabase()
-    summary_count = db.get_summary_count()
+    # Cached in-process and refreshed only after writes, so reruns do not query the history
+    db = get_database()
+    stats = db.get_summary_stats()
+    summary_count = stats["summaries"]
     
     if summary_count > 0:
-        st.info(f"📊 Total summaries: {summary_count}")
+        st.info(f"📊 Total summaries: {summary_count} · avg {stats['average_words']:.0f} words")
         
         # Recent summaries preview
-        recent_summaries = db.get_recent_summaries(3)
+        recent_summaries = stats["recent"][:3]
         if recent_summaries:
             st.write("**Recent summaries:**")
             for summary in recent_summaries:
-                id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
+                # Only what is shown; word_count here would shadow the selected target length
+                title, created_at = summary[2], summary[6]
                 st.write(f"• {title or 'Untitled'} ({created_at[:10]})")
     else:
         st.info("No summaries yet. Create your first one!")
     
     # Navigation buttons
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📚 View History", use_container_width=True):
+        if st.button("📚 History", use_container_width=True):
             st.session_state.show_history = True
             st.session_state.show_export = False
+            st.session_state.show_stats = False
     
     with col2:
         if st.button("📥 Export", use_container_width=True):
             st.session_state.show_export = True
             st.session_state.show_history = False
+            st.session_state.show_stats = False
+    
+    with col3:
+        if st.button("📊 Stats", use_container_width=True):
+            st.session_state.show_stats = True
+            st.session_state.show_history = False
+            st.session_state.show_export = False
     
     # Clear all button
     if summary_count > 0:
         if st.button("🗑️ Clear All History", use_container_width=True):
             if st.session_state.get('confirm_clear', False):
                 if db.clear_all_summaries():
+                    get_semantic_index().clear()
                     st.success("All summaries cleared!")
                     st.session_state.confirm_clear = False
                     st.rerun()
@@ -262,113 +548,197 @@ if st.session_state.get('show_history', False):
     display_history_interface()
 elif st.session_state.get('show_export', False):
     export_summaries()
+elif st.session_state.get('show_stats', False):
+    display_stats_dashboard()
 else:
     # Main summarization interface
     st.write("Enter a URL above to get started with summarization!")
 
-## Gemma Model USsing Groq API
-##llm =ChatGroq(model="Gemma-7b-It", groq_api_key=groq_api_key)
-repo_id="mistralai/Mistral-7B-Instruct-v0.3"
-llm=HuggingFaceEndpoint(repo_id=repo_id,max_length=150,temperature=0.7,token=hf_api_key)
+has_llm_credentials = repo_id in LOCAL_BACKENDS or bool(hf_api_key.strip() or groq_api_key.strip())
+
+if has_llm_credentials:
+    with st.sidebar.expander("⚡ Model latency"):
+        for name, stats in get_llm_router(hf_api_key, groq_api_key, repo_id).latency_summary().items():
+            if stats["p50"] is None:
+                st.caption(f"{name}: no calls yet")
+            else:
+                health = "healthy" if stats["healthy"] else "cooling down"
+                st.caption(f"{name}: p50 {stats['p50']:.1f}s · p95 {stats['p95']:.1f}s · "
+                           f"{stats['failures']} failures · {health}")
 
-# Validation function for word count
-def validate_word_count(word_count):
-    """Validate and cap word count to reasonable limits"""
-    if word_count < 50:
-        return 50
-    elif word_count > 1000:
-        return 1000
-    return word_count
+with st.sidebar.expander("📈 Performance"):
+    display_performance_panel()
+get_metrics_server()
 
 # Validate the word count
 validated_word_count = validate_word_count(word_count)
 
-# Create dynamic prompt template
-prompt_template=f"""
-Provide a comprehensive summary of the following content in approximately {validated_word_count} words. 
-Make sure the summary is well-structured and covers the key points:
-
-Content: {{text}}
+# Create dynamic prompt template (the PromptTemplate itself is built on first use and cached)
+prompt_template=build_prompt_template(validated_word_count)
 
-Summary:
-"""
-prompt=PromptTemplate(template=prompt_template,input_variables=["text"])
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+run_in_background = st.checkbox(
+    "Run in background",
+    help="Queue the summary as a background job so you can keep using the app; results appear below"
+)
 
 if st.button("Summarize"):
     ## Validate all the inputs
-    if not hf_api_key.strip():
-        st.error("Please provide your Hugging Face API token")
+    if not has_llm_credentials:
+        st.error("Please provide your Hugging Face API token (or a Groq API key), or pick a local backend")
     elif not generic_url.strip():
         st.error("Please enter a URL to summarize")
     else:
+        trace = Trace()
         # Validate and potentially fix the URL
-        validated_url, error_message = validate_and_fix_url(generic_url)
+        with trace.stage("validate"):
+            validated_url, error_message = validate_and_fix_url(generic_url)
         
         if error_message:
             st.error(error_message)
             # If we have a suggestion, show it as a warning
             if "Did you mean:" in error_message:
                 st.warning("💡 **Tip:** Click the suggested URL above to copy it, then paste it back into the input field.")
+        elif timestamped:
+            if extract_video_id(validated_url) is None:
+                st.error("Timestamped segments need a YouTube URL")
+            else:
+                try:
+                    time_range = parse_time_range(time_range_text)
+                    with st.spinner("Summarizing segments..."):
+                        segment_summaries = summarize_segments(
+                            validated_url, get_llm_router(hf_api_key, groq_api_key, repo_id), repo_id,
+                            get_database(), store=get_document_store(), time_range=time_range,
+                            hf_api_key=hf_api_key
+                        )
+                    if segment_summaries:
+                        st.markdown(format_segment_summaries(validated_url, segment_summaries))
+                        cached_count = sum(summary.cached for summary in segment_summaries)
+                        st.caption(f"{len(segment_summaries)} segments ({cached_count} from cache)")
+                    else:
+                        st.warning("No transcript found in that time range")
+                except ValueError as e:
+                    st.error(str(e))
+                except Exception as e:
+                    st.exception(f"Exception: {e}")
+        elif all_lengths:
+            lengths = dict(LENGTH_CATEGORIES)
+            if length_category == "Custom":
+                lengths["Custom"] = validated_word_count
+            try:
+                with st.spinner(f"Summarizing at {len(lengths)} lengths..."):
+                    results = summarize_url_lengths(
+                        validated_url, get_llm_router(hf_api_key, groq_api_key, repo_id), lengths, repo_id,
+                        get_database(), cache=get_summary_cache(), store=get_document_store(),
+                        index=get_semantic_index(), token_budget=token_budget, hf_api_key=hf_api_key
+                    )
+                for tab, (summary_length, (summary_id, summary_text)) in zip(st.tabs(list(results)), results.items()):
+                    with tab:
+                        st.write(summary_text)
+                        st.caption("Loaded from cache" if summary_id is None else f"Saved to history as #{summary_id}")
+            except Exception as e:
+                st.exception(f"Exception: {e}")
+        elif run_in_background:
+            job_id = get_job_queue().submit(
+                validated_url, hf_api_key, validated_word_count, length_category, repo_id, session_id,
+                groq_api_key=groq_api_key, token_budget=token_budget
+            )
+            if job_id is not None:
+                st.session_state.has_jobs = True
+                st.info(f"⏳ Queued job #{job_id}. You can keep using the app while it runs.")
+            else:
+                st.error("Failed to queue the summarization job")
         else:
             # Use the validated (potentially fixed) URL
             generic_url = validated_url
             
             try:
-                with st.spinner("Loading and processing content..."):
-                    ## loading the website or yt video data
-                    if is_youtube_url(generic_url):
-                        loader = YoutubeLoader.from_youtube_url(generic_url, add_video_info=True)
-                    else:
-                        loader = UnstructuredURLLoader(
-                            urls=[generic_url], 
-                            ssl_verify=False,
-                            headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"}
-                        )
-                    docs = loader.load()
+                with st.spinner("Loading and processing content..."), trace:
+                    ## loading the website or yt video data (reused from the document store when fresh)
+                    with trace.stage("load"):
+                        docs = load_documents(generic_url, store=get_document_store())
+                    ## Drop caption repeats, fillers and page boilerplate before they cost LLM tokens
+                    with trace.stage("preprocess"):
+                        docs, preprocess_stats = preprocess_documents(generic_url, docs, token_budget)
+                    st.caption(f"✂️ Input: {preprocess_stats.tokens_before:,} → {preprocess_stats.tokens_after:,} tokens "
+                               f"(-{preprocess_stats.reduction:.0%})")
 
-                    ## Chain For Summarization
-                    chain = load_summarize_chain(llm, chain_type="stuff", prompt=prompt)
-                    output_summary = chain.run(docs)
+                    ## Skip the LLM entirely when this exact request was already summarized
+                    transcript = "".join(doc.page_content for doc in docs)
+                    summary_cache = get_summary_cache()
+                    with trace.stage("cache_lookup"):
+                        cache_key = make_cache_key(
+                            generic_url,
+                            transcript,
+                            prompt_template,
+                            validated_word_count,
+                            repo_id
+                        )
+                        cached_summary = summary_cache.get(cache_key)
+                    reusable = None
+                    if cached_summary is None:
+                        ## ...or when a near-identical transcript (re-upload, mirror) was
+                        with trace.stage("reuse_lookup"):
+                            reusable = find_reusable_summary(get_semantic_index(), get_database(), transcript,
+                                                             length_category, repo_id)
+                    if cached_summary is not None:
+                        st.success("Summary loaded from cache!")
+                        st.write(cached_summary)
+                    elif reusable is not None:
+                        reused_id, reused_summary = reusable
+                        summary_cache.set(cache_key, reused_summary, url=generic_url)
+                        st.success(f"Reused the summary of a near-identical transcript (history #{reused_id})")
+                        st.write(reused_summary)
+                    else:
+                        ## Stuff short content, refine or map-reduce long transcripts
+                        llm = get_llm_router(hf_api_key, groq_api_key, repo_id)
+                        summarizer = get_summarizer(hf_api_key, groq_api_key, repo_id, validated_word_count)
 
-                    # Display the summary
-                    st.success("Summary generated successfully!")
-                    st.write(output_summary)
+                        # Render tokens as they arrive; write_stream returns the full text
+                        # A previous run at another length may have left a reusable intermediate
+                        variant_group = intermediate_cache_key(generic_url, transcript, repo_id)
+                        intermediate = summary_cache.get(variant_group)
+                        with trace.stage("summarize"):
+                            output_summary = st.write_stream(summarizer.stream(docs, intermediate))
+                        summary_cache.set(cache_key, output_summary, url=generic_url)
+                        if summarizer.last_intermediate is not None:
+                            summary_cache.set(variant_group, summarizer.last_intermediate, url=generic_url)
+                        st.success(f"Summary generated successfully! (strategy: {summarizer.last_strategy})")
                     
-                    # Save to database
-                    db = SummaryDatabase()
+                        # Save to database
+                        db = get_database()
                     
-                    # Extract metadata
-                    title = "Untitled"
-                    video_duration = None
-                    video_channel = None
+                        # Extract metadata
+                        title, video_duration, video_channel = extract_metadata(generic_url, docs)
                     
-                    if is_youtube_url(generic_url) and docs:
-                        # Try to extract video metadata
-                        try:
-                            if hasattr(docs[0], 'metadata'):
-                                metadata = docs[0].metadata
-                                title = metadata.get('title', 'Untitled')
-                                video_duration = metadata.get('length', None)
-                                video_channel = metadata.get('author', None)
-                        except:
-                            pass
-                    
-                    # Save summary to database
-                    success = db.save_summary(
-                        url=generic_url,
-                        title=title,
-                        summary_text=output_summary,
-                        summary_length=length_category,
-                        summary_tone="Professional",
-                        model_used=repo_id,
-                        video_duration=video_duration,
-                        video_channel=video_channel
-                    )
+                        # Save summary to database
+                        with trace.stage("save"):
+                            summary_id = db.insert_summary(
+                                url=generic_url,
+                                title=title,
+                                summary_text=output_summary,
+                                summary_length=length_category,
+                                summary_tone="Professional",
+                                model_used=llm.last_model or repo_id,
+                                video_duration=video_duration,
+                                video_channel=video_channel,
+                                variant_group=variant_group
+                            )
                     
-                    if success:
-                        st.info("✅ Summary saved to history!")
-                    else:
-                        st.warning("⚠️ Summary generated but failed to save to history")
+                        if summary_id is not None:
+                            with trace.stage("index"):
+                                get_semantic_index().add(summary_id, output_summary, transcript)
+                            db.set_summary_trace(summary_id, trace.to_dict())
+                            st.info("✅ Summary saved to history!")
+                        else:
+                            st.warning("⚠️ Summary generated but failed to save to history")
                         
             except Exception as e:
-                st.exception(f"Exception: {e}")
\ No newline at end of file
+                st.exception(f"Exception: {e}")
+            else:
+                st.caption("⏱️ " + " · ".join(f"{stage} {seconds:.2f}s" for stage, seconds in trace.stages.items()))
+
+# Poll job status every couple of seconds only while this session has unfinished jobs
+if st.session_state.get("has_jobs", False):
+    jobs_running = any(job["status"] in ("queued", "running") for job in get_job_queue().get_jobs(session_id, limit=10))
+    st.fragment(display_jobs_panel, run_every=2 if jobs_running else None)(session_id, polling=jobs_running)
\ No newline at end of file
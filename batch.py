@@ -0,0 +1,282 @@
+"""Headless bulk summarization of URL lists, playlists and channels.
+
+Usage:
+    python batch.py urls.txt playlist.csv https://www.youtube.com/playlist?list=... \\
+        --words 250 --workers 8 --hf-token $HF_API_TOKEN
+"""
+import argparse
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from cache import SummaryCache, make_cache_key, normalize_url
+from database import SummaryDatabase
+from document_store import DocumentStore
+from generation_budget import budget_for_model
+from pipeline import (DEFAULT_REPO_ID, LENGTH_CATEGORIES, LOCAL_BACKENDS, is_youtube_url,
+                      validate_and_fix_url, validate_word_count, build_prompt_template, build_prompt, build_llm,
+                      load_documents, preprocess_documents, extract_metadata)
+from summarizer import ChunkedSummarizer
+from tracing import Trace
+
+
+DEFAULT_PROVIDER_LIMITS = {"youtube": 4, "web": 4, "huggingface": 2}
+
+
+class ThrottledLLM:
+    """Wrap an LLM so that concurrent calls respect a provider-wide limit"""
+
+    def __init__(self, llm, semaphore: threading.Semaphore):
+        self.llm = llm
+        self.semaphore = semaphore
+
+    def invoke(self, text: str, **kwargs):
+        with self.semaphore:
+            return self.llm.invoke(text, **kwargs)
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch run"""
+    total: int = 0
+    summarized: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def urls_per_minute(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return (self.summarized + self.failed) / self.elapsed_seconds * 60
+
+
+def read_url_file(path: str) -> List[str]:
+    """Read URLs from a text file (one per line) or a CSV file (url column or first column)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.reader(f))
+            if not rows:
+                return []
+            header = [cell.strip().lower() for cell in rows[0]]
+            if "url" in header:
+                column = header.index("url")
+                rows = rows[1:]
+            else:
+                column = 0
+            return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def expand_source(source: str) -> List[str]:
+    """Expand a playlist or channel URL into its video URLs; other URLs are returned as-is"""
+    if is_youtube_url(source) and "list=" in source:
+        from pytube import Playlist
+        return list(Playlist(source).video_urls)
+    if is_youtube_url(source) and any(part in source for part in ("/@", "/channel/", "/c/", "/user/")):
+        from pytube import Channel
+        return list(Channel(source).video_urls)
+    return [source]
+
+
+def collect_urls(sources: Iterable[str]) -> List[str]:
+    """Turn CLI sources (files, playlists, channels, URLs) into a de-duplicated URL list"""
+    urls, seen = [], set()
+    for source in sources:
+        candidates = read_url_file(source) if os.path.isfile(source) else [source]
+        for candidate in candidates:
+            for url in expand_source(candidate):
+                fixed_url, error_message = validate_and_fix_url(url)
+                url = fixed_url or url
+                if error_message and not fixed_url:
+                    print(f"Skipping invalid URL {url}: {error_message}")
+                    continue
+                key = normalize_url(url)
+                if key not in seen:
+                    seen.add(key)
+                    urls.append(url)
+    return urls
+
+
+class BatchSummarizer:
+    """Summarize many URLs with a bounded worker pool and batched database writes"""
+
+    def __init__(self, hf_api_key: str, repo_id: str = DEFAULT_REPO_ID, word_count: int = 250,
+                 summary_length: Optional[str] = None, workers: int = 8,
+                 provider_limits: Optional[Dict[str, int]] = None, write_batch_size: int = 20,
+                 db: Optional[SummaryDatabase] = None, llm=None, token_budget: Optional[int] = None,
+                 index=None):
+        self.repo_id = repo_id
+        self.word_count = validate_word_count(word_count)
+        self.summary_length = summary_length or f"Custom ({self.word_count} words)"
+        self.workers = workers
+        self.token_budget = token_budget
+        self.write_batch_size = write_batch_size
+        self.db = db or SummaryDatabase()
+        self.index = index
+        self.cache = SummaryCache(self.db)
+        self.store = DocumentStore(self.db)
+
+        limits = dict(DEFAULT_PROVIDER_LIMITS, **(provider_limits or {}))
+        self.fetch_limits = {
+            "youtube": threading.Semaphore(limits["youtube"]),
+            "web": threading.Semaphore(limits["web"]),
+        }
+        self.llm = llm or build_llm(hf_api_key, repo_id)
+        if repo_id not in LOCAL_BACKENDS:
+            # A local backend has no rate limit and serializes its own batches
+            self.llm = ThrottledLLM(self.llm, threading.Semaphore(limits["huggingface"]))
+        self.prompt_template = build_prompt_template(self.word_count)
+        self.prompt = build_prompt(self.word_count)
+        self.budget = budget_for_model(repo_id, hf_api_key)
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+
+    def run(self, urls: List[str], resume: bool = True, progress: bool = True) -> BatchReport:
+        """Summarize every URL, skipping ones already in the summaries table when resuming"""
+        report = BatchReport(total=len(urls))
+        if resume:
+            done = self.db.get_summarized_source_keys()
+            todo = [url for url in urls if normalize_url(url) not in done]
+            report.skipped = len(urls) - len(todo)
+        else:
+            todo = list(urls)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._summarize_one, url): url for url in todo}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    future.result()
+                    report.summarized += 1
+                    status = "ok"
+                except Exception as e:
+                    report.failed += 1
+                    report.errors[url] = str(e)
+                    status = f"failed: {e}"
+                report.elapsed_seconds = time.perf_counter() - start
+                if progress:
+                    finished = report.summarized + report.failed
+                    print(f"[{finished}/{len(todo)}] {status} {url} "
+                          f"({report.urls_per_minute:.1f} URLs/min)")
+
+        self._flush(force=True)
+        report.elapsed_seconds = time.perf_counter() - start
+        return report
+
+    def _summarize_one(self, url: str) -> None:
+        provider = "youtube" if is_youtube_url(url) else "web"
+        with Trace() as trace:
+            with trace.stage("load"), self.fetch_limits[provider]:
+                docs = load_documents(url, store=self.store)
+            with trace.stage("preprocess"):
+                docs, _ = preprocess_documents(url, docs, self.token_budget)
+
+            transcript = "".join(doc.page_content for doc in docs)
+            with trace.stage("cache_lookup"):
+                cache_key = make_cache_key(url, transcript, self.prompt_template, self.word_count, self.repo_id)
+                summary_text = self.cache.get(cache_key)
+            cached = summary_text is not None
+            if not cached:
+                with trace.stage("summarize"):
+                    summary_text = ChunkedSummarizer(self.llm, self.prompt, word_count=self.word_count,
+                                                     budget=self.budget).summarize(docs)
+                self.cache.set(cache_key, summary_text, url=url)
+
+        if cached and any(row[3] == self.summary_length and row[5] == self.repo_id
+                          for row in self.db.get_summaries_for_url(url)):
+            # Already in the history (e.g. a --no-resume re-run); saving it again would duplicate the row
+            return
+        title, video_duration, video_channel = extract_metadata(url, docs)
+        with self._pending_lock:
+            self._pending.append({
+                "url": url,
+                "title": title,
+                "summary_text": summary_text,
+                "summary_length": self.summary_length,
+                "summary_tone": "Professional",
+                "model_used": self.repo_id,
+                "video_duration": video_duration,
+                "video_channel": video_channel,
+                "trace": trace.to_dict(),
+                "transcript": transcript,
+            })
+        self._flush()
+
+    def _flush(self, force: bool = False) -> None:
+        with self._pending_lock:
+            if not self._pending or (not force and len(self._pending) < self.write_batch_size):
+                return
+            batch, self._pending = self._pending, []
+        ids = self.db.insert_summaries(batch)
+        if len(ids) != len(batch):
+            print(f"Error saving a batch of {len(batch)} summaries; they will be retried on the next run")
+        elif self.index is not None:
+            self.index.add_many([(summary_id, s["summary_text"], s["transcript"])
+                                 for summary_id, s in zip(ids, batch)])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarize many URLs, playlists or channels headlessly")
+    parser.add_argument("sources", nargs="+",
+                        help="URLs, playlist/channel URLs, or .txt/.csv files containing URLs")
+    parser.add_argument("--length", choices=["short", "medium", "long"], default="medium",
+                        help="Summary length category (default: medium)")
+    parser.add_argument("--words", type=int, help="Custom target word count (overrides --length)")
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads (default: 8)")
+    parser.add_argument("--fetch-limit", type=int, default=DEFAULT_PROVIDER_LIMITS["youtube"],
+                        help="Max concurrent fetches per source type")
+    parser.add_argument("--llm-limit", type=int, default=DEFAULT_PROVIDER_LIMITS["huggingface"],
+                        help="Max concurrent LLM calls")
+    parser.add_argument("--token-budget", type=int,
+                        help="Cut each cleaned transcript to this many tokens by extractive selection")
+    parser.add_argument("--batch-size", type=int, default=20, help="Summaries per database transaction")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Summarize URLs even if they are already in the history")
+    parser.add_argument("--hf-token", default=os.environ.get("HF_API_TOKEN", ""),
+                        help="Hugging Face API token (default: $HF_API_TOKEN; not needed for local/ backends)")
+    parser.add_argument("--repo-id", default=os.environ.get("REPO_ID", DEFAULT_REPO_ID),
+                        help="Model repo ID (default: $REPO_ID or Mistral-7B-Instruct)")
+    parser.add_argument("--db", default="summaries.db", help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    if args.repo_id not in LOCAL_BACKENDS and not args.hf_token.strip():
+        parser.error("a Hugging Face API token is required (--hf-token or $HF_API_TOKEN)")
+
+    if args.words:
+        word_count, summary_length = args.words, None
+    else:
+        summary_length = next(name for name in LENGTH_CATEGORIES if name.lower().startswith(args.length))
+        word_count = LENGTH_CATEGORIES[summary_length]
+
+    urls = collect_urls(args.sources)
+    index = None
+    try:
+        from semantic_index import SemanticIndex
+        index = SemanticIndex(args.db)
+    except ImportError:
+        pass
+    batch = BatchSummarizer(
+        args.hf_token, repo_id=args.repo_id, word_count=word_count, summary_length=summary_length,
+        workers=args.workers, write_batch_size=args.batch_size, db=SummaryDatabase(args.db),
+        token_budget=args.token_budget, index=index,
+        provider_limits={"youtube": args.fetch_limit, "web": args.fetch_limit,
+                         "huggingface": args.llm_limit}
+    )
+    report = batch.run(urls, resume=not args.no_resume)
+
+    print(f"Done: {report.summarized} summarized, {report.skipped} skipped, "
+          f"{report.failed} failed in {report.elapsed_seconds:.1f}s "
+          f"({report.urls_per_minute:.1f} URLs/min)")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+"""Compare summarize latency of the remote LLM path and the offline CPU backends.
+
+Usage (from the repository root):
+    python benchmarks/bench_backends.py --minutes 10 60 --backends local/extractive local/distilbart
+
+Runs pipeline.summarize_url on fixture transcripts with each backend. The
+remote path is a FakeLLM with --remote-latency seconds per call (roughly a
+hosted 7B model's response time), or the real endpoint when --hf-token is
+given. Local backends are timed once cold (model load included) and then
+warm; the summary length and LLM call count are reported with each run.
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from fixtures import FixtureStore, make_documents, write_results
+
+
+def run_once(url, llm, backend: str, db, docs) -> dict:
+    from pipeline import summarize_url
+
+    start = time.perf_counter()
+    # No cache, so every run reaches the backend
+    _, summary_text = summarize_url(url, llm, 250, "Medium", backend, db, store=FixtureStore(docs))
+    seconds = time.perf_counter() - start
+    trace = db.get_recent_traces(1)[0]
+    return {"seconds": seconds, "words": len(summary_text.split()),
+            "llm_calls": trace["counters"].get("llm_calls", 0)}
+
+
+def bench_backend(backend: str, minutes: int, repeats: int, db, remote_latency: float, hf_token: str) -> dict:
+    from llm_router import FakeLLM
+    from pipeline import build_llm
+
+    url = f"https://www.youtube.com/watch?v=fixture{minutes:04d}"
+    docs = make_documents(minutes)
+    if backend == "remote":
+        llm = build_llm(hf_token) if hf_token else FakeLLM(latency=remote_latency)
+        cold = None
+    else:
+        llm = build_llm("", backend)
+        cold = run_once(url, llm, backend, db, docs)
+    runs = [run_once(url, llm, backend, db, docs) for _ in range(repeats)]
+    return {
+        "backend": backend,
+        "minutes": minutes,
+        "cold_s": cold["seconds"] if cold else None,
+        "summarize_s": statistics.median(run["seconds"] for run in runs),
+        "words": runs[-1]["words"],
+        "llm_calls": runs[-1]["llm_calls"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 60], help="Fixture transcript lengths in minutes")
+    parser.add_argument("--backends", nargs="+", default=["remote", "local/extractive", "local/distilbart"],
+                        help="'remote' and/or local backends (see pipeline.LOCAL_BACKENDS)")
+    parser.add_argument("--remote-latency", type=float, default=3.0,
+                        help="Simulated remote latency per call (seconds) when no --hf-token is given")
+    parser.add_argument("--hf-token", default="", help="Benchmark the real Hugging Face endpoint instead")
+    parser.add_argument("--repeats", type=int, default=3, help="Warm runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    from database import SummaryDatabase
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SummaryDatabase(os.path.join(tmp, "bench.db"))
+        runs = []
+        for backend in args.backends:
+            for minutes in args.minutes:
+                result = bench_backend(backend, minutes, args.repeats, db, args.remote_latency, args.hf_token)
+                runs.append(result)
+                cold = f", cold {result['cold_s']:.1f} s" if result["cold_s"] is not None else ""
+                print(f"{backend:>18} {minutes:>4} min: {result['summarize_s']:.2f} s warm{cold}, "
+                      f"{result['llm_calls']} calls, {result['words']} words")
+        db.close()
+
+    remote = "huggingface" if args.hf_token else f"fake ({args.remote_latency} s/call)"
+    path = write_results("backends", {"remote": remote, "runs": runs})
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
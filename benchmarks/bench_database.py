@@ -0,0 +1,107 @@
+"""Measure search, history page load and export on synthetic summaries databases.
+
+Usage (from the repository root):
+    python benchmarks/bench_database.py --rows 1000 100000 1000000
+
+Databases are built once in benchmarks/data/ (the 1M-row one takes a while
+and about 2 GB of disk). For each size this reports:
+- search_summaries latency for a selective, a common and a prefix query
+- history page load: first page, a deep keyset page, opening one summary and
+  listing the summaries of one video
+- ExportManager throughput for every export format (streamed, not written to disk)
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import argparse
+import statistics
+import time
+
+from fixtures import DB_ROWS, write_results, synthetic_database
+
+SEARCH_QUERIES = {"selective": "\"benchmark video 42\"", "common": "cache latency", "prefix": "embed*"}
+PAGE_SIZE = 20
+DEEP_PAGES = 50
+
+
+def time_call(function, repeats: int) -> dict:
+    """Median and p95 wall time (milliseconds) of function() over repeats runs"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"median_ms": statistics.median(samples), "p95_ms": samples[int(0.95 * (len(samples) - 1))]}
+
+
+def deep_page_cursor(db, pages: int):
+    """(created_at, id) keyset cursor after `pages` pages of history"""
+    cursor = None
+    for _ in range(pages):
+        page = db.get_summaries_page(PAGE_SIZE, after=cursor)
+        if not page:
+            break
+        cursor = (page[-1][6], page[-1][0])
+    return cursor
+
+
+def bench_exports(db, rows: int) -> dict:
+    from database import ExportManager
+
+    results = {}
+    for format_type in ExportManager.FORMATS:
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in ExportManager.iter_export(format_type, db.iter_summaries(), rows))
+        elapsed = time.perf_counter() - start
+        results[format_type] = {"seconds": elapsed, "characters": size, "rows_per_s": rows / elapsed}
+    return results
+
+
+def bench_database(rows: int, repeats: int) -> dict:
+    db = synthetic_database(rows)
+    cursor = deep_page_cursor(db, DEEP_PAGES)
+    summary_id = db.get_summaries_page(1)[0][0]
+    results = {
+        "rows": rows,
+        "search": {name: time_call(lambda: db.search_summaries(query), repeats)
+                   for name, query in SEARCH_QUERIES.items()},
+        "history": {
+            "first_page": time_call(lambda: db.get_summaries_page(PAGE_SIZE), repeats),
+            f"page_{DEEP_PAGES + 1}": time_call(lambda: db.get_summaries_page(PAGE_SIZE, after=cursor), repeats),
+            "open_summary": time_call(lambda: db.get_summary_text(summary_id), repeats),
+            "by_video": time_call(lambda: db.get_summaries_for_url(f"https://www.youtube.com/watch?v=bench{rows // 2:08d}"),
+                                  repeats),
+            "count": time_call(db.get_summary_count, repeats),
+            # Uncached: what the first rerun after a save pays
+            "stats": time_call(lambda: (db._invalidate_stats(), db.get_summary_stats()), repeats),
+        },
+        "export": bench_exports(db, rows),
+    }
+    db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=DB_ROWS[:2],
+                        help="Synthetic database sizes (default: 1000 100000; add 1000000 for the large run)")
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per query measurement")
+    args = parser.parse_args()
+
+    databases = []
+    for rows in args.rows:
+        result = bench_database(rows, args.repeats)
+        databases.append(result)
+        print(f"{rows:>9,} rows:")
+        for name, timing in result["search"].items():
+            print(f"    search ({name}): {timing['median_ms']:.1f} ms")
+        for name, timing in result["history"].items():
+            print(f"    history {name}: {timing['median_ms']:.2f} ms")
+        for name, export in result["export"].items():
+            print(f"    export {name}: {export['seconds']:.2f} s ({export['rows_per_s']:,.0f} rows/s)")
+
+    path = write_results("database", {"databases": databases})
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
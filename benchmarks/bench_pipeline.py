@@ -0,0 +1,89 @@
+"""Measure summarize latency and chunking throughput on fixture transcripts, offline.
+
+Usage (from the repository root):
+    python benchmarks/bench_pipeline.py --latency 0.2 --minutes 1 10 60 180
+
+Reports, for each fixture transcript length:
+- pre-processing time and token counts before/after (preprocessing.py)
+- chunking throughput of the ChunkedSummarizer text splitter (MB/s)
+- end-to-end pipeline.summarize_url latency against a deterministic FakeLLM
+  with the given per-call latency, and the strategy it picked
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from fixtures import TRANSCRIPT_MINUTES, FixtureStore, make_documents, write_results
+
+
+def time_call(function, repeats: int) -> float:
+    """Median wall time of function() over repeats runs"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def bench_transcript(minutes: int, latency: float, repeats: int, db) -> dict:
+    from llm_router import FakeLLM
+    from pipeline import build_prompt, preprocess_documents, summarize_url
+    from summarizer import ChunkedSummarizer
+
+    url = f"https://www.youtube.com/watch?v=fixture{minutes:04d}"
+    docs = make_documents(minutes)
+    text = docs[0].page_content
+    cleaned, stats = preprocess_documents(url, docs)
+
+    summarizer = ChunkedSummarizer(FakeLLM(latency=latency), build_prompt(250))
+    split_seconds = time_call(lambda: summarizer.splitter.split_text(text), repeats)
+    chunks = summarizer.splitter.split_text(cleaned[0].page_content)
+
+    llm = FakeLLM(latency=latency)
+    # No cache, so every run reaches the (fake) LLM
+    end_to_end = time_call(lambda: summarize_url(url, llm, 250, "Medium", "local/fake", db,
+                                                 store=FixtureStore(docs)), repeats)
+    return {
+        "minutes": minutes,
+        "characters": len(text),
+        "preprocess_s": time_call(lambda: preprocess_documents(url, docs), repeats),
+        "tokens_before": stats.tokens_before,
+        "tokens_after": stats.tokens_after,
+        "chunks": len(chunks),
+        "chunking_mb_per_s": len(text) / 1e6 / split_seconds if split_seconds else None,
+        "strategy": summarizer.choose_strategy(stats.tokens_after),
+        "summarize_s": end_to_end,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, nargs="+", default=TRANSCRIPT_MINUTES,
+                        help="Fixture transcript lengths in minutes")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency per call (seconds)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    from database import SummaryDatabase
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SummaryDatabase(os.path.join(tmp, "bench.db"))
+        transcripts = []
+        for minutes in args.minutes:
+            result = bench_transcript(minutes, args.latency, args.repeats, db)
+            transcripts.append(result)
+            print(f"{minutes:>4} min: {result['tokens_before']:>7,} -> {result['tokens_after']:>7,} tokens, "
+                  f"{result['chunks']:>3} chunks, split {result['chunking_mb_per_s']:.1f} MB/s, "
+                  f"summarize {result['summarize_s'] * 1000:.0f} ms ({result['strategy']})")
+        db.close()
+
+    path = write_results("pipeline", {"fake_llm_latency_s": args.latency, "transcripts": transcripts})
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
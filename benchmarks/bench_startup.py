@@ -0,0 +1,89 @@
+"""Measure app cold start and per-interaction rerun latency.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --reruns 20
+
+Reports:
+- import time of the modules app.py loads at startup, versus eagerly importing
+  the heavy LangChain/loader stack, each in a fresh interpreter
+- the first (cold) run of app.py and the average warm rerun, via
+  streamlit.testing.v1.AppTest
+Results are printed and written as JSON to benchmarks/results/.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fixtures import REPO_ROOT, write_results
+
+# What app.py imports at startup
+STARTUP_IMPORTS = ["streamlit", "database", "cache", "pipeline"]
+# What app.py used to import eagerly at startup
+EAGER_IMPORTS = STARTUP_IMPORTS + [
+    "langchain.prompts", "langchain_groq", "langchain_huggingface",
+    "langchain_community.document_loaders", "summarizer", "document_store", "jobs", "llm_router",
+]
+
+
+def time_imports(modules, repeats: int) -> dict:
+    """Median wall time to import modules in a fresh interpreter"""
+    code = ("import time; start = time.perf_counter(); "
+            + "; ".join(f"import {module}" for module in modules)
+            + "; print(time.perf_counter() - start)")
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return {"median_s": statistics.median(samples), "samples_s": samples}
+
+
+def time_app_runs(reruns: int) -> dict:
+    """Cold first run and warm reruns of app.py"""
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(REPO_ROOT)
+    app = AppTest.from_file("app.py", default_timeout=60)
+    start = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - start)
+    return {
+        "cold_run_s": cold,
+        "warm_rerun_median_s": statistics.median(warm) if warm else None,
+        "warm_rerun_p95_s": sorted(warm)[int(0.95 * (len(warm) - 1))] if warm else None,
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per import measurement")
+    parser.add_argument("--reruns", type=int, default=20, help="Warm reruns of app.py")
+    args = parser.parse_args()
+
+    results = {
+        "startup_imports": time_imports(STARTUP_IMPORTS, args.repeats),
+        "eager_imports": time_imports(EAGER_IMPORTS, args.repeats),
+        "app": time_app_runs(args.reruns),
+    }
+    path = write_results("startup", results)
+
+    print(f"Startup imports: {results['startup_imports']['median_s'] * 1000:.0f} ms "
+          f"(eager stack: {results['eager_imports']['median_s'] * 1000:.0f} ms)")
+    print(f"Cold app run:    {results['app']['cold_run_s'] * 1000:.0f} ms")
+    if results['app']['warm_rerun_median_s'] is not None:
+        print(f"Warm rerun:      {results['app']['warm_rerun_median_s'] * 1000:.0f} ms median")
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Deterministic fixtures shared by the benchmark scripts.
+
+- fixture transcripts of a given length in minutes, with rolling-caption
+  repeats and fillers like real YouTube auto-captions
+- synthetic summaries databases of a given row count, built once and kept in
+  benchmarks/data/
+- a JSON results writer
+"""
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", "data")
+sys.path.insert(0, REPO_ROOT)
+
+# Spoken English runs at roughly 150 words per minute
+WORDS_PER_MINUTE = 150
+TRANSCRIPT_MINUTES = [1, 10, 30, 60, 180]
+DB_ROWS = [1_000, 100_000, 1_000_000]
+
+VOCABULARY = (
+    "cache database query index latency throughput model token summary transcript video channel "
+    "python streamlit langchain sqlite memory request response network server client batch stream "
+    "performance benchmark search export history page row column table vector embedding prompt "
+    "the a of and to in is that it for on with as this was we you are be at by have from or"
+).split()
+FILLERS = ["um", "uh", "you know", "[Music]"]
+CHANNELS = [f"Channel {i}" for i in range(50)]
+MODELS = ["mistralai/Mistral-7B-Instruct-v0.3", "groq/llama-3.1-8b-instant", "local/fake"]
+
+
+def make_text(words: int, seed: int = 0) -> str:
+    """Pseudo-random sentences over a fixed vocabulary"""
+    rng = random.Random(seed)
+    sentences, written = [], 0
+    while written < words:
+        length = rng.randint(8, 20)
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        written += length
+    return " ".join(sentences)
+
+
+def make_transcript(minutes: int, seed: int = 0) -> str:
+    """A caption-like transcript: fillers and repeated caption segments, little punctuation"""
+    rng = random.Random(seed)
+    words = make_text(minutes * WORDS_PER_MINUTE, seed).replace(".", "").lower().split()
+    output = []
+    for i in range(0, len(words), 7):
+        segment = words[i:i + 7]
+        output.extend(segment)
+        if rng.random() < 0.15:
+            output.extend(segment[-4:])
+        if rng.random() < 0.1:
+            output.append(rng.choice(FILLERS))
+    return " ".join(output)
+
+
+def make_documents(minutes: int, seed: int = 0) -> List:
+    """Fixture transcript wrapped as the documents YoutubeLoader returns"""
+    from langchain_core.documents import Document
+    metadata = {"title": f"Fixture video ({minutes} min)", "length": minutes * 60, "author": "Benchmarks"}
+    return [Document(page_content=make_transcript(minutes, seed), metadata=metadata)]
+
+
+class FixtureStore:
+    """Stands in for DocumentStore so summarize_url gets fixture documents instead of fetching"""
+
+    def __init__(self, docs: List):
+        self.docs = docs
+
+    def load(self, url: str, fetch) -> List:
+        return self.docs
+
+
+def synthetic_summary_rows(count: int, start: int = 0) -> List[Dict]:
+    rng = random.Random(start)
+    rows = []
+    for i in range(start, start + count):
+        summary_text = make_text(rng.randint(100, 400), seed=i)
+        rows.append({
+            "url": f"https://www.youtube.com/watch?v=bench{i:08d}",
+            "title": f"Benchmark video {i}: " + make_text(6, seed=-i - 1),
+            "summary_text": summary_text,
+            "summary_length": rng.choice(["Short", "Medium", "Long"]),
+            "summary_tone": "Professional",
+            "model_used": rng.choice(MODELS),
+            "video_duration": rng.randint(60, 3 * 3600),
+            "video_channel": rng.choice(CHANNELS),
+        })
+    return rows
+
+
+def synthetic_database(rows: int, batch_size: int = 5000):
+    """Open (building on first use) benchmarks/data/summaries_<rows>.db with that many summaries"""
+    from database import SummaryDatabase
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db = SummaryDatabase(os.path.join(DATA_DIR, f"summaries_{rows}.db"))
+    existing = db.get_summary_count()
+    if existing < rows:
+        print(f"Building synthetic database with {rows:,} rows (one-time)...")
+        for start in range(existing, rows, batch_size):
+            db.save_summaries_many(synthetic_summary_rows(min(batch_size, rows - start), start))
+    return db
+
+
+def write_results(name: str, results: Dict) -> str:
+    """Write results as JSON to benchmarks/results/<name>_<timestamp>.json and return the path"""
+    results = dict({"benchmark": name, "timestamp": datetime.now().isoformat(),
+                    "python": sys.version.split()[0]}, **results)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
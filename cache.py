@@ -0,0 +1,126 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from database import SummaryDatabase
+from tracing import record_cache
+
+
+YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com")
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """Extract the 11 character video ID from any common YouTube URL form"""
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    path_parts = [part for part in parsed.path.split("/") if part]
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = path_parts[0] if path_parts else None
+    elif host in YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        elif len(path_parts) >= 2 and path_parts[0] in ("shorts", "embed", "live", "v"):
+            candidate = path_parts[1]
+
+    if candidate and VIDEO_ID_PATTERN.match(candidate):
+        return candidate
+    return None
+
+
+def normalize_url(url: str) -> str:
+    """Map equivalent URLs to one canonical form (youtube:<id> for videos)"""
+    video_id = extract_video_id(url)
+    if video_id:
+        return f"youtube:{video_id}"
+
+    parsed = urlparse(url.strip())
+    path = parsed.path.rstrip("/") or "/"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{parsed.scheme.lower()}://{(parsed.netloc or '').lower()}{path}{query}"
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 hex digest of a piece of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(url: str, content: str, prompt_template: str,
+                   word_count: int, model: str, extra: Optional[Dict] = None) -> str:
+    """Build a content-addressed key for a summary request; extra fields (e.g. a time range) are hashed too"""
+    key_parts = {
+        "url": normalize_url(url),
+        "content": hash_text(content),
+        "prompt": hash_text(prompt_template),
+        "word_count": word_count,
+        "model": model,
+    }
+    if extra:
+        key_parts.update(extra)
+    return hash_text(json.dumps(key_parts, sort_keys=True))
+
+
+class SummaryCache:
+    """Two-tier summary cache: an in-memory LRU in front of the summary_cache table"""
+
+    def __init__(self, db: Optional[SummaryDatabase] = None, max_entries: int = 256,
+                 max_persistent_entries: int = 5000, ttl_seconds: int = 7 * 24 * 3600):
+        self.db = db or SummaryDatabase()
+        self.max_entries = max_entries
+        self.max_persistent_entries = max_persistent_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                summary_text, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    record_cache(hit=True)
+                    return summary_text
+                del self._memory[key]
+
+        cached = self.db.get_cached_summary(key, self.ttl_seconds)
+        if cached is None:
+            self.misses += 1
+            record_cache(hit=False)
+            return None
+
+        summary_text, stored_at = cached
+        self._remember(key, summary_text, stored_at)
+        self.hits += 1
+        record_cache(hit=True)
+        return summary_text
+
+    def set(self, key: str, summary_text: str, url: str = None) -> None:
+        """Store a summary in both tiers"""
+        self._remember(key, summary_text, time.time())
+        if self.db.save_cached_summary(key, summary_text, url):
+            self.db.evict_cached_summaries(self.max_persistent_entries, self.ttl_seconds)
+
+    def clear(self) -> None:
+        """Drop the in-memory tier (the persistent tier expires via TTL)"""
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key: str, summary_text: str, stored_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (summary_text, stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
@@ -1,20 +1,168 @@
 import sqlite3
+import csv
+import gzip
+import io
 import json
+import logging
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+import re
+import threading
+import time
+
+from text_codec import TextCodec, train_dictionary
+from tracing import timed_query
+
+
+logger = logging.getLogger(__name__)
+
+# Columns of a full summaries row, in the order every summary tuple uses
+SUMMARY_FIELDS = ["id", "url", "title", "summary_text", "summary_length", "summary_tone",
+                  "model_used", "created_at", "word_count", "video_duration", "video_channel"]
+
+
+def summary_columns(prefix: str = "") -> str:
+    """SELECT list of SUMMARY_FIELDS; summary_text is stored compressed (see text_codec) and
+    read through the decompress() SQL function registered on every connection
+    """
+    return ", ".join(f"decompress({prefix}{field}) AS {field}" if field == "summary_text" else prefix + field
+                     for field in SUMMARY_FIELDS)
+
+
+SUMMARY_COLUMNS = summary_columns()
+# Columns shown in history lists; the summary body is loaded separately on demand
+SUMMARY_LIST_COLUMNS = ("id, url, title, summary_length, summary_tone, model_used, "
+                        "created_at, word_count, video_duration, video_channel")
+
+# One row per video or page; repeated saves keep the latest known metadata
+SOURCE_CONFLICT_SQL = '''
+    ON CONFLICT (source_key) DO UPDATE SET
+        url = excluded.url,
+        title = COALESCE(excluded.title, title),
+        video_channel = COALESCE(excluded.video_channel, video_channel),
+        video_duration = COALESCE(excluded.video_duration, video_duration),
+        updated_at = CURRENT_TIMESTAMP
+'''
+UPSERT_SOURCE_SQL = '''
+    INSERT INTO sources (source_key, video_id, url, title, video_channel, video_duration)
+    VALUES (?, ?, ?, ?, ?, ?)
+''' + SOURCE_CONFLICT_SQL
+SEARCH_INSERT_SQL = 'INSERT INTO summaries_fts (rowid, url, title, summary_text) VALUES (?, ?, ?, ?)'
+# Every stored summaries column, for copying rows between databases
+SUMMARY_STORAGE_COLUMNS = ", ".join(SUMMARY_FIELDS + ["trace", "variant_group", "source_id"])
+
+# summary_stats dimensions and the value each summaries row counts under ({row} is new or old)
+STATS_DIMENSIONS = {
+    "total": "''",
+    "channel": "COALESCE({row}.video_channel, '')",
+    "model": "COALESCE({row}.model_used, '')",
+}
+# Bounds how stale cached stats can be after writes from another process
+STATS_TTL_SECONDS = 30.0
+
+
+def stats_add_sql(row: str = "new") -> str:
+    """Trigger statements counting a summaries row into summary_stats"""
+    return "".join(f'''
+        INSERT INTO summary_stats (dimension, value, summaries, words)
+        VALUES ('{dimension}', {value.format(row=row)}, 1, COALESCE({row}.word_count, 0))
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            summaries = summaries + 1, words = words + excluded.words;'''
+        for dimension, value in STATS_DIMENSIONS.items())
+
+
+def stats_remove_sql(row: str = "old") -> str:
+    """Trigger statements taking a summaries row out of summary_stats (emptied channels and models are dropped)"""
+    statements = []
+    for dimension, value in STATS_DIMENSIONS.items():
+        condition = f"dimension = '{dimension}' AND value = {value.format(row=row)}"
+        statements.append(f'''
+        UPDATE summary_stats SET summaries = summaries - 1, words = words - COALESCE({row}.word_count, 0)
+        WHERE {condition};''')
+        if dimension != "total":
+            statements.append(f"\n        DELETE FROM summary_stats WHERE {condition} AND summaries <= 0;")
+    return "".join(statements)
+
+
+def source_row(url: str, title: str = None, video_channel: str = None, video_duration=None) -> Tuple:
+    """Parameters of UPSERT_SOURCE_SQL for a URL (keyed by its normalized form, youtube:<id> for videos)"""
+    from cache import extract_video_id, normalize_url
+    return (normalize_url(url), extract_video_id(url), url, title, video_channel,
+            str(video_duration) if video_duration is not None else None)
+
 
 class SummaryDatabase:
     """Database manager for storing and retrieving YouTube video summaries"""
     
+    # Schema setup runs once per database file per process, not once per instance
+    _initialized_paths = set()
+    # Schema version stored in PRAGMA user_version: the number of MIGRATIONS applied
+    MIGRATIONS = ("_migrate_summary_columns", "_migrate_sources", "_migrate_compression",
+                  "_migrate_summary_stats", "_migrate_job_owner", "_migrate_search_content")
+    # One codec (and set of loaded dictionaries) per database file
+    _codecs = {}
+    _init_lock = threading.Lock()
+    # get_summary_stats results per (database file, top, recent): (expires_at, stats)
+    _stats_cache = {}
+    _stats_lock = threading.Lock()
+    # Database files whose FTS5 index was set up (SQLite builds without FTS5 fall back to LIKE)
+    _search_index_paths = set()
+    
     def __init__(self, db_path: str = "summaries.db"):
         self.db_path = db_path
-        self.init_database()
+        # One long-lived connection per thread (sqlite3 connections are not shareable across threads)
+        self._local = threading.local()
+        with SummaryDatabase._init_lock:
+            key = os.path.abspath(db_path)
+            if key not in SummaryDatabase._codecs:
+                SummaryDatabase._codecs[key] = TextCodec(load_dictionary=self._load_dictionary)
+            self.codec = SummaryDatabase._codecs[key]
+            if key not in SummaryDatabase._initialized_paths:
+                self.init_database()
+                SummaryDatabase._initialized_paths.add(key)
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=256)
+            # WAL lets readers proceed while a writer commits
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-16000')
+            conn.execute('PRAGMA mmap_size=134217728')
+            # Used by reads to see plain text; schema objects must not depend on it (see init_search_index)
+            conn.create_function('decompress', 1, self.codec.decompress, deterministic=True)
+            self._local.conn = conn
+        return conn
+    
+    def _rollback(self):
+        """Roll back a failed transaction so the thread's connection stays usable"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+    
+    def _invalidate_stats(self, db_path: Optional[str] = None):
+        """Drop cached get_summary_stats results after a write to db_path (default: this database)"""
+        key = os.path.abspath(db_path or self.db_path)
+        with SummaryDatabase._stats_lock:
+            for cache_key in [cache_key for cache_key in SummaryDatabase._stats_cache if cache_key[0] == key]:
+                del SummaryDatabase._stats_cache[cache_key]
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
     
     def init_database(self):
         """Initialize the database with required tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS summaries (
@@ -28,239 +176,1343 @@ class SummaryDatabase:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     word_count INTEGER,
                     video_duration TEXT,
-                    video_channel TEXT
+                    video_channel TEXT,
+                    trace TEXT,
+                    variant_group TEXT,
+                    source_id INTEGER REFERENCES sources (id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS summary_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    url TEXT,
+                    summary_text TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_summaries_created_at
+                ON summaries (created_at DESC, id DESC)
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_summaries_url ON summaries (url)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    validated_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT,
+                    owner TEXT,
+                    url TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    summary_id INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs (session_id, id DESC)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS segment_summaries (
+                    cache_key TEXT PRIMARY KEY,
+                    video_key TEXT NOT NULL,
+                    start_seconds INTEGER NOT NULL,
+                    end_seconds INTEGER NOT NULL,
+                    title TEXT,
+                    summary_text TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_segment_summaries_video
+                ON segment_summaries (video_key, start_seconds)
+            ''')
             conn.commit()
+            self.migrate()
+            self._load_active_dictionary()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error initializing database: %s", e)
+        self.init_search_index()
+    
+    def migrate(self):
+        """Apply the migrations newer than the database's PRAGMA user_version, one transaction each"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        for number in range(version + 1, len(self.MIGRATIONS) + 1):
+            cursor.execute('BEGIN')
+            getattr(self, self.MIGRATIONS[number - 1])(cursor)
+            cursor.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+            logger.info("Migrated %s to schema version %d", self.db_path, number)
+    
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+        """ALTER TABLE ADD COLUMN for each of columns ({name: type}) the table does not have yet"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in columns.items():
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+    
+    def _migrate_summary_columns(self, cursor):
+        """Version 1: request traces and length variant groups"""
+        self._add_missing_columns(cursor, 'summaries', {'trace': 'TEXT', 'variant_group': 'TEXT'})
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_summaries_variant_group ON summaries (variant_group)')
+    
+    def _migrate_sources(self, cursor):
+        """Version 2: canonical sources (videos and pages) referenced by summaries.source_id"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sources (
+                id INTEGER PRIMARY KEY,
+                source_key TEXT NOT NULL UNIQUE,
+                video_id TEXT,
+                url TEXT NOT NULL,
+                title TEXT,
+                video_channel TEXT,
+                video_duration TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._add_missing_columns(cursor, 'summaries', {'source_id': 'INTEGER REFERENCES sources (id)'})
+        # Backfill in batches, oldest first so each source keeps the newest metadata
+        reader = cursor.connection.cursor()
+        reader.execute('''
+            SELECT url, title, video_channel, video_duration FROM summaries
+            WHERE source_id IS NULL ORDER BY id
+        ''')
+        url_sources = {}
+        while True:
+            batch = reader.fetchmany(5000)
+            if not batch:
+                break
+            rows = [source_row(*row) for row in batch]
+            source_ids = self._upsert_sources(cursor, rows)
+            url_sources.update((row[2], source_ids[row[0]]) for row in rows)
+        cursor.executemany('UPDATE summaries SET source_id = ? WHERE url = ? AND source_id IS NULL',
+                           [(source_id, url) for url, source_id in url_sources.items()])
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_summaries_source
+            ON summaries (source_id, created_at DESC, id DESC)
+        ''')
+    
+    def _migrate_compression(self, cursor):
+        """Version 3: compressed text columns and their dictionaries"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                active INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        ''')
+        # init_search_index recreates these and fills the index
+        for trigger in ('summaries_fts_insert', 'summaries_fts_delete', 'summaries_fts_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS summaries_fts')
+    
+    def _migrate_summary_stats(self, cursor):
+        """Version 4: summary_stats aggregates (total, per channel, per model), kept current by triggers"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS summary_stats (
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                summaries INTEGER NOT NULL DEFAULT 0,
+                words INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            ) WITHOUT ROWID
+        ''')
+        # Top channels and models without sorting every group
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_summary_stats_count ON summary_stats (dimension, summaries DESC)')
+        cursor.execute('DELETE FROM summary_stats')
+        for dimension, value in STATS_DIMENSIONS.items():
+            value = value.format(row="summaries")
+            cursor.execute(f'''
+                INSERT INTO summary_stats (dimension, value, summaries, words)
+                SELECT '{dimension}', {value}, COUNT(*), COALESCE(SUM(word_count), 0) FROM summaries
+                GROUP BY {value}
+            ''')
+        cursor.execute("INSERT OR IGNORE INTO summary_stats (dimension, value) VALUES ('total', '')")
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS summary_stats_insert AFTER INSERT ON summaries BEGIN {stats_add_sql()} END')
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS summary_stats_delete AFTER DELETE ON summaries BEGIN {stats_remove_sql()} END')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS summary_stats_update AFTER UPDATE OF word_count, video_channel, model_used
+            ON summaries BEGIN {stats_remove_sql()} {stats_add_sql()} END
+        ''')
+    
+    def _migrate_job_owner(self, cursor):
+        """Version 5: the process that runs each job, so a restart only fails its own jobs"""
+        self._add_missing_columns(cursor, 'jobs', {'owner': 'TEXT'})
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_unfinished ON jobs (owner) WHERE status IN ('queued', 'running')")
+    
+    def _migrate_search_content(self, cursor):
+        """Version 6: the FTS index keeps its own copy of the text instead of reading it through decompress()"""
+        # init_search_index recreates the index and its triggers and fills it
+        for trigger in ('summaries_fts_insert', 'summaries_fts_delete', 'summaries_fts_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS summaries_fts')
+        cursor.execute('DROP VIEW IF EXISTS summaries_content')
+    
+    def _load_dictionary(self, dictionary_id: int) -> Optional[bytes]:
+        """Read one compression dictionary on a short-lived connection (safe inside SQL functions)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            row = conn.execute('SELECT data FROM compression_dictionaries WHERE id = ?', (dictionary_id,)).fetchone()
+            return row[0] if row else None
+        finally:
             conn.close()
+    
+    def _load_active_dictionary(self):
+        """Compress new rows with the most recently trained dictionary, if any"""
+        if not self.codec.available:
+            return
+        cursor = self._get_connection().cursor()
+        cursor.execute('SELECT data FROM compression_dictionaries WHERE active = 1 ORDER BY created_at DESC LIMIT 1')
+        row = cursor.fetchone()
+        if row:
+            self.codec.add_dictionary(row[0], active=True)
+    
+    @staticmethod
+    def _get_source_ids(cursor, source_keys: Iterable[str]) -> Dict[str, int]:
+        """{source_key: id} for existing sources"""
+        source_keys = list(source_keys)
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(source_keys), 500):
+            batch = source_keys[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f'SELECT source_key, id FROM sources WHERE source_key IN ({placeholders})', batch)
+            found.update(cursor.fetchall())
+        return found
+    
+    def _upsert_sources(self, cursor, rows: List[Tuple]) -> Dict[str, int]:
+        """Upsert source_row() tuples and return {source_key: id}"""
+        cursor.executemany(UPSERT_SOURCE_SQL, rows)
+        return self._get_source_ids(cursor, {row[0] for row in rows})
+    
+    def init_search_index(self):
+        """Create the FTS5 index over summaries and the triggers that keep it in sync.
+
+        The index stores its own copy of the text. Triggers only read plain
+        columns, so connections without the decompress() function (sqlite3
+        shell, other tools) can still write to summaries: rows whose text is
+        stored plain are indexed by the insert trigger, and the methods that
+        store compressed text index it themselves (see _index_for_search).
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'summaries_fts'")
+            exists = cursor.fetchone() is not None
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                    url, title, summary_text,
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS summaries_fts_insert AFTER INSERT ON summaries
+                WHEN typeof(new.summary_text) != 'blob'
+                BEGIN
+                    INSERT INTO summaries_fts(rowid, url, title, summary_text)
+                    VALUES (new.id, new.url, new.title, new.summary_text);
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS summaries_fts_delete AFTER DELETE ON summaries BEGIN
+                    DELETE FROM summaries_fts WHERE rowid = old.id;
+                END
+            ''')
+            # Compressed text is only written by compress_summaries, which keeps the text itself unchanged
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS summaries_fts_update AFTER UPDATE OF url, title, summary_text ON summaries
+                WHEN old.url IS NOT new.url OR old.title IS NOT new.title
+                    OR (typeof(new.summary_text) != 'blob' AND old.summary_text IS NOT new.summary_text)
+                BEGIN
+                    UPDATE summaries_fts SET url = new.url, title = new.title,
+                        summary_text = CASE WHEN typeof(new.summary_text) = 'blob' THEN summary_text
+                                            ELSE new.summary_text END
+                    WHERE rowid = new.id;
+                END
+            ''')
+            if not exists:
+                # bm25 column weights: url, title, summary_text
+                cursor.execute("INSERT INTO summaries_fts(summaries_fts, rank) VALUES ('rank', 'bm25(2.0, 10.0, 1.0)')")
+                # Index rows that were saved before the FTS table existed
+                cursor.execute('''
+                    INSERT INTO summaries_fts(rowid, url, title, summary_text)
+                    SELECT id, url, title, decompress(summary_text) FROM summaries
+                ''')
+            conn.commit()
+            SummaryDatabase._search_index_paths.add(os.path.abspath(self.db_path))
         except Exception as e:
-            print(f"Error initializing database: {e}")
+            self._rollback()
+            logger.warning("Error initializing search index (falling back to LIKE search): %s", e)
+    
+    def _index_for_search(self, cursor, rows: List[Tuple], stored: List) -> None:
+        """Add (id, url, title, summary_text) rows to the FTS index where their stored text is compressed
+        (the insert trigger indexes the others)"""
+        if os.path.abspath(self.db_path) not in SummaryDatabase._search_index_paths:
+            return
+        rows = [row for row, value in zip(rows, stored) if isinstance(value, bytes)]
+        if rows:
+            cursor.executemany(SEARCH_INSERT_SQL, rows)
     
     def save_summary(self, url: str, title: str, summary_text: str, 
                     summary_length: str = "Medium", summary_tone: str = "Professional",
                     model_used: str = "mistralai/Mistral-7B-Instruct-v0.3",
-                    video_duration: str = None, video_channel: str = None) -> bool:
+                    video_duration: str = None, video_channel: str = None,
+                    variant_group: str = None) -> bool:
         """Save a new summary to the database"""
+        return self.insert_summary(url, title, summary_text, summary_length, summary_tone,
+                                   model_used, video_duration, video_channel, variant_group) is not None
+    
+    @timed_query
+    def insert_summary(self, url: str, title: str, summary_text: str, 
+                       summary_length: str = "Medium", summary_tone: str = "Professional",
+                       model_used: str = "mistralai/Mistral-7B-Instruct-v0.3",
+                       video_duration: str = None, video_channel: str = None,
+                       variant_group: str = None) -> Optional[int]:
+        """Save a new summary to the database and return its id (None on failure).
+
+        Summaries of the same content at different lengths share a variant_group.
+        The video or page is upserted into sources in the same transaction.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             word_count = len(summary_text.split())
+            source = source_row(url, title, video_channel, video_duration)
+            source_id = self._upsert_sources(cursor, [source])[source[0]]
+            stored = self.codec.compress(summary_text)
             
             cursor.execute('''
                 INSERT INTO summaries (url, title, summary_text, summary_length, 
-                                    summary_tone, model_used, word_count, video_duration, video_channel)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (url, title, summary_text, summary_length, summary_tone, 
-                  model_used, word_count, video_duration, video_channel))
+                                    summary_tone, model_used, word_count, video_duration, video_channel,
+                                    variant_group, source_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (url, title, stored, summary_length, summary_tone, 
+                  model_used, word_count, video_duration, video_channel, variant_group, source_id))
+            summary_id = cursor.lastrowid
+            self._index_for_search(cursor, [(summary_id, url, title, summary_text)], [stored])
             
             conn.commit()
-            conn.close()
-            return True
+            self._invalidate_stats()
+            return summary_id
         except Exception as e:
-            print(f"Error saving summary: {e}")
+            self._rollback()
+            logger.error("Error saving summary: %s", e)
+            return None
+    
+    def save_summaries_many(self, summaries: List[Dict]) -> int:
+        """Save many summaries in a single transaction, returning the number of rows written"""
+        return len(self.insert_summaries(summaries))
+    
+    @timed_query
+    def insert_summaries(self, summaries: List[Dict]) -> List[int]:
+        """Save many summaries in a single transaction and return their ids, in order (empty on failure).
+
+        Their sources are upserted with one statement per distinct video or page.
+        """
+        if not summaries:
+            return []
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            sources = [source_row(s["url"], s.get("title"), s.get("video_channel"), s.get("video_duration"))
+                       for s in summaries]
+            source_ids = self._upsert_sources(cursor, list({source[0]: source for source in sources}.values()))
+            stored = [self.codec.compress(s["summary_text"]) for s in summaries]
+            rows = [
+                (s["url"], s.get("title"), text, s.get("summary_length", "Medium"),
+                 s.get("summary_tone", "Professional"),
+                 s.get("model_used", "mistralai/Mistral-7B-Instruct-v0.3"),
+                 len(s["summary_text"].split()), s.get("video_duration"), s.get("video_channel"),
+                 json.dumps(s["trace"]) if s.get("trace") else None, s.get("variant_group"),
+                 source_ids[source[0]])
+                for s, source, text in zip(summaries, sources, stored)
+            ]
+            # The write transaction is open (sources were upserted), so the new ids follow this one
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM summaries')
+            last_id = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO summaries (url, title, summary_text, summary_length, 
+                                    summary_tone, model_used, word_count, video_duration, video_channel,
+                                    trace, variant_group, source_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            cursor.execute('SELECT id FROM summaries WHERE id > ? ORDER BY id', (last_id,))
+            ids = [row[0] for row in cursor.fetchall()]
+            self._index_for_search(cursor, [(summary_id, s["url"], s.get("title"), s["summary_text"])
+                                            for summary_id, s in zip(ids, summaries)], stored)
+            conn.commit()
+            self._invalidate_stats()
+            return ids
+        except Exception as e:
+            self._rollback()
+            logger.error("Error saving summaries: %s", e)
+            return []
+    
+    @timed_query
+    def set_summary_trace(self, summary_id: int, trace: Dict) -> bool:
+        """Attach a request trace (stage timings, tokens, cache and DB stats) to a summary"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('UPDATE summaries SET trace = ? WHERE id = ?', (json.dumps(trace), summary_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            self._rollback()
+            logger.error("Error saving summary trace: %s", e)
             return False
     
+    @timed_query
+    def get_summary_variants(self, summary_id: int) -> List[Tuple[int, str]]:
+        """(id, summary_length) of the other summaries in the same variant group, oldest first"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT v.id, v.summary_length FROM summaries s
+                JOIN summaries v ON v.variant_group = s.variant_group AND v.id != s.id
+                WHERE s.id = ?
+                ORDER BY v.id
+            ''', (summary_id,))
+            return cursor.fetchall()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summary variants: %s", e)
+            return []
+    
+    @timed_query
+    def get_recent_traces(self, limit: int = 200) -> List[Dict]:
+        """Traces of the most recent traced summaries, newest first"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT trace FROM summaries
+                WHERE trace IS NOT NULL
+                ORDER BY created_at DESC, id DESC LIMIT ?
+            ''', (limit,))
+            return [json.loads(row[0]) for row in cursor.fetchall()]
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summary traces: %s", e)
+            return []
+    
+    @timed_query
+    def get_summaries_for_url(self, url: str, limit: int = 100) -> List[Tuple]:
+        """Summaries (list columns, newest first) of the video or page behind url, in any URL form"""
+        from cache import normalize_url
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {SUMMARY_LIST_COLUMNS} FROM summaries
+                WHERE source_id = (SELECT id FROM sources WHERE source_key = ?)
+                ORDER BY created_at DESC, id DESC LIMIT ?
+            ''', (normalize_url(url), limit))
+            return cursor.fetchall()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summaries for URL: %s", e)
+            return []
+    
+    @timed_query
+    def get_summarized_source_keys(self) -> set:
+        """Normalized URLs (see cache.normalize_url) of every video or page that has a summary"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT source_key FROM sources s
+                WHERE EXISTS (SELECT 1 FROM summaries WHERE source_id = s.id)
+            ''')
+            return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summarized sources: %s", e)
+            return set()
+    
+    def iter_summaries(self, batch_size: int = 500) -> Iterator[Tuple]:
+        """Stream all summaries (newest first) from a cursor without materializing the table"""
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute(f'SELECT {SUMMARY_COLUMNS} FROM summaries ORDER BY created_at DESC, id DESC')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        except Exception as e:
+            self._rollback()
+            logger.error("Error streaming summaries: %s", e)
+    
+    def iter_summary_batches_after(self, last_id: int, batch_size: int = 50000) -> Iterator[List[Tuple]]:
+        """Stream summaries with id greater than last_id in ascending id batches"""
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute(f'SELECT {SUMMARY_COLUMNS} FROM summaries WHERE id > ? ORDER BY id', (last_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        except Exception as e:
+            self._rollback()
+            logger.error("Error streaming summaries: %s", e)
+    
     def get_all_summaries(self) -> List[Tuple]:
         """Retrieve all summaries from the database ordered by creation date"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM summaries ORDER BY created_at DESC')
+            cursor.execute(f'SELECT {SUMMARY_COLUMNS} FROM summaries ORDER BY created_at DESC')
             summaries = cursor.fetchall()
-            conn.close()
             return summaries
         except Exception as e:
-            print(f"Error retrieving summaries: {e}")
+            self._rollback()
+            logger.error("Error retrieving summaries: %s", e)
+            return []
+    
+    @timed_query
+    def get_summaries_page(self, limit: int = 20,
+                           after: Optional[Tuple[str, int]] = None) -> List[Tuple]:
+        """Get one page of history (list columns only, newest first) using keyset pagination.
+
+        Pass the (created_at, id) of the last row of the previous page as `after`
+        to fetch the next page.
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            if after is None:
+                cursor.execute(f'''
+                    SELECT {SUMMARY_LIST_COLUMNS} FROM summaries
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (limit,))
+            else:
+                cursor.execute(f'''
+                    SELECT {SUMMARY_LIST_COLUMNS} FROM summaries
+                    WHERE (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (after[0], after[1], limit))
+            return cursor.fetchall()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summaries page: %s", e)
+            return []
+    
+    @timed_query
+    def get_summaries_by_ids(self, summary_ids: List[int]) -> List[Tuple]:
+        """Get list columns for the given summary ids, in the order given (missing ids are skipped)"""
+        if not summary_ids:
+            return []
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            placeholders = ",".join("?" * len(summary_ids))
+            cursor.execute(f'SELECT {SUMMARY_LIST_COLUMNS} FROM summaries WHERE id IN ({placeholders})',
+                           list(summary_ids))
+            rows = {row[0]: row for row in cursor.fetchall()}
+            return [rows[summary_id] for summary_id in summary_ids if summary_id in rows]
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summaries by id: %s", e)
             return []
     
+    @timed_query
+    def get_summary_text(self, summary_id: int) -> Optional[str]:
+        """Retrieve only the summary body for a specific summary"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT decompress(summary_text) FROM summaries WHERE id = ?', (summary_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving summary text: %s", e)
+            return None
+    
+    @timed_query
     def get_summary_by_id(self, summary_id: int) -> Optional[Tuple]:
         """Retrieve a specific summary by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM summaries WHERE id = ?', (summary_id,))
+            cursor.execute(f'SELECT {SUMMARY_COLUMNS} FROM summaries WHERE id = ?', (summary_id,))
             summary = cursor.fetchone()
-            conn.close()
             return summary
         except Exception as e:
-            print(f"Error retrieving summary by ID: {e}")
+            self._rollback()
+            logger.error("Error retrieving summary by ID: %s", e)
             return None
     
-    def search_summaries(self, query: str) -> List[Tuple]:
-        """Search summaries by URL, title, or content"""
+    @staticmethod
+    def build_fts_query(query: str) -> str:
+        """Turn a search box query into an FTS5 MATCH expression.
+
+        "quoted text" is matched as a phrase and word* as a prefix; every other
+        word is quoted so FTS5 operators in user input cannot break the query.
+        The last bare word is also treated as a prefix for search-as-you-type.
+        """
+        terms = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+            if phrase.strip():
+                terms.append('"' + phrase.replace('"', '') + '"')
+            elif word:
+                is_prefix = word.endswith("*")
+                word = word.rstrip("*").replace('"', '')
+                if word:
+                    terms.append(f'"{word}"' + ("*" if is_prefix else ""))
+        if terms and not terms[-1].endswith("*") and not query.rstrip().endswith('"'):
+            terms[-1] += "*"
+        return " ".join(terms)
+    
+    def search_summaries(self, query: str, limit: int = 100) -> List[Tuple]:
+        """Search summaries by URL, title, or content, best matches first"""
+        return [row for row, snippet in self.search_summaries_with_snippets(query, limit)]
+    
+    @timed_query
+    def search_summaries_with_snippets(self, query: str, limit: int = 100) -> List[Tuple[Tuple, str]]:
+        """Search summaries with BM25 ranking, returning (summary, highlighted snippet) pairs"""
+        fts_query = self.build_fts_query(query)
+        if not fts_query:
+            return []
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM summaries 
-                WHERE url LIKE ? OR title LIKE ? OR summary_text LIKE ?
+            # Rank and cut inside the FTS index first, then join only the top rows
+            cursor.execute(f'''
+                SELECT {summary_columns("s.")}, hits.snippet
+                FROM (
+                    SELECT rowid, rank, snippet(summaries_fts, 2, '**', '**', '…', 16) AS snippet
+                    FROM summaries_fts
+                    WHERE summaries_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ) AS hits
+                JOIN summaries s ON s.id = hits.rowid
+                ORDER BY hits.rank
+            ''', (fts_query, limit))
+            return [(row[:-1], row[-1]) for row in cursor.fetchall()]
+        except sqlite3.OperationalError as e:
+            self._rollback()
+            if "summaries_fts" not in str(e) and "fts5" not in str(e):
+                logger.error("Error searching summaries: %s", e)
+                return []
+            return [(row, row[3][:200]) for row in self._search_summaries_like(query, limit)]
+        except Exception as e:
+            self._rollback()
+            logger.error("Error searching summaries: %s", e)
+            return []
+    
+    def _search_summaries_like(self, query: str, limit: int) -> List[Tuple]:
+        """Substring search used when SQLite was built without FTS5"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {SUMMARY_COLUMNS} FROM summaries 
+                WHERE url LIKE ? OR title LIKE ? OR decompress(summary_text) LIKE ?
                 ORDER BY created_at DESC
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
+                LIMIT ?
+            ''', (f'%{query}%', f'%{query}%', f'%{query}%', limit))
             summaries = cursor.fetchall()
-            conn.close()
             return summaries
         except Exception as e:
-            print(f"Error searching summaries: {e}")
+            self._rollback()
+            logger.error("Error searching summaries: %s", e)
             return []
     
+    @timed_query
     def delete_summary(self, summary_id: int) -> bool:
         """Delete a specific summary by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM summaries WHERE id = ?', (summary_id,))
             conn.commit()
-            conn.close()
+            self._invalidate_stats()
             return True
         except Exception as e:
-            print(f"Error deleting summary: {e}")
+            self._rollback()
+            logger.error("Error deleting summary: %s", e)
             return False
     
     def clear_all_summaries(self) -> bool:
         """Clear all summaries from the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM summaries')
+            cursor.execute('DELETE FROM sources')
             conn.commit()
-            conn.close()
+            self._invalidate_stats()
             return True
         except Exception as e:
-            print(f"Error clearing summaries: {e}")
+            self._rollback()
+            logger.error("Error clearing summaries: %s", e)
             return False
     
+    @property
+    def archive_path(self) -> str:
+        """Archive database file next to this one (summaries.db -> summaries_archive.db)"""
+        root, extension = os.path.splitext(self.db_path)
+        return f"{root}_archive{extension or '.db'}"
+    
+    def open_archive(self) -> Optional["SummaryDatabase"]:
+        """The archive database (searchable like this one), or None if nothing was archived yet"""
+        if not os.path.exists(self.archive_path):
+            return None
+        return SummaryDatabase(self.archive_path)
+    
+    def archive_summaries(self, older_than_days: int, batch_size: int = 5000, vacuum: bool = True,
+                          on_archived: Optional[Callable[[List[int]], None]] = None) -> int:
+        """Move summaries older than older_than_days into the archive database, returning how many moved.
+
+        Rows keep their ids and compressed text (dictionaries are copied along),
+        and their sources are upserted into the archive. Each batch is its own
+        transaction so the hot database stays writable; on_archived (e.g.
+        SemanticIndex.remove) is called with the ids of each committed batch.
+        Stored documents not revalidated within the same period are dropped
+        (they are re-fetched on demand). With vacuum, the freed pages are
+        returned to the filesystem.
+        """
+        # Creates the archive schema on first use
+        SummaryDatabase(self.archive_path).close()
+        search_indexes = {os.path.abspath(self.db_path),
+                          os.path.abspath(self.archive_path)} <= SummaryDatabase._search_index_paths
+        cutoff = f"-{int(older_than_days)} days"
+        batch = f'''
+            SELECT id FROM main.summaries WHERE created_at < datetime('now', ?)
+            ORDER BY created_at, id LIMIT {int(batch_size)}
+        '''
+        # Archive source ids differ from the hot ones; match them by source_key
+        archive_source = '''(
+            SELECT a.id FROM archive.sources a JOIN main.sources m ON m.source_key = a.source_key
+            WHERE m.id = s.source_id
+        )'''
+        copy_columns = ", ".join(archive_source if column == "source_id" else "s." + column
+                                 for column in SUMMARY_STORAGE_COLUMNS.split(", "))
+        moved = 0
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+            try:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO archive.compression_dictionaries (id, data, active, created_at)
+                    SELECT id, data, 0, created_at FROM main.compression_dictionaries
+                ''')
+                conn.commit()
+                while True:
+                    cursor.execute(batch, (cutoff,))
+                    batch_ids = [row[0] for row in cursor.fetchall()]
+                    cursor.execute(f'''
+                        INSERT INTO archive.sources (source_key, video_id, url, title, video_channel, video_duration)
+                        SELECT source_key, video_id, url, title, video_channel, video_duration FROM main.sources
+                        WHERE id IN (SELECT source_id FROM main.summaries WHERE id IN ({batch}))
+                    ''' + SOURCE_CONFLICT_SQL, (cutoff,))
+                    cursor.execute(f'''
+                        INSERT INTO archive.summaries ({SUMMARY_STORAGE_COLUMNS})
+                        SELECT {copy_columns} FROM main.summaries s WHERE s.id IN ({batch})
+                    ''', (cutoff,))
+                    if search_indexes:
+                        # The archive's insert trigger only indexes plain text; copy the rest from the hot index
+                        cursor.execute(f'''
+                            INSERT INTO archive.summaries_fts (rowid, url, title, summary_text)
+                            SELECT f.rowid, f.url, f.title, f.summary_text FROM main.summaries_fts f
+                            JOIN main.summaries s ON s.id = f.rowid
+                            WHERE s.id IN ({batch}) AND typeof(s.summary_text) = 'blob'
+                        ''', (cutoff,))
+                    cursor.execute(f'DELETE FROM main.summaries WHERE id IN ({batch})', (cutoff,))
+                    count = cursor.rowcount
+                    conn.commit()
+                    if count <= 0:
+                        break
+                    moved += count
+                    if on_archived is not None:
+                        on_archived(batch_ids)
+                cursor.execute('DELETE FROM documents WHERE validated_at < ?',
+                               (time.time() - older_than_days * 86400,))
+                conn.commit()
+            finally:
+                # DETACH fails while a transaction is open; after an error, roll back first so the
+                # original error is the one reported
+                self._rollback()
+                try:
+                    cursor.execute('DETACH DATABASE archive')
+                except sqlite3.Error as e:
+                    logger.error("Error detaching the archive database: %s", e)
+                if moved:
+                    self._invalidate_stats()
+                    self._invalidate_stats(self.archive_path)
+            if vacuum and moved:
+                cursor.execute('VACUUM')
+                # In WAL mode VACUUM writes the new file through the log; fold it back in
+                cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            logger.info("Archived %d summaries older than %d days to %s", moved, older_than_days, self.archive_path)
+            return moved
+        except Exception as e:
+            self._rollback()
+            logger.error("Error archiving summaries: %s", e)
+            return moved
+    
+    def train_compression_dictionary(self, samples: int = 2000) -> Optional[int]:
+        """Train a zstd dictionary on recent summaries and compress new rows with it.
+
+        Returns the dictionary id, or None without zstandard or enough samples.
+        Run compress_summaries(recompress=True) afterwards to apply it to existing rows.
+        """
+        if not self.codec.available:
+            logger.warning("zstandard is not installed; summaries are compressed with zlib")
+            return None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT decompress(summary_text) FROM summaries ORDER BY id DESC LIMIT ?', (samples,))
+            data = train_dictionary([row[0] for row in cursor.fetchall()])
+            dictionary_id = self.codec.add_dictionary(data)
+            cursor.execute('UPDATE compression_dictionaries SET active = 0')
+            cursor.execute('''
+                INSERT OR REPLACE INTO compression_dictionaries (id, data, active, created_at)
+                VALUES (?, ?, 1, ?)
+            ''', (dictionary_id, data, time.time()))
+            conn.commit()
+            self.codec.add_dictionary(data, active=True)
+            return dictionary_id
+        except Exception as e:
+            self._rollback()
+            logger.error("Error training compression dictionary: %s", e)
+            return None
+    
+    def compress_summaries(self, recompress: bool = False, batch_size: int = 1000) -> int:
+        """Compress summaries stored as plain text, or every summary with recompress
+        (e.g. after training a dictionary). Returns the number of rows rewritten.
+
+        Rewriting does not touch the search index, since the text is unchanged.
+        """
+        rewritten, last_id = 0, 0
+        condition = "" if recompress else "AND typeof(summary_text) = 'text'"
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            while True:
+                cursor.execute(f'''
+                    SELECT id, decompress(summary_text) FROM summaries
+                    WHERE id > ? {condition} ORDER BY id LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                cursor.executemany('UPDATE summaries SET summary_text = ? WHERE id = ?',
+                                   [(self.codec.compress(text), summary_id) for summary_id, text in rows])
+                conn.commit()
+                rewritten += len(rows)
+            return rewritten
+        except Exception as e:
+            self._rollback()
+            logger.error("Error compressing summaries: %s", e)
+            return rewritten
+    
+    @timed_query
+    def get_storage_stats(self) -> Dict:
+        """File sizes of the hot and archive databases and how many summaries are compressed"""
+        def file_size(path: str) -> int:
+            return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        
+        stats = {"database_bytes": file_size(self.db_path), "archive_bytes": file_size(self.archive_path),
+                 "summaries": 0, "compressed": 0, "dictionary_id": self.codec.active_dictionary_id}
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE typeof(summary_text) = 'blob') FROM summaries")
+            stats["summaries"], stats["compressed"] = cursor.fetchone()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error reading storage stats: %s", e)
+        return stats
+    
+    @timed_query
     def get_summary_count(self) -> int:
         """Get the total number of summaries in the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM summaries')
-            count = cursor.fetchone()[0]
-            conn.close()
-            return count
+            # Maintained by the summary_stats triggers, so this does not scan the table
+            cursor.execute("SELECT summaries FROM summary_stats WHERE dimension = 'total'")
+            row = cursor.fetchone()
+            return row[0] if row else 0
         except Exception as e:
-            print(f"Error getting summary count: {e}")
+            self._rollback()
+            logger.error("Error getting summary count: %s", e)
             return 0
     
+    @timed_query
     def get_recent_summaries(self, limit: int = 5) -> List[Tuple]:
         """Get the most recent summaries"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM summaries ORDER BY created_at DESC LIMIT ?', (limit,))
+            cursor.execute(f'SELECT {SUMMARY_COLUMNS} FROM summaries ORDER BY created_at DESC LIMIT ?', (limit,))
             summaries = cursor.fetchall()
-            conn.close()
             return summaries
         except Exception as e:
-            print(f"Error getting recent summaries: {e}")
+            self._rollback()
+            logger.error("Error getting recent summaries: %s", e)
+            return []
+    
+    @timed_query
+    def get_summary_stats(self, top: int = 10, recent: int = 5) -> Dict:
+        """Totals, average length, the top channels and models, and the most recent summaries.
+
+        Channel and model entries are (name, summaries, average words); recent
+        rows use SUMMARY_LIST_COLUMNS. Everything is read from the
+        trigger-maintained summary_stats table and index seeks, so the cost does
+        not grow with the history, and the result is cached in-process until
+        the next write through this class (or STATS_TTL_SECONDS, for writes
+        made by other processes).
+        """
+        cache_key = (os.path.abspath(self.db_path), top, recent)
+        with SummaryDatabase._stats_lock:
+            cached = SummaryDatabase._stats_cache.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
+        stats = {"summaries": 0, "words": 0, "average_words": 0.0, "channels": [], "models": [], "recent": []}
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute("SELECT summaries, words FROM summary_stats WHERE dimension = 'total'")
+            row = cursor.fetchone()
+            if row:
+                stats["summaries"], stats["words"] = row
+                stats["average_words"] = row[1] / row[0] if row[0] else 0.0
+            for dimension, key in (("channel", "channels"), ("model", "models")):
+                cursor.execute('''
+                    SELECT value, summaries, words FROM summary_stats
+                    WHERE dimension = ? ORDER BY summaries DESC LIMIT ?
+                ''', (dimension, top))
+                stats[key] = [(value or None, count, words / count) for value, count, words in cursor.fetchall()]
+            cursor.execute(f'''
+                SELECT {SUMMARY_LIST_COLUMNS} FROM summaries ORDER BY created_at DESC, id DESC LIMIT ?
+            ''', (recent,))
+            stats["recent"] = cursor.fetchall()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error getting summary stats: %s", e)
+            return stats
+        with SummaryDatabase._stats_lock:
+            SummaryDatabase._stats_cache[cache_key] = (time.monotonic() + STATS_TTL_SECONDS, stats)
+        return stats
+    
+    @timed_query
+    def get_cached_summary(self, cache_key: str, max_age_seconds: float) -> Optional[Tuple[str, float]]:
+        """Look up a cached summary, returning (summary_text, created_at) if still fresh"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.execute('''
+                SELECT decompress(summary_text), created_at FROM summary_cache
+                WHERE cache_key = ? AND created_at >= ?
+            ''', (cache_key, now - max_age_seconds))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('UPDATE summary_cache SET last_accessed = ? WHERE cache_key = ?',
+                               (now, cache_key))
+                conn.commit()
+            return row
+        except Exception as e:
+            self._rollback()
+            logger.error("Error reading summary cache: %s", e)
+            return None
+    
+    @timed_query
+    def save_cached_summary(self, cache_key: str, summary_text: str, url: str = None) -> bool:
+        """Insert or refresh a cached summary"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.execute('''
+                INSERT OR REPLACE INTO summary_cache (cache_key, url, summary_text, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (cache_key, url, self.codec.compress(summary_text), now, now))
+            conn.commit()
+            return True
+        except Exception as e:
+            self._rollback()
+            logger.error("Error writing summary cache: %s", e)
+            return False
+    
+    @timed_query
+    def evict_cached_summaries(self, max_entries: int, max_age_seconds: float) -> int:
+        """Drop expired cache entries and trim the cache to max_entries (least recently used first)"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM summary_cache WHERE created_at < ?',
+                           (time.time() - max_age_seconds,))
+            removed = cursor.rowcount
+            cursor.execute('''
+                DELETE FROM summary_cache WHERE cache_key IN (
+                    SELECT cache_key FROM summary_cache
+                    ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                )
+            ''', (max_entries,))
+            removed += cursor.rowcount
+            conn.commit()
+            return removed
+        except Exception as e:
+            self._rollback()
+            logger.error("Error evicting summary cache: %s", e)
+            return 0
+    
+    @timed_query
+    def get_document(self, doc_key: str) -> Optional[Tuple]:
+        """Get a stored raw document as (url, content, etag, last_modified, fetched_at, validated_at)"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT url, content, etag, last_modified, fetched_at, validated_at
+                FROM documents WHERE doc_key = ?
+            ''', (doc_key,))
+            return cursor.fetchone()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error reading stored document: %s", e)
+            return None
+    
+    @timed_query
+    def save_document(self, doc_key: str, url: str, content: bytes,
+                      etag: str = None, last_modified: str = None) -> bool:
+        """Insert or replace a stored raw document"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.execute('''
+                INSERT OR REPLACE INTO documents (doc_key, url, content, etag, last_modified, fetched_at, validated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (doc_key, url, content, etag, last_modified, now, now))
+            conn.commit()
+            return True
+        except Exception as e:
+            self._rollback()
+            logger.error("Error saving document: %s", e)
+            return False
+    
+    @timed_query
+    def mark_document_validated(self, doc_key: str) -> bool:
+        """Record that a stored document was revalidated against its source"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('UPDATE documents SET validated_at = ? WHERE doc_key = ?', (time.time(), doc_key))
+            conn.commit()
+            return True
+        except Exception as e:
+            self._rollback()
+            logger.error("Error updating document: %s", e)
+            return False
+    
+    @timed_query
+    def get_segment_summaries(self, cache_keys: List[str]) -> Dict[str, str]:
+        """Cached segment summaries for the given keys, as {cache_key: summary_text}"""
+        found = {}
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(cache_keys), 500):
+                batch = cache_keys[start:start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                cursor.execute(f'''
+                    SELECT cache_key, decompress(summary_text) FROM segment_summaries
+                    WHERE cache_key IN ({placeholders})
+                ''', batch)
+                found.update(cursor.fetchall())
+            return found
+        except Exception as e:
+            self._rollback()
+            logger.error("Error reading segment summaries: %s", e)
+            return found
+    
+    @timed_query
+    def save_segment_summaries(self, segments: List[Dict]) -> int:
+        """Store segment summaries in one transaction, returning the number of rows written"""
+        if not segments:
+            return 0
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO segment_summaries
+                    (cache_key, video_key, start_seconds, end_seconds, title, summary_text, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(s["cache_key"], s["video_key"], s["start_seconds"], s["end_seconds"], s.get("title"),
+                   self.codec.compress(s["summary_text"]), now) for s in segments])
+            conn.commit()
+            return len(segments)
+        except Exception as e:
+            self._rollback()
+            logger.error("Error saving segment summaries: %s", e)
+            return 0
+    
+    @timed_query
+    def create_job(self, url: str, params: Dict, session_id: str = None, owner: str = None) -> Optional[int]:
+        """Record a queued summarization job (run by the process owner) and return its id"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO jobs (session_id, owner, url, params) VALUES (?, ?, ?, ?)
+            ''', (session_id, owner, url, json.dumps(params)))
+            conn.commit()
+            return cursor.lastrowid
+        except Exception as e:
+            self._rollback()
+            logger.error("Error creating job: %s", e)
+            return None
+    
+    @timed_query
+    def update_job(self, job_id: int, status: str, summary_id: int = None,
+                   result: str = None, error: str = None) -> bool:
+        """Update a job's status and, once finished, its result or error"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE jobs SET status = ?, summary_id = coalesce(?, summary_id),
+                    result = coalesce(?, result), error = coalesce(?, error),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (status, summary_id, result, error, job_id))
+            conn.commit()
+            return True
+        except Exception as e:
+            self._rollback()
+            logger.error("Error updating job: %s", e)
+            return False
+    
+    @timed_query
+    def get_jobs(self, session_id: str = None, limit: int = 20) -> List[Tuple]:
+        """Get recent jobs as (id, url, params, status, summary_id, result, error, created_at, updated_at)"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, url, params, status, summary_id, result, error, created_at, updated_at
+                FROM jobs WHERE ? IS NULL OR session_id = ?
+                ORDER BY id DESC LIMIT ?
+            ''', (session_id, session_id, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving jobs: %s", e)
+            return []
+    
+    @timed_query
+    def get_unfinished_job_owners(self) -> List[Optional[str]]:
+        """Owners of queued or running jobs (None for jobs recorded before owners were)"""
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute("SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')")
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            self._rollback()
+            logger.error("Error retrieving job owners: %s", e)
             return []
+    
+    def fail_unfinished_jobs(self, error: str, owners: Iterable[Optional[str]]) -> int:
+        """Mark the queued or running jobs of owners as failed (used when their process died mid-job)"""
+        owners = list(owners)
+        if not owners:
+            return 0
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            named = [owner for owner in owners if owner is not None]
+            placeholders = ", ".join("?" * len(named))
+            cursor.execute(f'''
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE status IN ('queued', 'running')
+                    AND (owner IN ({placeholders}) OR (? AND owner IS NULL))
+            ''', [error] + named + [None in owners])
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            self._rollback()
+            logger.error("Error updating jobs: %s", e)
+            return 0
 
 
 class ExportManager:
-    """Manager for exporting summaries in different formats"""
+    """Manager for exporting summaries in different formats.
+
+    The iter_* exporters are generators that yield the export piece by piece,
+    so rows can be streamed from SummaryDatabase.iter_summaries straight into
+    a file without holding the whole export in memory.
+    """
+    
+    # format_type -> (file extension, MIME type)
+    FORMATS = {
+        "md": ("md", "text/markdown"),
+        "json": ("json", "application/json"),
+        "ndjson": ("ndjson", "application/x-ndjson"),
+        "csv": ("csv", "text/csv"),
+    }
     
     @staticmethod
-    def export_to_markdown(summaries: List[Tuple]) -> str:
-        """Export summaries to Markdown format"""
-        if not summaries:
-            return "# No Summaries Found\n\nNo summaries available for export."
-        
-        markdown_content = "# YouTube Video Summaries\n\n"
-        markdown_content += f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n"
-        markdown_content += f"*Total summaries: {len(summaries)}*\n\n---\n\n"
-        
+    def summary_to_dict(summary: Tuple) -> Dict:
+        """Map a summaries row to a field-name dictionary"""
+        return dict(zip(SUMMARY_FIELDS, summary))
+    
+    @staticmethod
+    def iter_markdown(summaries: Iterable[Tuple], total: Optional[int] = None) -> Iterator[str]:
+        """Stream summaries as Markdown"""
+        header_written = False
         for summary in summaries:
-            id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
+            if not header_written:
+                yield "# YouTube Video Summaries\n\n"
+                yield f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n\n"
+                if total is not None:
+                    yield f"*Total summaries: {total}*\n\n"
+                yield "---\n\n"
+                header_written = True
+            
+            id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary[:11]
             
-            markdown_content += f"## {title or 'Untitled'}\n\n"
-            markdown_content += f"**URL:** [{url}]({url})\n\n"
-            markdown_content += f"**Date:** {created_at}\n\n"
-            markdown_content += f"**Length:** {summary_length}\n\n"
-            markdown_content += f"**Tone:** {summary_tone}\n\n"
-            markdown_content += f"**Word Count:** {word_count}\n\n"
+            parts = [
+                f"## {title or 'Untitled'}\n\n",
+                f"**URL:** [{url}]({url})\n\n",
+                f"**Date:** {created_at}\n\n",
+                f"**Length:** {summary_length}\n\n",
+                f"**Tone:** {summary_tone}\n\n",
+                f"**Word Count:** {word_count}\n\n",
+            ]
             if video_duration:
-                markdown_content += f"**Duration:** {video_duration}\n\n"
+                parts.append(f"**Duration:** {video_duration}\n\n")
             if video_channel:
-                markdown_content += f"**Channel:** {video_channel}\n\n"
-            markdown_content += f"**Model:** {model_used}\n\n"
-            markdown_content += f"### Summary\n\n{summary_text}\n\n---\n\n"
+                parts.append(f"**Channel:** {video_channel}\n\n")
+            parts.append(f"**Model:** {model_used}\n\n")
+            parts.append(f"### Summary\n\n{summary_text}\n\n---\n\n")
+            yield "".join(parts)
         
-        return markdown_content
+        if not header_written:
+            yield "# No Summaries Found\n\nNo summaries available for export."
+    
+    @staticmethod
+    def iter_json(summaries: Iterable[Tuple], total: Optional[int] = None) -> Iterator[str]:
+        """Stream summaries as a single JSON document"""
+        yield "{\n"
+        yield f'  "export_date": {json.dumps(datetime.now().isoformat())},\n'
+        if total is not None:
+            yield f'  "total_summaries": {total},\n'
+        yield '  "summaries": ['
+        separator = "\n"
+        for summary in summaries:
+            item = json.dumps(ExportManager.summary_to_dict(summary), indent=2, default=str)
+            yield separator + "    " + item.replace("\n", "\n    ")
+            separator = ",\n"
+        yield "\n  ]\n}" if separator == ",\n" else "]\n}"
+    
+    @staticmethod
+    def iter_ndjson(summaries: Iterable[Tuple]) -> Iterator[str]:
+        """Stream summaries as newline-delimited JSON (one object per line)"""
+        for summary in summaries:
+            yield json.dumps(ExportManager.summary_to_dict(summary), default=str) + "\n"
+    
+    @staticmethod
+    def iter_csv(summaries: Iterable[Tuple]) -> Iterator[str]:
+        """Stream summaries as CSV without pandas dependency"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(["ID", "URL", "Title", "Summary", "Length", "Tone", "Model",
+                         "Created At", "Word Count", "Duration", "Channel"])
+        for summary in summaries:
+            writer.writerow(summary[:11])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Header only: nothing was exported
+            yield buffer.getvalue()
+    
+    @staticmethod
+    def iter_export(format_type: str, summaries: Iterable[Tuple], total: Optional[int] = None) -> Iterator[str]:
+        """Stream summaries in the given format (md, json, ndjson or csv)"""
+        if format_type == "md":
+            return ExportManager.iter_markdown(summaries, total)
+        if format_type == "json":
+            return ExportManager.iter_json(summaries, total)
+        if format_type == "ndjson":
+            return ExportManager.iter_ndjson(summaries)
+        if format_type == "csv":
+            return ExportManager.iter_csv(summaries)
+        raise ValueError(f"Unsupported export format: {format_type}")
+    
+    @staticmethod
+    def export_to_markdown(summaries: List[Tuple]) -> str:
+        """Export summaries to Markdown format"""
+        return "".join(ExportManager.iter_markdown(summaries, len(summaries)))
     
     @staticmethod
     def export_to_json(summaries: List[Tuple]) -> str:
         """Export summaries to JSON format"""
-        if not summaries:
-            return json.dumps({"summaries": [], "export_date": datetime.now().isoformat()}, indent=2)
-        
-        export_data = {
-            "export_date": datetime.now().isoformat(),
-            "total_summaries": len(summaries),
-            "summaries": []
-        }
-        
-        for summary in summaries:
-            id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
-            
-            summary_data = {
-                "id": id,
-                "url": url,
-                "title": title,
-                "summary_text": summary_text,
-                "summary_length": summary_length,
-                "summary_tone": summary_tone,
-                "model_used": model_used,
-                "created_at": created_at,
-                "word_count": word_count,
-                "video_duration": video_duration,
-                "video_channel": video_channel
-            }
-            export_data["summaries"].append(summary_data)
-        
-        return json.dumps(export_data, indent=2, default=str)
+        return "".join(ExportManager.iter_json(summaries, len(summaries)))
     
     @staticmethod
     def export_to_csv(summaries: List[Tuple]) -> str:
         """Export summaries to CSV format without pandas dependency"""
         if not summaries:
             return "No summaries available for export."
-        
-        # CSV header
-        csv_content = "ID,URL,Title,Summary,Length,Tone,Model,Created At,Word Count,Duration,Channel\n"
-        
-        # Convert tuples to CSV rows
-        for summary in summaries:
-            id, url, title, summary_text, summary_length, summary_tone, model_used, created_at, word_count, video_duration, video_channel = summary
-            
-            # Escape CSV values (handle commas and quotes)
-            def escape_csv_value(value):
-                if value is None:
-                    return ""
-                value_str = str(value)
-                if ',' in value_str or '"' in value_str or '\n' in value_str:
-                    return '"' + value_str.replace('"', '""') + '"'
-                return value_str
-            
-            csv_content += f"{id},{escape_csv_value(url)},{escape_csv_value(title)},{escape_csv_value(summary_text)},{escape_csv_value(summary_length)},{escape_csv_value(summary_tone)},{escape_csv_value(model_used)},{escape_csv_value(created_at)},{word_count},{escape_csv_value(video_duration)},{escape_csv_value(video_channel)}\n"
-        
-        return csv_content
+        return "".join(ExportManager.iter_csv(summaries))
     
     @staticmethod
-    def save_export_file(content: str, filename: str, format_type: str) -> bool:
-        """Save exported content to a file"""
+    def save_export_stream(chunks: Iterable[str], filename: str, format_type: str,
+                           compress: bool = False) -> Tuple[bool, Optional[str]]:
+        """Write streamed export chunks to a file in exports/, optionally gzip-compressed"""
         try:
-            # Create exports directory if it doesn't exist
             os.makedirs("exports", exist_ok=True)
             
-            # Add timestamp to filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename_with_timestamp = f"{filename}_{timestamp}.{format_type.lower()}"
+            if compress:
+                filename_with_timestamp += ".gz"
             filepath = os.path.join("exports", filename_with_timestamp)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            opener = gzip.open if compress else open
+            with opener(filepath, 'wt', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
             
             return True, filepath
         except Exception as e:
-            print(f"Error saving export file: {e}")
+            logger.error("Error saving export file: %s", e)
             return False, None
+    
+    @staticmethod
+    def save_export_file(content: str, filename: str, format_type: str) -> bool:
+        """Save exported content to a file"""
+        return ExportManager.save_export_stream([content], filename, format_type)
@@ -0,0 +1,94 @@
+import json
+import time
+import urllib.error
+import urllib.request
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from cache import normalize_url
+from database import SummaryDatabase
+
+
+class DocumentStore:
+    """Persistent store of loaded transcripts and pages, keyed by normalized URL.
+
+    Documents are kept zlib-compressed in the documents table. YouTube
+    transcripts are trusted for youtube_max_age seconds; web pages are trusted
+    for web_max_age seconds and then revalidated with their ETag/Last-Modified
+    before being downloaded and parsed again.
+    """
+
+    def __init__(self, db: Optional[SummaryDatabase] = None, youtube_max_age: int = 7 * 24 * 3600,
+                 web_max_age: int = 3600, timeout: float = 5.0):
+        self.db = db or SummaryDatabase()
+        self.youtube_max_age = youtube_max_age
+        self.web_max_age = web_max_age
+        self.timeout = timeout
+
+    def load(self, url: str, fetch: Callable[[str], List], variant: str = "") -> List:
+        """Return stored documents for url if still valid, otherwise fetch and store them.
+
+        variant keeps differently loaded copies of the same URL apart (e.g. a
+        transcript split into timed chunks).
+        """
+        doc_key = normalize_url(url) + (f"#{variant}" if variant else "")
+        is_youtube = doc_key.startswith("youtube:")
+        stored = self.db.get_document(doc_key)
+
+        if stored is not None:
+            _, content, etag, last_modified, _, validated_at = stored
+            max_age = self.youtube_max_age if is_youtube else self.web_max_age
+            if time.time() - validated_at <= max_age:
+                return self._decode(content)
+            if not is_youtube and self._still_valid(url, etag, last_modified):
+                self.db.mark_document_validated(doc_key)
+                return self._decode(content)
+
+        docs = fetch(url)
+        etag, last_modified = (None, None) if is_youtube else self._validators(url)
+        if docs:
+            self.db.save_document(doc_key, url, self._encode(docs), etag, last_modified)
+        return docs
+
+    @staticmethod
+    def _encode(docs: List) -> bytes:
+        payload = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+        return zlib.compress(json.dumps(payload, default=str).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(content: bytes) -> List:
+        from langchain_core.documents import Document
+        payload = json.loads(zlib.decompress(content).decode("utf-8"))
+        return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in payload]
+
+    def _head(self, url: str, headers: dict):
+        request = urllib.request.Request(url, method="HEAD", headers=headers)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _validators(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """Fetch the ETag and Last-Modified headers of a page (None when unavailable)"""
+        try:
+            with self._head(url, {}) as response:
+                return response.headers.get("ETag"), response.headers.get("Last-Modified")
+        except Exception:
+            return None, None
+
+    def _still_valid(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """Ask the server whether a stored page is unchanged"""
+        if not etag and not last_modified:
+            return False
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            with self._head(url, headers) as response:
+                # Some servers ignore conditional HEAD requests; compare validators directly
+                if etag:
+                    return response.headers.get("ETag") == etag
+                return response.headers.get("Last-Modified") == last_modified
+        except urllib.error.HTTPError as e:
+            return e.code == 304
+        except Exception:
+            return False
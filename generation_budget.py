@@ -0,0 +1,184 @@
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tracing import current_trace
+
+
+logger = logging.getLogger(__name__)
+
+# Used when the model's tokenizer cannot be loaded (typical for English with BPE vocabularies)
+TOKENS_PER_WORD = 1.4
+# Room above the target length so the model can finish its last sentence
+BUDGET_SLACK = 1.25
+MIN_NEW_TOKENS = 64
+# Map, combine and refine steps have no length target of their own (the endpoint's default)
+INTERMEDIATE_NEW_TOKENS = 512
+# Input plus output tokens the hosted endpoint accepts (commonly served with 8k), and the
+# window assumed when a model's own limit is unknown
+DEFAULT_CONTEXT_WINDOW = 8192
+# Windows of backends whose tokenizer and config are not loaded here
+BACKEND_CONTEXT_WINDOWS = {
+    # BART's learned position embeddings
+    "local/distilbart": 1024,
+}
+# Encoder-decoder backends: the window bounds the input only, the answer is decoded separately
+# (with its own position limit, which the backend applies; see local_llm.Seq2SeqLLM)
+ENCODER_DECODER_BACKENDS = ("local/distilbart",)
+# Tokenizers report a huge model_max_length (int(1e30)) when the model sets none
+UNSET_MAX_LENGTH = 10 ** 9
+# A tokenizer or config that failed to download is retried after this long (a network blip, a token added later)
+LOAD_RETRY_SECONDS = 300.0
+
+# Loaded tokenizers and configs per repo_id, and when each (repo_id, token) last failed to load
+_loaded: Dict[Tuple[str, str], object] = {}
+_failed_at: Dict[Tuple[str, str, Optional[str]], float] = {}
+_load_lock = threading.Lock()
+SENTENCE_ENDINGS = (".", "!", "?", '."', '!"', '?"')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+class GenerationBudget:
+    """Token budgets for LLM calls, tied to the requested summary length.
+
+    max_new_tokens follows the target word count (and the tokenizer's tokens
+    per word for the content at hand), prompts are trimmed so input plus
+    output fits the model's window, and a streamed answer can stop as soon
+    as the target is reached at the end of a sentence. Counts use the
+    model's tokenizer when one is given and ~4 characters per token otherwise.
+    With input_only_window (encoder-decoder models) the answer does not take
+    room from the input.
+    """
+
+    def __init__(self, tokenizer=None, context_window: int = DEFAULT_CONTEXT_WINDOW, early_stopping: bool = True,
+                 input_only_window: bool = False):
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.early_stopping = early_stopping
+        self.input_only_window = input_only_window
+
+    def count_tokens(self, text: str) -> int:
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def tokens_per_word(self, text: str, tokens: int) -> float:
+        """Tokens per word of text (the summary is written in the same language), within sane bounds"""
+        words = len(text.split())
+        if self.tokenizer is None or words < 50:
+            return TOKENS_PER_WORD
+        return min(4.0, max(1.0, tokens / words))
+
+    def max_new_tokens(self, word_count: Optional[int], tokens_per_word: float = TOKENS_PER_WORD) -> int:
+        """Generation cap for a summary of word_count words (None for intermediate steps)"""
+        if word_count is None:
+            return INTERMEDIATE_NEW_TOKENS
+        return max(MIN_NEW_TOKENS, math.ceil(word_count * tokens_per_word * BUDGET_SLACK))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The first max_tokens tokens of text"""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is None:
+            return text[:max_tokens * 4]
+        ids = self.tokenizer.encode(text, add_special_tokens=False)
+        return self.tokenizer.decode(ids[:max_tokens]) if len(ids) > max_tokens else text
+
+    def fit(self, prompt, kwargs: Dict[str, str], word_count: Optional[int]) -> Tuple[str, int, int]:
+        """Format prompt with kwargs within the budget: (prompt text, max_new_tokens, input tokens).
+
+        When the prompt and the answer would not fit the context window, the
+        end of kwargs["text"] is cut off rather than sending a request the
+        endpoint rejects.
+        """
+        text = kwargs["text"]
+        text_tokens = self.count_tokens(text)
+        max_new_tokens = self.max_new_tokens(word_count, self.tokens_per_word(text, text_tokens))
+        overhead = self.count_tokens(prompt.format(**dict(kwargs, text="")))
+        room = self.context_window - overhead - (0 if self.input_only_window else max_new_tokens)
+        if text_tokens > room:
+            kwargs = dict(kwargs, text=self.truncate(text, room))
+            trace = current_trace()
+            if trace is not None:
+                trace.count("input_tokens_trimmed", text_tokens - max(room, 0))
+            text_tokens = max(room, 0)
+        return prompt.format(**kwargs), max_new_tokens, overhead + text_tokens
+
+    def reached(self, pieces: List[str], word_count: Optional[int]) -> bool:
+        """Whether a streamed answer (pieces so far) can stop: the target length is reached at the end of a sentence"""
+        if not self.early_stopping or word_count is None or not pieces[-1].rstrip().endswith(SENTENCE_ENDINGS):
+            return False
+        return len("".join(pieces).split()) >= word_count
+
+
+def _load_hub_file(kind: str, repo_id: str, token: Optional[str], load: Callable, fallback: str):
+    """Load a tokenizer or config once per process. Failures are not kept: they are retried after
+    LOAD_RETRY_SECONDS, or right away with a different token (gated repos need one)."""
+    if repo_id.startswith(("local/", "groq/")):
+        return None
+    token = token or os.getenv("HF_API_TOKEN") or None
+    with _load_lock:
+        if (kind, repo_id) in _loaded:
+            return _loaded[(kind, repo_id)]
+        if time.monotonic() - _failed_at.get((kind, repo_id, token), -LOAD_RETRY_SECONDS) < LOAD_RETRY_SECONDS:
+            return None
+    try:
+        value = load(repo_id, token=token)
+    except Exception as e:
+        logger.warning("Could not load the %s of %s, %s: %s", kind, repo_id, fallback, e)
+        with _load_lock:
+            _failed_at[(kind, repo_id, token)] = time.monotonic()
+        return None
+    with _load_lock:
+        return _loaded.setdefault((kind, repo_id), value)
+
+
+def load_tokenizer(repo_id: str, token: Optional[str] = None):
+    """A Hugging Face model's tokenizer (once per process), or None when it cannot be loaded.
+
+    token is the user's Hugging Face token (default: $HF_API_TOKEN), needed for gated repos.
+    """
+    def load(repo_id, token):
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(repo_id, token=token)
+    return _load_hub_file("tokenizer", repo_id, token, load, "estimating token counts")
+
+
+def load_model_config(repo_id: str, token: Optional[str] = None):
+    """A Hugging Face model's config (once per process), or None when it cannot be loaded"""
+    def load(repo_id, token):
+        from transformers import AutoConfig
+        return AutoConfig.from_pretrained(repo_id, token=token)
+    return _load_hub_file("config", repo_id, token, load, f"assuming a {DEFAULT_CONTEXT_WINDOW} token window")
+
+
+def model_context_window(repo_id: str, tokenizer=None, token: Optional[str] = None) -> int:
+    """Input plus output tokens repo_id accepts.
+
+    Local backends come from BACKEND_CONTEXT_WINDOWS; Hugging Face models
+    from the tokenizer's model_max_length or else the config's
+    max_position_embeddings, capped at what the endpoint serves.
+    """
+    if repo_id in BACKEND_CONTEXT_WINDOWS:
+        return BACKEND_CONTEXT_WINDOWS[repo_id]
+    limit = getattr(tokenizer, "model_max_length", None)
+    if not limit or limit >= UNSET_MAX_LENGTH:
+        limit = getattr(load_model_config(repo_id, token), "max_position_embeddings", None)
+    return min(int(limit), DEFAULT_CONTEXT_WINDOW) if limit else DEFAULT_CONTEXT_WINDOW
+
+
+def budget_for_model(repo_id: str, token: Optional[str] = None) -> GenerationBudget:
+    """The generation budget of a model (token: the user's Hugging Face token, see load_tokenizer).
+
+    Budgets are cheap; the tokenizer and config they use are loaded once per process.
+    """
+    tokenizer = load_tokenizer(repo_id, token)
+    return GenerationBudget(tokenizer, context_window=model_context_window(repo_id, tokenizer, token),
+                            input_only_window=repo_id in ENCODER_DECODER_BACKENDS)
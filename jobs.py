@@ -0,0 +1,130 @@
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from cache import SummaryCache
+from database import SummaryDatabase
+from document_store import DocumentStore
+from llm_router import build_router
+from pipeline import summarize_url
+
+
+def process_owner() -> str:
+    """Job owner id of this process: host and pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that owns a job may still be running.
+
+    Processes on other hosts, and any process on Windows (where there is no
+    cheap liveness probe), are assumed alive.
+    """
+    if owner is None:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or os.name == "nt":
+        return True
+    try:
+        # Signal 0 only checks that the process exists
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class JobQueue:
+    """Local background queue for summarization jobs.
+
+    Jobs run on a worker thread pool, independent of the Streamlit script
+    thread, so reruns and page interactions do not cancel them. Job state
+    lives in the jobs table next to summaries, and the UI polls it. API
+    tokens are kept in memory only and never written to the database.
+    """
+
+    def __init__(self, db: Optional[SummaryDatabase] = None, workers: int = 4,
+                 cache: Optional[SummaryCache] = None, store: Optional[DocumentStore] = None,
+                 index=None):
+        self.db = db or SummaryDatabase()
+        self.cache = cache or SummaryCache(self.db)
+        self.store = store or DocumentStore(self.db)
+        self.index = index
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary-job")
+        self._lock = threading.Lock()
+        self._futures = {}
+        # Routers are reused per credential set so latency stats accumulate across jobs
+        self._routers = {}
+        self.owner = process_owner()
+        # Tokens were never persisted, so jobs of a process that died cannot be resumed. Jobs of
+        # live processes (another app host, the API server) are left alone; a job with this
+        # process's own owner id comes from an earlier process that had the same pid.
+        dead_owners = [owner for owner in self.db.get_unfinished_job_owners()
+                       if owner == self.owner or not owner_alive(owner)]
+        self.db.fail_unfinished_jobs("Interrupted by an application restart", dead_owners)
+
+    def submit(self, url: str, hf_api_key: str, word_count: int, summary_length: str,
+               repo_id: str, session_id: str = None, groq_api_key: str = "",
+               token_budget: Optional[int] = None) -> Optional[int]:
+        """Queue a summarization job and return its id"""
+        params = {"word_count": word_count, "summary_length": summary_length, "repo_id": repo_id,
+                  "token_budget": token_budget}
+        job_id = self.db.create_job(url, params, session_id, owner=self.owner)
+        if job_id is None:
+            return None
+        with self._lock:
+            future = self._executor.submit(self._run, job_id, url, hf_api_key, groq_api_key, params)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _, finished_id=job_id: self._forget(finished_id))
+        return job_id
+
+    def get_jobs(self, session_id: str = None, limit: int = 20) -> List[Dict]:
+        """Recent jobs (optionally only one session's) as dictionaries"""
+        jobs = []
+        for job_id, url, params, status, summary_id, result, error, created_at, updated_at in \
+                self.db.get_jobs(session_id, limit):
+            jobs.append({
+                "id": job_id, "url": url, "params": json.loads(params), "status": status,
+                "summary_id": summary_id, "result": result, "error": error,
+                "created_at": created_at, "updated_at": updated_at,
+            })
+        return jobs
+
+    def active_count(self) -> int:
+        """Number of jobs queued or running in this process"""
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _forget(self, job_id: int) -> None:
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _get_router(self, hf_api_key: str, groq_api_key: str, repo_id: str):
+        key = (hf_api_key, groq_api_key, repo_id)
+        with self._lock:
+            if key not in self._routers:
+                self._routers[key] = build_router(hf_api_key, repo_id, groq_api_key)
+            return self._routers[key]
+
+    def _run(self, job_id: int, url: str, hf_api_key: str, groq_api_key: str,
+             params: Dict) -> Tuple[Optional[int], str]:
+        self.db.update_job(job_id, "running")
+        try:
+            llm = self._get_router(hf_api_key, groq_api_key, params["repo_id"])
+            summary_id, summary_text = summarize_url(
+                url, llm, params["word_count"], params["summary_length"], params["repo_id"],
+                self.db, cache=self.cache, store=self.store, index=self.index,
+                token_budget=params.get("token_budget"), hf_api_key=hf_api_key
+            )
+        except Exception as e:
+            self.db.update_job(job_id, "failed", error=str(e))
+            raise
+        self.db.update_job(job_id, "done", summary_id=summary_id, result=summary_text)
+        return summary_id, summary_text
@@ -0,0 +1,304 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pipeline import DEFAULT_REPO_ID, LOCAL_BACKENDS, build_llm
+from tracing import current_trace, record_retry
+
+
+DEFAULT_GROQ_MODEL = "llama-3.1-8b-instant"
+# Returned as the first chunk of a stream that produced nothing
+_STREAM_END = object()
+
+
+class FakeLLM:
+    """Deterministic local stand-in for an LLM (offline runs, tests and benchmarks).
+
+    It "summarizes" by echoing the first `words` words of the prompt's content
+    section after sleeping `latency` seconds; streamed words are spaced by
+    `token_delay` seconds.
+    """
+
+    CONTENT_MARKERS = ("Content:", "Summaries:")
+
+    def __init__(self, latency: float = 0.0, words: int = 60, token_delay: float = 0.0):
+        self.latency = latency
+        self.words = words
+        self.token_delay = token_delay
+
+    def _summary_words(self, prompt: str) -> List[str]:
+        text = prompt
+        for marker in self.CONTENT_MARKERS:
+            if marker in text:
+                text = text.rsplit(marker, 1)[1]
+        return text.replace("Summary:", " ").split()[:self.words]
+
+    def invoke(self, prompt: str, max_new_tokens: Optional[int] = None) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        # One fake token per word
+        return " ".join(self._summary_words(prompt)[:max_new_tokens])
+
+    def stream(self, prompt: str, max_new_tokens: Optional[int] = None) -> Iterator[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        for i, word in enumerate(self._summary_words(prompt)[:max_new_tokens]):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+
+class ChatLLM:
+    """Adapt a LangChain chat model to the providers' interface, where the
+    generation budget is passed as max_new_tokens (chat APIs call it max_tokens)
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def invoke(self, prompt: str, max_new_tokens: Optional[int] = None):
+        return self.model.invoke(prompt, **self._kwargs(max_new_tokens))
+
+    def stream(self, prompt: str, max_new_tokens: Optional[int] = None) -> Iterator:
+        return self.model.stream(prompt, **self._kwargs(max_new_tokens))
+
+    @staticmethod
+    def _kwargs(max_new_tokens: Optional[int]) -> Dict:
+        return {} if max_new_tokens is None else {"max_tokens": max_new_tokens}
+
+
+class ProviderStats:
+    """Rolling latency window and health state for one provider"""
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    @property
+    def healthy(self) -> bool:
+        return time.time() >= self.unhealthy_until
+
+
+class LLMRouter:
+    """Route LLM calls across providers by observed latency, with fallback and hedging.
+
+    Providers are (name, llm) pairs; the name is what ends up in
+    summaries.model_used. Calls go to the healthy provider with the lowest
+    rolling p50 latency (providers without samples are tried first). A failed
+    or timed-out call is retried on the next provider with exponential
+    backoff. With hedge_after set, a duplicate request is sent to the
+    runner-up provider if the first has not answered within that many
+    seconds, and whichever finishes first wins.
+    """
+
+    def __init__(self, providers: List[Tuple[str, object]], timeout: float = 120.0,
+                 max_retries: int = 2, backoff: float = 1.0, hedge_after: Optional[float] = None,
+                 failure_threshold: int = 3, cooldown: float = 60.0, window: int = 50):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = dict(providers)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats = {name: ProviderStats(window) for name in self.providers}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+    @property
+    def last_model(self) -> Optional[str]:
+        """Provider that answered the calling thread's most recent request"""
+        return getattr(self._local, "last_model", None)
+
+    def ranked_providers(self) -> List[str]:
+        """Provider names, fastest healthy first; unhealthy providers last as a final resort"""
+        with self._lock:
+            def sort_key(name):
+                stats = self.stats[name]
+                p50 = stats.percentile(50)
+                return (not stats.healthy, p50 is not None, p50 or 0.0)
+            return sorted(self.providers, key=sort_key)
+
+    def latency_summary(self) -> Dict[str, Dict]:
+        """Per-provider p50/p95 latency (seconds), call counts and health"""
+        with self._lock:
+            return {
+                name: {
+                    "p50": stats.percentile(50),
+                    "p95": stats.percentile(95),
+                    "successes": stats.successes,
+                    "failures": stats.failures,
+                    "healthy": stats.healthy,
+                }
+                for name, stats in self.stats.items()
+            }
+
+    def invoke(self, prompt: str, **kwargs):
+        """Call the fastest healthy provider, hedging and failing over as configured.
+
+        kwargs (e.g. max_new_tokens) are passed on to the provider.
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            ranked = self.ranked_providers()
+            # Rotate so each retry starts from a different provider
+            ranked = ranked[attempt % len(ranked):] + ranked[:attempt % len(ranked)]
+            try:
+                name, result = self._invoke_hedged(prompt, ranked, kwargs)
+                self._local.last_model = name
+                return result
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_retries:
+                    record_retry()
+                    time.sleep(self.backoff * (2 ** attempt))
+        raise RuntimeError(f"All LLM providers failed: {last_error}") from last_error
+
+    def stream(self, prompt: str, **kwargs) -> Iterator:
+        """Stream from the fastest healthy provider, failing over if it errors or times out before the first token.
+
+        The first token must arrive within timeout seconds; after that the
+        stream is not cut off. A consumer that stops reading early (closes the
+        generator) still counts as a success of the provider that was streaming.
+        """
+        last_error = None
+        for name in self.ranked_providers():
+            start = time.perf_counter()
+            opened = self._executor.submit(self._open_stream, name, prompt, kwargs)
+            done, _ = wait([opened], timeout=self.timeout)
+            if not done:
+                # The worker thread keeps waiting for the first token; close the stream once it arrives
+                opened.add_done_callback(self._close_opened_stream)
+                self._record_failure(name)
+                last_error = TimeoutError(f"No first token from {name} after {self.timeout}s")
+                record_retry()
+                continue
+            try:
+                chunks, first = opened.result()
+            except Exception as e:
+                self._record_failure(name)
+                last_error = e
+                record_retry()
+                continue
+            # Set before the first yield, so it holds even if the consumer stops early
+            self._local.last_model = name
+            try:
+                if first is not _STREAM_END:
+                    yield first
+                    for chunk in chunks:
+                        yield chunk
+            except GeneratorExit:
+                getattr(chunks, "close", lambda: None)()
+                self._record_success(name, time.perf_counter() - start)
+                raise
+            except Exception:
+                # Tokens were already yielded, so the answer cannot move to another provider
+                self._record_failure(name)
+                raise
+            self._record_success(name, time.perf_counter() - start)
+            return
+        raise RuntimeError(f"All LLM providers failed: {last_error}") from last_error
+
+    def _open_stream(self, name: str, prompt: str, kwargs: Dict):
+        """Start a provider's stream and wait for its first chunk"""
+        chunks = iter(self.providers[name].stream(prompt, **kwargs))
+        return chunks, next(chunks, _STREAM_END)
+
+    @staticmethod
+    def _close_opened_stream(future) -> None:
+        if future.exception() is None:
+            chunks, _ = future.result()
+            getattr(chunks, "close", lambda: None)()
+
+    def _invoke_hedged(self, prompt: str, ranked: List[str], kwargs: Dict):
+        futures = {self._submit(ranked[0], prompt, kwargs): ranked[0]}
+        deadline = time.perf_counter() + self.timeout
+
+        if self.hedge_after is not None and len(ranked) > 1:
+            done, _ = wait(futures, timeout=min(self.hedge_after, self.timeout))
+            if not done:
+                futures[self._submit(ranked[1], prompt, kwargs)] = ranked[1]
+                trace = current_trace()
+                if trace is not None:
+                    trace.count("llm_hedges")
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return futures[future], future.result()
+                except Exception as e:
+                    errors.append(e)
+
+        for future in pending:
+            # Timed out: count it against the provider (the worker thread finishes in the background)
+            self._record_failure(futures[future])
+        raise errors[-1] if errors else TimeoutError(f"LLM call timed out after {self.timeout}s")
+
+    def _submit(self, name: str, prompt: str, kwargs: Dict):
+        return self._executor.submit(self._timed_call, name, prompt, kwargs)
+
+    def _timed_call(self, name: str, prompt: str, kwargs: Dict):
+        start = time.perf_counter()
+        try:
+            result = self.providers[name].invoke(prompt, **kwargs)
+        except Exception:
+            self._record_failure(name)
+            raise
+        self._record_success(name, time.perf_counter() - start)
+        return result
+
+    def _record_success(self, name: str, latency: float) -> None:
+        with self._lock:
+            stats = self.stats[name]
+            stats.latencies.append(latency)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.unhealthy_until = 0.0
+
+    def _record_failure(self, name: str) -> None:
+        with self._lock:
+            stats = self.stats[name]
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.unhealthy_until = time.time() + self.cooldown
+
+
+def build_router(hf_api_key: str = "", repo_id: str = DEFAULT_REPO_ID, groq_api_key: str = "",
+                 groq_model: str = DEFAULT_GROQ_MODEL, include_fake: bool = False, **router_kwargs) -> LLMRouter:
+    """Build a router over every provider that has credentials (plus the fake LLM if asked).
+
+    A local repo_id (see pipeline.LOCAL_BACKENDS) returns that backend itself:
+    it needs no credentials and has nothing to fall back to or hedge with.
+    """
+    if repo_id in LOCAL_BACKENDS:
+        return build_llm(hf_api_key, repo_id)
+    providers = []
+    if hf_api_key.strip():
+        providers.append((repo_id, build_llm(hf_api_key, repo_id)))
+    if groq_api_key.strip():
+        from langchain_groq import ChatGroq
+        providers.append((f"groq/{groq_model}", ChatLLM(ChatGroq(model=groq_model, groq_api_key=groq_api_key))))
+    if include_fake:
+        providers.append(("local/fake", FakeLLM()))
+    return LLMRouter(providers, **router_kwargs)
@@ -0,0 +1,225 @@
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llm_router import ProviderStats
+from preprocessing import SENTENCE_PATTERN
+from semantic_index import DEFAULT_EMBEDDING_MODEL, load_embedding_model
+
+
+SEQ2SEQ_MODEL = "sshleifer/distilbart-cnn-12-6"
+CONTENT_MARKERS = ("Content:", "Summaries:")
+TARGET_PATTERN = re.compile(r"approximately (\d+) words")
+EXISTING_SUMMARY_PATTERN = re.compile(r"existing summary[^\n]*:\s*(.*?)\s*Refine the summary", re.DOTALL)
+ANSWER_LABEL_PATTERN = re.compile(r"\s*(?:Refined )?Summary:\s*$", re.IGNORECASE)
+# Map and combine prompts ask for a "concise summary" without a length
+MAP_RATIO = 0.3
+MAP_MAX_WORDS = 400
+MIN_WORDS = 30
+# Caption transcripts have little punctuation; longer "sentences" are cut into windows
+MAX_UNIT_WORDS = 40
+
+
+def prompt_content(prompt: str) -> str:
+    """The text a summary prompt asks to summarize (for a refine prompt, the existing summary plus the new part)"""
+    head, text = "", prompt
+    for marker in CONTENT_MARKERS:
+        if marker in prompt:
+            head, _, text = prompt.rpartition(marker)
+            break
+    text = ANSWER_LABEL_PATTERN.sub("", text).strip()
+    existing = EXISTING_SUMMARY_PATTERN.search(head)
+    if existing:
+        text = existing.group(1) + "\n\n" + text
+    return text
+
+
+def prompt_word_count(prompt: str, content: str) -> int:
+    """Target length of a summary prompt, or a share of the content when it names none"""
+    match = TARGET_PATTERN.search(prompt)
+    if match:
+        return int(match.group(1))
+    existing = EXISTING_SUMMARY_PATTERN.search(prompt)
+    if existing:
+        # Refine: "keep the same length"
+        return max(MIN_WORDS, len(existing.group(1).split()))
+    return max(MIN_WORDS, min(MAP_MAX_WORDS, int(len(content.split()) * MAP_RATIO)))
+
+
+def split_units(text: str, max_words: int = MAX_UNIT_WORDS) -> List[str]:
+    """Sentences, with unpunctuated runs cut into windows of at most max_words words"""
+    units = []
+    for sentence in SENTENCE_PATTERN.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            units.append(" ".join(words[start:start + max_words]))
+    return units
+
+
+class LocalLLM(ABC):
+    """Offline CPU stand-in for the remote LLM: invoke/stream on top of invoke_batch, plus router-like stats for the UI.
+
+    Takes the same formatted prompts as the remote endpoint and reads the
+    content and target word count out of them. Backends implement _summarize.
+    """
+
+    name = "local"
+    # Input window in generation_budget.estimate_tokens units; ChunkedSummarizer sizes chunks to fit
+    context_tokens = None
+
+    def __init__(self):
+        self.stats = ProviderStats()
+        self._lock = threading.Lock()
+
+    @property
+    def last_model(self) -> str:
+        return self.name
+
+    # max_new_tokens is accepted like on remote providers; the output length comes from the prompt's target
+    def invoke(self, prompt: str, max_new_tokens: Optional[int] = None) -> str:
+        return self.invoke_batch([prompt])[0]
+
+    def stream(self, prompt: str, max_new_tokens: Optional[int] = None) -> Iterator[str]:
+        # Generation is not incremental; yield the finished summary word by word
+        for i, word in enumerate(self.invoke(prompt).split()):
+            yield word if i == 0 else " " + word
+
+    def invoke_batch(self, prompts: List[str]) -> List[str]:
+        """Summarize every prompt in one pass over the model"""
+        start = time.perf_counter()
+        outputs = self._summarize(prompts)
+        with self._lock:
+            self.stats.latencies.append(time.perf_counter() - start)
+            self.stats.successes += 1
+        return outputs
+
+    def latency_summary(self) -> Dict[str, Dict]:
+        """Same shape as LLMRouter.latency_summary, for the sidebar"""
+        with self._lock:
+            return {self.name: {"p50": self.stats.percentile(50), "p95": self.stats.percentile(95),
+                                "successes": self.stats.successes, "failures": self.stats.failures,
+                                "healthy": True}}
+
+    @abstractmethod
+    def _summarize(self, prompts: List[str]) -> List[str]:
+        """One summary per prompt"""
+
+
+class ExtractiveLLM(LocalLLM):
+    """Embedding-based extractive summaries: maximal marginal relevance around the content centroid"""
+
+    name = "local/extractive"
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, diversity: float = 0.3, batch_size: int = 64):
+        super().__init__()
+        self.model_name = model_name
+        self.diversity = diversity
+        self.batch_size = batch_size
+
+    def _summarize(self, prompts: List[str]) -> List[str]:
+        import numpy as np
+
+        contents = [prompt_content(prompt) for prompt in prompts]
+        units = [split_units(content) for content in contents]
+        # One encode call for the sentences of every prompt
+        flat = [unit for prompt_units in units for unit in prompt_units]
+        vectors = np.asarray(load_embedding_model(self.model_name).encode(
+            flat, batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False
+        ), dtype="float32") if flat else np.zeros((0, 1), dtype="float32")
+
+        outputs, offset = [], 0
+        for prompt, content, prompt_units in zip(prompts, contents, units):
+            prompt_vectors = vectors[offset:offset + len(prompt_units)]
+            offset += len(prompt_units)
+            outputs.append(self._select(prompt_units, prompt_vectors, prompt_word_count(prompt, content)))
+        return outputs
+
+    def _select(self, units: List[str], vectors, word_target: int) -> str:
+        import numpy as np
+
+        if not units:
+            return ""
+        centroid = vectors.mean(axis=0)
+        centroid /= np.linalg.norm(centroid) or 1.0
+        relevance = vectors @ centroid
+        redundancy = np.zeros(len(units), dtype="float32")
+        available = np.ones(len(units), dtype=bool)
+        selected, words = [], 0
+        while words < word_target and available.any():
+            scores = (1 - self.diversity) * relevance - self.diversity * redundancy
+            best = int(np.argmax(np.where(available, scores, -np.inf)))
+            selected.append(best)
+            available[best] = False
+            words += len(units[best].split())
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return " ".join(units[i] for i in sorted(selected))
+
+
+class Seq2SeqLLM(LocalLLM):
+    """Abstractive summaries from a small seq2seq model, dynamically quantized to int8 on CPU"""
+
+    name = "local/distilbart"
+    # distilbart reads 1024 BPE tokens; leave room since estimate_tokens undercounts them
+    context_tokens = 700
+
+    def __init__(self, model_name: str = SEQ2SEQ_MODEL, quantize: bool = True, batch_size: int = 4,
+                 num_beams: int = 2):
+        super().__init__()
+        self.model_name = model_name
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.num_beams = num_beams
+        # torch already uses every core per batch; concurrent batches would only contend
+        self._generate_lock = threading.Lock()
+
+    def _summarize(self, prompts: List[str]) -> List[str]:
+        import torch
+
+        tokenizer, model = load_seq2seq_model(self.model_name, self.quantize)
+        contents = [prompt_content(prompt) for prompt in prompts]
+        targets = [prompt_word_count(prompt, content) for prompt, content in zip(prompts, contents)]
+        # Batch similar lengths together to waste less work on padding
+        order = sorted(range(len(prompts)), key=lambda i: len(contents[i]))
+        # The decoder has learned positions too; leave room for the start and end tokens
+        max_output_tokens = model.config.max_position_embeddings - 2
+        outputs = [""] * len(prompts)
+        for start in range(0, len(order), self.batch_size):
+            group = order[start:start + self.batch_size]
+            inputs = tokenizer([contents[i] for i in group], truncation=True, padding=True,
+                               max_length=tokenizer.model_max_length, return_tensors="pt")
+            # ~1.3 tokens per English word
+            max_new_tokens = min(max_output_tokens, int(max(targets[i] for i in group) * 1.3) + 16)
+            min_new_tokens = min(max_new_tokens, int(min(targets[i] for i in group) * 0.6))
+            with self._generate_lock, torch.inference_mode():
+                generated = model.generate(**inputs, num_beams=self.num_beams, max_new_tokens=max_new_tokens,
+                                           min_new_tokens=min_new_tokens, no_repeat_ngram_size=3,
+                                           early_stopping=True)
+            for i, text in zip(group, tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                outputs[i] = text.strip()
+        return outputs
+
+
+@lru_cache(maxsize=2)
+def load_seq2seq_model(model_name: str = SEQ2SEQ_MODEL, quantize: bool = True) -> Tuple:
+    """Load a seq2seq model and its tokenizer once per process"""
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+    if quantize:
+        # int8 Linear weights: several times less memory and faster matmuls on CPU
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model
+
+
+@lru_cache(maxsize=None)
+def load_local_llm(name: str) -> LocalLLM:
+    """The process-wide instance of a local backend (see pipeline.LOCAL_BACKENDS)"""
+    backends = {ExtractiveLLM.name: ExtractiveLLM, Seq2SeqLLM.name: Seq2SeqLLM}
+    if name not in backends:
+        raise ValueError(f"Unknown local backend: {name}")
+    return backends[name]()
@@ -0,0 +1,52 @@
+"""Storage maintenance for the summaries database, e.g. from a nightly cron job.
+
+Usage:
+    python maintenance.py --train-dictionary --compress --archive-after-days 180
+"""
+import argparse
+from typing import List, Optional
+
+from database import SummaryDatabase
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compress and archive stored summaries")
+    parser.add_argument("--train-dictionary", action="store_true",
+                        help="Train a zstd dictionary on recent summaries and recompress every row with it")
+    parser.add_argument("--compress", action="store_true", help="Compress summaries still stored as plain text")
+    parser.add_argument("--archive-after-days", type=int,
+                        help="Move summaries older than this many days into the archive database")
+    parser.add_argument("--no-vacuum", action="store_true", help="Do not shrink the file after archiving")
+    parser.add_argument("--db", default="summaries.db", help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db = SummaryDatabase(args.db)
+    recompress = False
+    if args.train_dictionary:
+        dictionary_id = db.train_compression_dictionary()
+        if dictionary_id is None:
+            print("No dictionary trained (needs zstandard and enough summaries)")
+        else:
+            print(f"Trained compression dictionary {dictionary_id}")
+            recompress = True
+    if args.compress or recompress:
+        print(f"Compressed {db.compress_summaries(recompress=recompress)} summaries")
+    if args.archive_after_days is not None:
+        on_archived = None
+        try:
+            from semantic_index import SemanticIndex
+            on_archived = SemanticIndex(args.db).remove
+        except ImportError:
+            pass
+        moved = db.archive_summaries(args.archive_after_days, vacuum=not args.no_vacuum,
+                                     on_archived=on_archived)
+        print(f"Archived {moved} summaries to {db.archive_path}")
+
+    stats = db.get_storage_stats()
+    print(f"Database: {stats['database_bytes'] / 1e6:.1f} MB, archive: {stats['archive_bytes'] / 1e6:.1f} MB, "
+          f"{stats['compressed']:,} of {stats['summaries']:,} summaries compressed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,341 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import validators
+
+from cache import make_cache_key
+from generation_budget import INTERMEDIATE_NEW_TOKENS, budget_for_model
+from tracing import Trace, propagate
+
+
+DEFAULT_REPO_ID = "mistralai/Mistral-7B-Instruct-v0.3"
+# Offline CPU summarizers (see local_llm), selected like any other repo_id; they need no token
+LOCAL_BACKENDS = ("local/extractive", "local/distilbart")
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+
+LENGTH_CATEGORIES = {
+    "Short (100-150 words)": 125,
+    "Medium (200-300 words)": 250,
+    "Long (400-500 words)": 450,
+}
+
+
+def is_youtube_url(url):
+    """Check if URL is a YouTube URL (youtube.com or youtu.be)"""
+    youtube_patterns = [
+        r'(?:https?://)?(?:www\.)?youtube\.com/',
+        r'(?:https?://)?(?:www\.)?youtu\.be/'
+    ]
+    return any(re.search(pattern, url, re.IGNORECASE) for pattern in youtube_patterns)
+
+
+def validate_and_fix_url(url):
+    """Validate URL and provide helpful suggestions"""
+    if not url.strip():
+        return None, "Please enter a URL"
+
+    # Check if URL has a scheme
+    parsed = urlparse(url)
+    if not parsed.scheme:
+        # Try adding https://
+        fixed_url = f"https://{url}"
+        if validators.url(fixed_url):
+            return fixed_url, f"Missing protocol. Did you mean: {fixed_url}?"
+        else:
+            return None, "Please include the protocol (http:// or https://) in your URL"
+
+    # Validate the URL
+    if not validators.url(url):
+        return None, "Please enter a valid URL format"
+
+    return url, None
+
+
+def validate_word_count(word_count):
+    """Validate and cap word count to reasonable limits"""
+    if word_count < 50:
+        return 50
+    elif word_count > 1000:
+        return 1000
+    return word_count
+
+
+def build_prompt_template(word_count: int) -> str:
+    """Build the summary prompt template text for a target word count"""
+    return f"""
+Provide a comprehensive summary of the following content in approximately {word_count} words.
+Make sure the summary is well-structured and covers the key points:
+
+Content: {{text}}
+
+Summary:
+"""
+
+
+def build_prompt(word_count: int):
+    """Build the summary PromptTemplate for a target word count"""
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(template=build_prompt_template(word_count), input_variables=["text"])
+
+
+def build_llm(hf_api_key: str, repo_id: str = DEFAULT_REPO_ID):
+    """Build the Hugging Face endpoint LLM used for summarization (or a local backend).
+
+    Calls pass their own max_new_tokens (see generation_budget); the default
+    only applies to callers that do not.
+    """
+    if repo_id in LOCAL_BACKENDS:
+        from local_llm import load_local_llm
+        return load_local_llm(repo_id)
+    from langchain_huggingface import HuggingFaceEndpoint
+    return HuggingFaceEndpoint(repo_id=repo_id, max_new_tokens=INTERMEDIATE_NEW_TOKENS, temperature=0.7,
+                               token=hf_api_key)
+
+
+def fetch_documents(url: str) -> List:
+    """Download and parse a YouTube transcript or a web page as LangChain documents"""
+    # Loaders pull in heavy parsing dependencies, so import them only when fetching
+    from langchain_community.document_loaders import YoutubeLoader, UnstructuredURLLoader
+    if is_youtube_url(url):
+        loader = YoutubeLoader.from_youtube_url(url, add_video_info=True)
+    else:
+        loader = UnstructuredURLLoader(
+            urls=[url],
+            ssl_verify=False,
+            headers={"User-Agent": USER_AGENT}
+        )
+    return loader.load()
+
+
+def load_documents(url: str, store=None) -> List:
+    """Load documents for a URL, reusing the DocumentStore copy when one is given"""
+    if store is None:
+        return fetch_documents(url)
+    return store.load(url, fetch_documents)
+
+
+def preprocess_documents(url: str, docs: List, token_budget: Optional[int] = None):
+    """Clean loaded documents before summarizing; returns (docs, PreprocessStats)"""
+    from preprocessing import default_pipeline
+    return default_pipeline(is_youtube_url(url), token_budget).run(docs)
+
+
+def extract_metadata(url: str, docs: List) -> Tuple[str, Optional[str], Optional[str]]:
+    """Return (title, video_duration, video_channel) for loaded documents"""
+    title = "Untitled"
+    video_duration = None
+    video_channel = None
+
+    if is_youtube_url(url) and docs:
+        # Try to extract video metadata
+        try:
+            if hasattr(docs[0], 'metadata'):
+                metadata = docs[0].metadata
+                title = metadata.get('title', 'Untitled')
+                video_duration = metadata.get('length', None)
+                video_channel = metadata.get('author', None)
+        except Exception:
+            pass
+
+    return title, video_duration, video_channel
+
+
+def find_reusable_summary(index, db, transcript: str, summary_length: str,
+                          model_used: Optional[str] = None) -> Optional[Tuple[int, str]]:
+    """Find an existing summary of a near-identical transcript with the same length setting
+    (and, when model_used is given, made by that model).
+
+    Returns (summary_id, summary_text), or None if there is no match or no index.
+    """
+    if index is None:
+        return None
+    for summary_id in index.find_near_duplicates(transcript):
+        summary = db.get_summary_by_id(summary_id)
+        # summaries row: id, url, title, summary_text, summary_length, summary_tone, model_used, ...
+        if summary is None or summary[4] != summary_length:
+            continue
+        if model_used is not None and summary[6] != model_used:
+            continue
+        return summary_id, summary[3]
+    return None
+
+
+def intermediate_cache_key(url: str, transcript: str, model_used: str) -> str:
+    """Cache key of the length-independent intermediate for a transcript and model.
+
+    It doubles as the variant_group linking every length summarized from it.
+    """
+    return make_cache_key(url, transcript, "intermediate", 0, model_used)
+
+
+def summarize_url(url: str, llm, word_count: int, summary_length: str, model_used: str,
+                  db, cache=None, store=None, index=None,
+                  token_budget: Optional[int] = None,
+                  on_chunk: Optional[Callable[[str], None]] = None,
+                  hf_api_key: str = "") -> Tuple[Optional[int], str]:
+    """Run the whole load -> summarize -> save pipeline for one URL.
+
+    Returns (summary_id, summary_text); summary_id is None when the summary
+    came from the cache and so is already in the history. With token_budget
+    set, the cleaned transcript is cut down to that many tokens by
+    extractive sentence selection before it reaches the LLM. With on_chunk
+    set, the final LLM call is streamed and on_chunk receives each piece of
+    text as it arrives (a cached or reused summary arrives as one piece).
+    hf_api_key lets the model's tokenizer load from a gated repo (see
+    generation_budget.load_tokenizer).
+
+    The run is traced (see tracing.Trace) and the trace is stored with the
+    new summary row.
+    """
+    with Trace() as trace:
+        with trace.stage("load"):
+            docs = load_documents(url, store=store)
+        with trace.stage("preprocess"):
+            docs, _ = preprocess_documents(url, docs, token_budget)
+        transcript = "".join(doc.page_content for doc in docs)
+
+        with trace.stage("cache_lookup"):
+            cache_key = make_cache_key(url, transcript, build_prompt_template(word_count), word_count, model_used)
+            cached_summary = cache.get(cache_key) if cache is not None else None
+        if cached_summary is not None:
+            if on_chunk is not None:
+                on_chunk(cached_summary)
+            return None, cached_summary
+
+        with trace.stage("reuse_lookup"):
+            reusable = find_reusable_summary(index, db, transcript, summary_length, model_used)
+        if reusable is not None:
+            if cache is not None:
+                cache.set(cache_key, reusable[1], url=url)
+            if on_chunk is not None:
+                on_chunk(reusable[1])
+            return reusable
+
+        # Another length of this content may already have left a map-reduce intermediate
+        variant_group = intermediate_cache_key(url, transcript, model_used)
+        intermediate = cache.get(variant_group) if cache is not None else None
+
+        from summarizer import ChunkedSummarizer
+        summarizer = ChunkedSummarizer(llm, build_prompt(word_count), word_count=word_count,
+                                       budget=budget_for_model(model_used, hf_api_key))
+        with trace.stage("summarize"):
+            if on_chunk is None:
+                summary_text = summarizer.summarize(docs, intermediate)
+            else:
+                chunks = []
+                for chunk in summarizer.stream(docs, intermediate):
+                    chunks.append(chunk)
+                    on_chunk(chunk)
+                summary_text = "".join(chunks).strip()
+
+        with trace.stage("save"):
+            if cache is not None:
+                cache.set(cache_key, summary_text, url=url)
+                if summarizer.last_intermediate is not None:
+                    cache.set(variant_group, summarizer.last_intermediate, url=url)
+            title, video_duration, video_channel = extract_metadata(url, docs)
+            summary_id = db.insert_summary(
+                url=url,
+                title=title,
+                summary_text=summary_text,
+                summary_length=summary_length,
+                summary_tone="Professional",
+                # A router reports which provider actually answered
+                model_used=getattr(llm, "last_model", None) or model_used,
+                video_duration=video_duration,
+                video_channel=video_channel,
+                variant_group=variant_group
+            )
+        if summary_id is None:
+            raise RuntimeError("Summary generated but failed to save to history")
+        if index is not None:
+            with trace.stage("index"):
+                index.add(summary_id, summary_text, transcript)
+        db.set_summary_trace(summary_id, trace.to_dict())
+    return summary_id, summary_text
+
+
+def summarize_url_lengths(url: str, llm, lengths: Dict[str, int], model_used: str, db,
+                          cache=None, store=None, index=None,
+                          token_budget: Optional[int] = None,
+                          hf_api_key: str = "") -> Dict[str, Tuple[Optional[int], str]]:
+    """Summarize one URL at several lengths from a single pass over the content.
+
+    lengths maps summary_length labels to target word counts. The content is
+    condensed once into an intermediate (cached, so later requests for more
+    lengths reuse it), and each length is one LLM call over that
+    intermediate. New rows share a variant_group. Returns
+    {summary_length: (summary_id, summary_text)}; summary_id is None for
+    lengths served from the cache.
+    """
+    with Trace() as trace:
+        with trace.stage("load"):
+            docs = load_documents(url, store=store)
+        with trace.stage("preprocess"):
+            docs, _ = preprocess_documents(url, docs, token_budget)
+        transcript = "".join(doc.page_content for doc in docs)
+
+        results = {}
+        missing = {}
+        with trace.stage("cache_lookup"):
+            for summary_length, word_count in lengths.items():
+                cache_key = make_cache_key(url, transcript, build_prompt_template(word_count), word_count, model_used)
+                cached_summary = cache.get(cache_key) if cache is not None else None
+                if cached_summary is not None:
+                    results[summary_length] = (None, cached_summary)
+                else:
+                    missing[summary_length] = (word_count, cache_key)
+        if not missing:
+            return results
+
+        from summarizer import ChunkedSummarizer
+        # The map/combine prompts are length-independent; each length brings its own final prompt
+        summarizer = ChunkedSummarizer(llm, build_prompt(next(iter(missing.values()))[0]),
+                                       budget=budget_for_model(model_used, hf_api_key))
+        variant_group = intermediate_cache_key(url, transcript, model_used)
+        with trace.stage("intermediate"):
+            intermediate = cache.get(variant_group) if cache is not None else None
+            if intermediate is None:
+                intermediate = summarizer.build_intermediate(docs)
+                if cache is not None:
+                    cache.set(variant_group, intermediate, url=url)
+
+        def summarize_length(word_count):
+            # A router reports which provider answered on the calling (worker) thread
+            text = summarizer.summarize_text(intermediate, build_prompt(word_count), word_count)
+            return text, getattr(llm, "last_model", None) or model_used
+
+        with trace.stage("summarize"), ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            outputs = dict(zip(missing, executor.map(propagate(summarize_length),
+                                                     [word_count for word_count, _ in missing.values()])))
+
+        title, video_duration, video_channel = extract_metadata(url, docs)
+        new_ids = []
+        for summary_length, (word_count, cache_key) in missing.items():
+            summary_text, answered_by = outputs[summary_length]
+            with trace.stage("save"):
+                if cache is not None:
+                    cache.set(cache_key, summary_text, url=url)
+                summary_id = db.insert_summary(
+                    url=url,
+                    title=title,
+                    summary_text=summary_text,
+                    summary_length=summary_length,
+                    summary_tone="Professional",
+                    model_used=answered_by,
+                    video_duration=video_duration,
+                    video_channel=video_channel,
+                    variant_group=variant_group
+                )
+            if summary_id is None:
+                raise RuntimeError("Summary generated but failed to save to history")
+            if index is not None:
+                with trace.stage("index"):
+                    index.add(summary_id, summary_text, transcript)
+            results[summary_length] = (summary_id, summary_text)
+            new_ids.append(summary_id)
+        for summary_id in new_ids:
+            db.set_summary_trace(summary_id, trace.to_dict())
+    return {summary_length: results[summary_length] for summary_length in lengths}
@@ -0,0 +1,186 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from generation_budget import estimate_tokens
+
+
+ANNOTATION_PATTERN = re.compile(r"\[(?:music|applause|laughter|inaudible|silence|noise)\]", re.IGNORECASE)
+# English spoken fillers; in other languages these are real words
+FILLER_PATTERN = re.compile(r"\b(?:um+|uh+|erm+|hmm+|ah+)\b[,.]?", re.IGNORECASE)
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|privacy policy|terms of (?:use|service)|all rights reserved|©|sign (?:in|up)|log ?in|"
+    r"subscribe|newsletter|share (?:this|on)|follow us|skip to (?:main )?content|advertisement|"
+    r"related (?:articles|posts)|read more|back to top",
+    re.IGNORECASE
+)
+# Lines made only of menu entries ("Home | About us | Contact")
+NAV_LINE_PATTERN = re.compile(
+    r"^(?:(?:home|menu|search|contact(?: us)?|about(?: us)?|next|prev(?:ious)?|close|print|email|share|"
+    r"help|faq|careers|sitemap|accessibility|top)\s*[|/•·>»-]?\s*)+$",
+    re.IGNORECASE
+)
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or so that the this to was "
+    "we were what when which who will with you your they them then there their not just like".split()
+)
+# English text has roughly a third of its words in STOPWORDS; other languages almost none
+ENGLISH_STOPWORD_SHARE = 0.15
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces/tabs and blank lines"""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def is_english(text: str, sample_words: int = 2000) -> bool:
+    """Whether text reads as English, judged by its share of common English words"""
+    words = [word.strip(".,!?;:\"'()").lower() for word in text.split()[:sample_words]]
+    if not words:
+        return False
+    return sum(word in STOPWORDS for word in words) / len(words) >= ENGLISH_STOPWORD_SHARE
+
+
+def remove_fillers(text: str) -> str:
+    """Drop caption annotations like [Music] and, in English transcripts, spoken fillers (um, uh, ...)"""
+    text = ANNOTATION_PATTERN.sub("", text)
+    return FILLER_PATTERN.sub("", text) if is_english(text) else text
+
+
+def dedupe_caption_segments(text: str, min_run: int = 3, max_run: int = 20) -> str:
+    """Remove repeated caption segments.
+
+    Drops lines that repeat the line before them, the start of a line that
+    repeats the end of the previous one, and word runs (min_run..max_run
+    words) that immediately repeat the preceding run, which is what rolling
+    auto-captions produce. Repeats further apart are left alone: a speaker
+    can say the same thing twice.
+    """
+    lines = []
+    previous = []
+    for line in text.split("\n"):
+        words = line.split()
+        if not words:
+            lines.append(line)
+            continue
+        if [word.lower() for word in words] == [word.lower() for word in previous]:
+            continue
+        # Rolling captions: the new line starts with the tail of the previous one
+        for run in range(min(max_run, len(previous), len(words)), min_run - 1, -1):
+            if words[:run] == previous[-run:]:
+                line = " ".join(words[run:])
+                break
+        previous = words
+        if line:
+            lines.append(line)
+
+    output = []
+    for line in lines:
+        words = line.split()
+        kept = []
+        i = 0
+        while i < len(words):
+            for run in range(min(max_run, len(kept), len(words) - i), min_run - 1, -1):
+                # Cheap first-word check before comparing whole runs
+                if words[i] == kept[-run] and words[i:i + run] == kept[-run:]:
+                    i += run
+                    break
+            else:
+                kept.append(words[i])
+                i += 1
+        output.append(" ".join(kept))
+    return "\n".join(output)
+
+
+def strip_boilerplate(text: str, max_boilerplate_words: int = 12) -> str:
+    """Drop navigation, cookie and footer lines from web pages.
+
+    Only short lines matching the known boilerplate and menu patterns go;
+    short content lines (headings, list items, figures) are kept.
+    """
+    kept = []
+    for line in (line.strip() for line in text.split("\n")):
+        if line and len(line.split()) <= max_boilerplate_words and (
+                BOILERPLATE_PATTERN.search(line) or NAV_LINE_PATTERN.match(line)):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def select_sentences(text: str, token_budget: int) -> str:
+    """Extractive selection: keep the highest-scoring sentences (in original order) within a token budget"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    sentences = [sentence for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+    if len(sentences) <= 1:
+        # Unpunctuated captions: fall back to fixed-size word windows
+        words = text.split()
+        sentences = [" ".join(words[i:i + 30]) for i in range(0, len(words), 30)]
+
+    def content_words(sentence):
+        return [word for word in re.findall(r"[a-z0-9']+", sentence.lower()) if word not in STOPWORDS]
+
+    frequencies = Counter(word for sentence in sentences for word in content_words(sentence))
+    scores = []
+    for position, sentence in enumerate(sentences):
+        words = content_words(sentence)
+        score = sum(frequencies[word] for word in words) / (len(words) + 1)
+        scores.append((score, position))
+
+    # Budget in characters, matching estimate_tokens, so the joined result stays within it
+    chosen, used, max_chars = set(), 0, token_budget * 4
+    for score, position in sorted(scores, reverse=True):
+        chars = len(sentences[position]) + 1
+        if used + chars > max_chars:
+            continue
+        chosen.add(position)
+        used += chars
+    return " ".join(sentences[position] for position in sorted(chosen))
+
+
+@dataclass
+class PreprocessStats:
+    """Token counts before and after pre-processing, plus the count after each step"""
+    tokens_before: int = 0
+    tokens_after: int = 0
+    steps: List[Tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def reduction(self) -> float:
+        if not self.tokens_before:
+            return 0.0
+        return 1 - self.tokens_after / self.tokens_before
+
+
+class PreprocessingPipeline:
+    """Ordered text-cleaning steps applied to every document between loading and summarizing"""
+
+    def __init__(self, steps: List[Tuple[str, Callable[[str], str]]]):
+        self.steps = steps
+
+    def run(self, docs: List) -> Tuple[List, PreprocessStats]:
+        """Return cleaned copies of the documents and the token statistics"""
+        texts = [doc.page_content for doc in docs]
+        stats = PreprocessStats(tokens_before=sum(estimate_tokens(text) for text in texts))
+        for name, step in self.steps:
+            texts = [step(text) for text in texts]
+            stats.steps.append((name, sum(estimate_tokens(text) for text in texts)))
+        stats.tokens_after = stats.steps[-1][1] if stats.steps else stats.tokens_before
+        cleaned = [type(doc)(page_content=text, metadata=doc.metadata) for doc, text in zip(docs, texts)]
+        return cleaned, stats
+
+
+def default_pipeline(is_youtube: bool, token_budget: Optional[int] = None) -> PreprocessingPipeline:
+    """Caption cleanup for YouTube transcripts, boilerplate stripping for web pages"""
+    if is_youtube:
+        steps = [("remove_fillers", remove_fillers), ("dedupe_captions", dedupe_caption_segments)]
+    else:
+        steps = [("strip_boilerplate", strip_boilerplate)]
+    steps.append(("normalize_whitespace", normalize_whitespace))
+    if token_budget:
+        steps.append(("select_sentences", lambda text: select_sentences(text, token_budget)))
+    return PreprocessingPipeline(steps)
@@ -0,0 +1,215 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from cache import extract_video_id, make_cache_key, normalize_url
+from generation_budget import budget_for_model
+from pipeline import build_prompt, build_prompt_template, preprocess_documents
+from tracing import Trace, propagate
+
+
+CHUNK_SECONDS = 60
+WINDOW_SECONDS = 600
+SEGMENT_WORDS = 80
+CHAPTER_PATTERN = re.compile(r"^\s*\(?((?:\d{1,2}:)?\d{1,2}:\d{2})\)?\s*[-–—:|]?\s*(.+?)\s*$")
+
+
+@dataclass
+class Segment:
+    """A chapter or fixed time window of a video"""
+    start_seconds: int
+    end_seconds: int
+    title: Optional[str]
+    text: str
+
+
+@dataclass
+class SegmentSummary:
+    start_seconds: int
+    end_seconds: int
+    title: Optional[str]
+    summary_text: str
+    cached: bool
+
+    @property
+    def label(self) -> str:
+        return f"{format_timestamp(self.start_seconds)}–{format_timestamp(self.end_seconds)}"
+
+
+def parse_timestamp(value: str) -> int:
+    """Seconds from "h:mm:ss" or "m:ss" """
+    seconds = 0
+    for part in value.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def format_timestamp(seconds: int) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def parse_time_range(text: str) -> Optional[Tuple[int, Optional[int]]]:
+    """Parse a range like "minutes 40-60", "40–60 min", "1:05:00-1:20:00" or "90-" into seconds.
+
+    Bare numbers are minutes; an open end means "to the end of the video".
+    Returns None for an empty range and raises ValueError when it cannot be parsed.
+    """
+    cleaned = re.sub(r"\b(?:from|only)\b|(?:minutes?|mins?|m)\b", " ", text.strip().lower()).strip()
+    if not cleaned:
+        return None
+    parts = re.split(r"\s*(?:-|–|—|\bto\b)\s*", cleaned)
+    if len(parts) != 2 or not parts[0]:
+        raise ValueError(f"Could not understand the time range {text!r}; try e.g. 'minutes 40-60'")
+
+    def to_seconds(part: str) -> int:
+        if ":" in part:
+            return parse_timestamp(part)
+        return int(float(part) * 60)
+
+    try:
+        start = to_seconds(parts[0])
+        end = to_seconds(parts[1]) if parts[1] else None
+    except ValueError:
+        raise ValueError(f"Could not understand the time range {text!r}; try e.g. 'minutes 40-60'")
+    if end is not None and end <= start:
+        raise ValueError("The end of the time range must be after its start")
+    return start, end
+
+
+def parse_chapters(description: Optional[str]) -> List[Tuple[int, str]]:
+    """Chapters from a video description ("0:00 Intro" lines), following YouTube's rules:
+    at least three, starting at 0:00, in increasing order. Returns [] otherwise.
+    """
+    chapters = []
+    for line in (description or "").splitlines():
+        match = CHAPTER_PATTERN.match(line)
+        if match:
+            chapters.append((parse_timestamp(match.group(1)), match.group(2)))
+    if len(chapters) < 3 or chapters[0][0] != 0:
+        return []
+    if any(later[0] <= earlier[0] for earlier, later in zip(chapters, chapters[1:])):
+        return []
+    return chapters
+
+
+def fetch_timed_documents(url: str, chunk_seconds: int = CHUNK_SECONDS) -> List:
+    """Load a YouTube transcript as documents of chunk_seconds each, with start_seconds metadata"""
+    from langchain_community.document_loaders import YoutubeLoader
+    from langchain_community.document_loaders.youtube import TranscriptFormat
+    loader = YoutubeLoader.from_youtube_url(url, add_video_info=True,
+                                            transcript_format=TranscriptFormat.CHUNKS,
+                                            chunk_size_seconds=chunk_seconds)
+    return loader.load()
+
+
+def build_segments(docs: List, chapters: List[Tuple[int, str]], window_seconds: int = WINDOW_SECONDS,
+                   chunk_seconds: int = CHUNK_SECONDS) -> List[Segment]:
+    """Group timed transcript chunks into chapters, or into fixed windows when there are none"""
+    if not docs:
+        return []
+    docs = sorted(docs, key=lambda doc: doc.metadata.get("start_seconds", 0))
+    video_end = docs[-1].metadata.get("start_seconds", 0) + chunk_seconds
+    video_length = docs[0].metadata.get("length")
+    if video_length:
+        video_end = max(video_end, int(video_length))
+
+    if chapters:
+        boundaries = chapters
+    else:
+        boundaries = [(start, None) for start in range(0, video_end, window_seconds)]
+    segments = []
+    for i, (start, title) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else video_end
+        text = " ".join(doc.page_content for doc in docs
+                        if start <= doc.metadata.get("start_seconds", 0) < end)
+        if text.strip():
+            segments.append(Segment(start, end, title, text))
+    return segments
+
+
+def segment_cache_key(url: str, segment: Segment, word_count: int, model_used: str) -> str:
+    """Content-addressed key of one segment summary (changes if the segment's text or time range changes)"""
+    return make_cache_key(url, segment.text, build_prompt_template(word_count), word_count, model_used,
+                          extra={"start_seconds": segment.start_seconds, "end_seconds": segment.end_seconds})
+
+
+def summarize_segments(url: str, llm, model_used: str, db, store=None,
+                       time_range: Optional[Tuple[int, Optional[int]]] = None,
+                       segment_words: int = SEGMENT_WORDS, window_seconds: int = WINDOW_SECONDS,
+                       chunk_seconds: int = CHUNK_SECONDS, max_workers: int = 4,
+                       hf_api_key: str = "") -> List[SegmentSummary]:
+    """Summarize a YouTube video chapter by chapter (or window by window), with timestamps.
+
+    Each segment summary is cached in the segment_summaries table, so
+    re-running, or asking for a different time_range, only calls the LLM
+    for segments that are not cached yet. time_range is (start, end) in
+    seconds; segments overlapping it are included whole.
+    """
+    from summarizer import ChunkedSummarizer
+
+    with Trace() as trace:
+        with trace.stage("load"):
+            if store is None:
+                docs = fetch_timed_documents(url, chunk_seconds)
+            else:
+                docs = store.load(url, lambda u: fetch_timed_documents(u, chunk_seconds),
+                                  variant=f"chunks{chunk_seconds}")
+        with trace.stage("preprocess"):
+            docs, _ = preprocess_documents(url, docs)
+            chapters = parse_chapters(docs[0].metadata.get("description")) if docs else []
+            segments = build_segments(docs, chapters, window_seconds, chunk_seconds)
+        if time_range is not None:
+            start, end = time_range
+            segments = [segment for segment in segments
+                        if segment.end_seconds > start and (end is None or segment.start_seconds < end)]
+
+        with trace.stage("cache_lookup"):
+            keys = [segment_cache_key(url, segment, segment_words, model_used) for segment in segments]
+            cached = db.get_segment_summaries(keys)
+        missing = [(key, segment) for key, segment in zip(keys, segments) if key not in cached]
+        trace.count("segments_cached", len(segments) - len(missing))
+        trace.count("segments_summarized", len(missing))
+
+        if missing:
+            from langchain_core.documents import Document
+            summarizer = ChunkedSummarizer(llm, build_prompt(segment_words), word_count=segment_words,
+                                           budget=budget_for_model(model_used, hf_api_key))
+
+            def summarize(segment):
+                return summarizer.summarize([Document(page_content=segment.text)])
+
+            with trace.stage("summarize"), ThreadPoolExecutor(max_workers=max_workers) as executor:
+                texts = list(executor.map(propagate(summarize), [segment for _, segment in missing]))
+            with trace.stage("save"):
+                video_key = normalize_url(url)
+                db.save_segment_summaries([
+                    {"cache_key": key, "video_key": video_key, "start_seconds": segment.start_seconds,
+                     "end_seconds": segment.end_seconds, "title": segment.title, "summary_text": text}
+                    for (key, segment), text in zip(missing, texts)
+                ])
+            cached.update((key, text) for (key, _), text in zip(missing, texts))
+
+    summarized = {key for key, _ in missing}
+    return [SegmentSummary(segment.start_seconds, segment.end_seconds, segment.title, cached[key],
+                           cached=key not in summarized)
+            for key, segment in zip(keys, segments)]
+
+
+def segment_link(url: str, start_seconds: int) -> str:
+    """Link to a moment in the video"""
+    video_id = extract_video_id(url)
+    return f"https://www.youtube.com/watch?v={video_id}&t={start_seconds}s" if video_id else url
+
+
+def format_segment_summaries(url: str, summaries: List[SegmentSummary]) -> str:
+    """Markdown with one linked timestamp heading per segment"""
+    parts = []
+    for summary in summaries:
+        heading = f"[{summary.label}]({segment_link(url, summary.start_seconds)})"
+        if summary.title:
+            heading += f" {summary.title}"
+        parts.append(f"**{heading}**\n\n{summary.summary_text}")
+    return "\n\n".join(parts)
@@ -0,0 +1,428 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_CHARS = 1000
+MAX_CHUNKS = 256
+# Chunk vector ids are transcript_id * CHUNK_ID_STRIDE + chunk number
+CHUNK_ID_STRIDE = 1000
+# Neighbours looked up per chunk; each transcript is indexed once, so these are distinct transcripts
+DUPLICATE_NEIGHBOURS = 4
+INDEX_NAMES = ("summaries", "transcripts")
+# Change log records: op (a = add, r = remove) and vector count, then the ids (and for adds the vectors)
+LOG_HEADER = struct.Struct("<cI")
+# The log is folded into the .faiss file once it outgrows this, or half the file
+COMPACT_MIN_BYTES = 16 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=2)
+def load_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """Load a sentence-transformers model once per process"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def split_for_embedding(text: str, chunk_chars: int = CHUNK_CHARS, max_chunks: int = MAX_CHUNKS) -> List[str]:
+    """Split text into fixed-size chunks, sampling evenly when there are too many"""
+    chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars) if text[i:i + chunk_chars].strip()]
+    if len(chunks) > max_chunks:
+        step = len(chunks) / max_chunks
+        chunks = [chunks[int(i * step)] for i in range(max_chunks)]
+    return chunks
+
+
+def transcript_hash(transcript: str) -> str:
+    return hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+
+class SemanticIndex:
+    """FAISS embedding indexes over summary texts and transcript chunks.
+
+    Both indexes are stored in a directory next to summaries.db. A transcript
+    is embedded and indexed once, however many summaries (lengths, models)
+    are made from it; transcripts.db maps summaries to their transcript.
+    Saves append to a change log next to each .faiss file, which is folded
+    into it once it grows large, so a save costs the size of the new vectors
+    rather than of the whole index. Several processes (the app, the API
+    server, batch runs) can share the directory: changes hold a lock file,
+    and every call first applies what other processes have logged. If faiss
+    or sentence_transformers are not installed the index reports itself
+    unavailable and every method is a no-op.
+    """
+
+    def __init__(self, db_path: str = "summaries.db", model_name: str = DEFAULT_EMBEDDING_MODEL):
+        self.index_dir = os.path.splitext(db_path)[0] + "_index"
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, object] = {}
+        # Per index: (mtime_ns, size) of the .faiss file it was loaded from, and the log bytes applied
+        self._faiss_versions: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._log_offsets: Dict[str, int] = {}
+        try:
+            import faiss
+            self._faiss = faiss
+            self.available = True
+        except ImportError:
+            self._faiss = None
+            self.available = False
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        model = load_embedding_model(self.model_name)
+        vectors = model.encode(texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype="float32")
+
+    def _path(self, name: str, extension: str = "faiss") -> str:
+        return os.path.join(self.index_dir, f"{name}.{extension}")
+
+    def _faiss_version(self, name: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._path(name))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the index directory, across processes"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, ".lock"), "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def _mapping(self):
+        """Transaction on transcripts.db: transcripts(id, hash, chunks) and summary_transcripts(summary_id, transcript_id)"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        conn = sqlite3.connect(self._path("transcripts", "db"), timeout=30)
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY,
+                    hash TEXT NOT NULL UNIQUE,
+                    chunks INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS summary_transcripts (
+                    summary_id INTEGER PRIMARY KEY,
+                    transcript_id INTEGER NOT NULL REFERENCES transcripts (id)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_summary_transcripts ON summary_transcripts (transcript_id)')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self) -> None:
+        """Bring the in-memory indexes up to date with the files: reload a .faiss file another process
+        rewrote, and apply log records appended since the last call. Call with the file lock held."""
+        self._migrate_legacy_chunks()
+        dimension = None
+        for name in INDEX_NAMES:
+            version = self._faiss_version(name)
+            log_size = os.path.getsize(self._path(name, "log")) if os.path.exists(self._path(name, "log")) else 0
+            if (name not in self._indexes or version != self._faiss_versions[name]
+                    or log_size < self._log_offsets[name]):
+                if version is not None:
+                    self._indexes[name] = self._faiss.read_index(self._path(name))
+                else:
+                    if dimension is None:
+                        dimension = load_embedding_model(self.model_name).get_sentence_embedding_dimension()
+                    self._indexes[name] = self._faiss.IndexIDMap2(self._faiss.IndexFlatIP(dimension))
+                self._faiss_versions[name] = version
+                self._log_offsets[name] = 0
+            if log_size > self._log_offsets[name]:
+                self._replay(name)
+
+    def _replay(self, name: str) -> None:
+        """Apply the complete log records past this index's offset (a record still being written is left)"""
+        index = self._indexes[name]
+        with open(self._path(name, "log"), "rb") as log:
+            log.seek(self._log_offsets[name])
+            data = log.read()
+        position = 0
+        while position + LOG_HEADER.size <= len(data):
+            op, count = LOG_HEADER.unpack_from(data, position)
+            size = LOG_HEADER.size + count * 8 + (count * index.d * 4 if op == b"a" else 0)
+            if position + size > len(data):
+                break
+            ids = np.frombuffer(data, dtype="<i8", count=count, offset=position + LOG_HEADER.size).astype("int64")
+            if op == b"a":
+                vectors = np.frombuffer(data, dtype="<f4", count=count * index.d,
+                                        offset=position + LOG_HEADER.size + count * 8).reshape(count, index.d)
+                index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), ids)
+            else:
+                index.remove_ids(ids)
+            position += size
+        self._log_offsets[name] += position
+
+    def _write(self, name: str, ids: np.ndarray, vectors: Optional[np.ndarray] = None) -> None:
+        """Add (with vectors) or remove ids: apply to memory and append to the log. Call after _load, with the file lock held."""
+        if len(ids) == 0:
+            return
+        ids = np.asarray(ids, dtype="int64")
+        index = self._indexes[name]
+        record = LOG_HEADER.pack(b"a" if vectors is not None else b"r", len(ids)) + ids.astype("<i8").tobytes()
+        if vectors is not None:
+            record += np.asarray(vectors, dtype="<f4").tobytes()
+            index.add_with_ids(vectors, ids)
+        else:
+            index.remove_ids(ids)
+        with open(self._path(name, "log"), "ab") as log:
+            log.write(record)
+        self._log_offsets[name] += len(record)
+        faiss_size = self._faiss_versions[name][1] if self._faiss_versions[name] else 0
+        if self._log_offsets[name] > max(COMPACT_MIN_BYTES, faiss_size // 2):
+            self._compact(name)
+
+    def _compact(self, name: str) -> None:
+        """Fold the log into the .faiss file"""
+        tmp_path = self._path(name) + ".tmp"
+        self._faiss.write_index(self._indexes[name], tmp_path)
+        os.replace(tmp_path, self._path(name))
+        open(self._path(name, "log"), "wb").close()
+        self._faiss_versions[name] = self._faiss_version(name)
+        self._log_offsets[name] = 0
+
+    def _migrate_legacy_chunks(self) -> None:
+        """Move a chunks.faiss keyed by summary id (one copy per summary) to per-transcript ids"""
+        legacy_path = self._path("chunks")
+        if not os.path.exists(legacy_path):
+            return
+        if self._faiss_version("transcripts") is None:
+            legacy = self._faiss.read_index(legacy_path)
+            ids = self._faiss.vector_to_array(legacy.id_map).astype("int64")
+            vectors = legacy.index.reconstruct_n(0, legacy.ntotal)
+            index = self._faiss.IndexIDMap2(self._faiss.IndexFlatIP(legacy.d))
+            new_ids = np.empty_like(ids)
+            with self._mapping() as conn:
+                # The old layout has no transcript text to hash; each summary keeps its own copy
+                for summary_id in np.unique(ids // CHUNK_ID_STRIDE):
+                    mask = ids // CHUNK_ID_STRIDE == summary_id
+                    cursor = conn.execute('INSERT OR IGNORE INTO transcripts (hash, chunks) VALUES (?, ?)',
+                                          (f"summary:{summary_id}", int(mask.sum())))
+                    transcript_id = cursor.lastrowid
+                    conn.execute('INSERT OR REPLACE INTO summary_transcripts (summary_id, transcript_id) VALUES (?, ?)',
+                                 (int(summary_id), transcript_id))
+                    new_ids[mask] = transcript_id * CHUNK_ID_STRIDE + ids[mask] % CHUNK_ID_STRIDE
+            if len(ids):
+                index.add_with_ids(vectors, new_ids)
+            tmp_path = self._path("transcripts") + ".tmp"
+            self._faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, self._path("transcripts"))
+        os.remove(legacy_path)
+
+    @staticmethod
+    def _summaries_of(conn, transcript_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """{transcript_id: [summary_id, ...] newest first}"""
+        transcript_ids = list(transcript_ids)
+        summaries = {}
+        for start in range(0, len(transcript_ids), 500):
+            batch = transcript_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            for summary_id, transcript_id in conn.execute(
+                    f'SELECT summary_id, transcript_id FROM summary_transcripts WHERE transcript_id IN ({placeholders}) '
+                    f'ORDER BY summary_id DESC', batch):
+                summaries.setdefault(transcript_id, []).append(summary_id)
+        return summaries
+
+    def add(self, summary_id: int, summary_text: str, transcript: str = "") -> bool:
+        """Index a saved summary and, when given, the transcript it was made from"""
+        return self.add_many([(summary_id, summary_text, transcript)]) > 0
+
+    def add_many(self, summaries: List[Tuple[int, str, str]]) -> int:
+        """Index (summary_id, summary_text, transcript) tuples in one update, returning how many were indexed.
+
+        Transcripts already in the index (other lengths or models of the same
+        content) are only linked, not embedded again.
+        """
+        summaries = [summary for summary in summaries if summary[0] is not None]
+        if not self.available or not summaries:
+            return 0
+        try:
+            summary_vectors = self._embed([summary_text for _, summary_text, _ in summaries])
+            hashes = {transcript_hash(transcript): transcript for _, _, transcript in summaries if transcript.strip()}
+            with self._mapping() as conn:
+                known = {digest for digest in hashes
+                         if conn.execute('SELECT 1 FROM transcripts WHERE hash = ?', (digest,)).fetchone()}
+            # Embed new transcripts before taking the lock; another process may still add one first
+            new_chunks = {}
+            for digest, transcript in hashes.items():
+                if digest not in known:
+                    chunks = split_for_embedding(transcript)
+                    if chunks:
+                        new_chunks[digest] = self._embed(chunks)
+            with self._lock, self._file_lock(), self._mapping() as conn:
+                self._load()
+                self._write("summaries", np.array([summary[0] for summary in summaries], dtype="int64"),
+                            summary_vectors)
+                transcript_ids = {}
+                for digest in hashes:
+                    row = conn.execute('SELECT id FROM transcripts WHERE hash = ?', (digest,)).fetchone()
+                    if row is None and digest in new_chunks:
+                        vectors = new_chunks[digest]
+                        transcript_id = conn.execute('INSERT INTO transcripts (hash, chunks) VALUES (?, ?)',
+                                                     (digest, len(vectors))).lastrowid
+                        ids = np.arange(len(vectors), dtype="int64") + transcript_id * CHUNK_ID_STRIDE
+                        self._write("transcripts", ids, vectors)
+                        row = (transcript_id,)
+                    if row is not None:
+                        transcript_ids[digest] = row[0]
+                conn.executemany('INSERT OR REPLACE INTO summary_transcripts (summary_id, transcript_id) VALUES (?, ?)',
+                                 [(summary_id, transcript_ids[transcript_hash(transcript)])
+                                  for summary_id, _, transcript in summaries
+                                  if transcript.strip() and transcript_hash(transcript) in transcript_ids])
+            return len(summaries)
+        except Exception as e:
+            logger.error("Error updating semantic index: %s", e)
+            return 0
+
+    def remove(self, summary_ids: List[int]) -> None:
+        """Drop the vectors of deleted summaries, and of transcripts no summary uses any more"""
+        if not self.available or not summary_ids:
+            return
+        try:
+            summary_ids = [int(summary_id) for summary_id in summary_ids]
+            with self._lock, self._file_lock(), self._mapping() as conn:
+                self._load()
+                self._write("summaries", np.array(summary_ids, dtype="int64"))
+                orphans = []
+                for start in range(0, len(summary_ids), 500):
+                    batch = summary_ids[start:start + 500]
+                    placeholders = ", ".join("?" * len(batch))
+                    transcript_ids = [row[0] for row in conn.execute(
+                        f'SELECT DISTINCT transcript_id FROM summary_transcripts WHERE summary_id IN ({placeholders})',
+                        batch)]
+                    conn.execute(f'DELETE FROM summary_transcripts WHERE summary_id IN ({placeholders})', batch)
+                    orphans.extend(transcript_id for transcript_id in transcript_ids if conn.execute(
+                        'SELECT 1 FROM summary_transcripts WHERE transcript_id = ? LIMIT 1', (transcript_id,)
+                    ).fetchone() is None)
+                chunk_ids = []
+                for transcript_id in orphans:
+                    chunks = conn.execute('SELECT chunks FROM transcripts WHERE id = ?', (transcript_id,)).fetchone()[0]
+                    chunk_ids.append(np.arange(chunks, dtype="int64") + transcript_id * CHUNK_ID_STRIDE)
+                    conn.execute('DELETE FROM transcripts WHERE id = ?', (transcript_id,))
+                if chunk_ids:
+                    self._write("transcripts", np.concatenate(chunk_ids))
+        except Exception as e:
+            logger.error("Error updating semantic index: %s", e)
+
+    def clear(self) -> None:
+        """Drop every vector (used when the history is cleared)"""
+        if not self.available:
+            return
+        with self._lock, self._file_lock():
+            self._indexes, self._faiss_versions, self._log_offsets = {}, {}, {}
+            paths = [self._path(name, extension) for name in INDEX_NAMES for extension in ("faiss", "log")]
+            for path in paths + [self._path("chunks"), self._path("transcripts", "db")]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """Semantic search over summaries and transcripts, returning (summary_id, score) best first"""
+        if not self.available or not query.strip():
+            return []
+        try:
+            query_vector = self._embed([query])
+            with self._lock, self._file_lock():
+                self._load()
+                results = {}
+                for name in INDEX_NAMES:
+                    index = self._indexes[name]
+                    if index.ntotal == 0:
+                        results[name] = ([], [])
+                        continue
+                    distances, ids = index.search(query_vector, min(k * 3, index.ntotal))
+                    results[name] = (distances[0], ids[0])
+            scores = {}
+            for score, summary_id in zip(*results["summaries"]):
+                if summary_id >= 0:
+                    scores[int(summary_id)] = max(scores.get(int(summary_id), -1.0), float(score))
+            transcript_scores = {}
+            for score, vector_id in zip(*results["transcripts"]):
+                if vector_id >= 0:
+                    transcript_id = int(vector_id // CHUNK_ID_STRIDE)
+                    transcript_scores[transcript_id] = max(transcript_scores.get(transcript_id, -1.0), float(score))
+            if transcript_scores:
+                with self._mapping() as conn:
+                    for transcript_id, summary_ids in self._summaries_of(conn, transcript_scores).items():
+                        for summary_id in summary_ids:
+                            scores[summary_id] = max(scores.get(summary_id, -1.0), transcript_scores[transcript_id])
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        except Exception as e:
+            logger.error("Error searching semantic index: %s", e)
+            return []
+
+    def find_near_duplicates(self, transcript: str, min_similarity: float = 0.95, min_coverage: float = 0.9,
+                             k: int = DUPLICATE_NEIGHBOURS) -> List[int]:
+        """Find summaries whose transcript is nearly identical (re-uploads, mirrors).
+
+        Returns the ids of every summary made from a transcript for which at
+        least min_coverage of the new transcript's chunks match one of its
+        chunks with cosine similarity >= min_similarity, best coverage first
+        (an identical transcript is found by its hash, without embedding anything). A
+        transcript summarized at several lengths or with several models
+        yields one id per summary; the caller picks the one it can use.
+        """
+        if not self.available or not transcript.strip():
+            return []
+        try:
+            with self._mapping() as conn:
+                row = conn.execute('SELECT id FROM transcripts WHERE hash = ?', (transcript_hash(transcript),)).fetchone()
+                exact = self._summaries_of(conn, [row[0]]).get(row[0], []) if row else []
+            if exact:
+                return exact
+            chunks = split_for_embedding(transcript)
+            chunk_vectors = self._embed(chunks)
+            with self._lock, self._file_lock():
+                self._load()
+                index = self._indexes["transcripts"]
+                if index.ntotal == 0:
+                    return []
+                distances, ids = index.search(chunk_vectors, min(k, index.ntotal))
+            matches = {}
+            for chunk_distances, chunk_ids in zip(distances, ids):
+                # Each new chunk counts once per transcript, however many of its chunks it matches
+                matched = {int(vector_id // CHUNK_ID_STRIDE) for score, vector_id in zip(chunk_distances, chunk_ids)
+                           if vector_id >= 0 and score >= min_similarity}
+                for transcript_id in matched:
+                    matches[transcript_id] = matches.get(transcript_id, 0) + 1
+            ranked = [transcript_id for transcript_id, matched in sorted(matches.items(), key=lambda item: item[1],
+                                                                       reverse=True)
+                      if matched / len(chunks) >= min_coverage]
+            with self._mapping() as conn:
+                summaries = self._summaries_of(conn, ranked)
+            return [summary_id for transcript_id in ranked for summary_id in summaries.get(transcript_id, [])]
+        except Exception as e:
+            logger.error("Error checking for near-duplicate transcripts: %s", e)
+            return []
@@ -0,0 +1,360 @@
+"""Headless HTTP API for the summarizer and the summary history.
+
+Run with:
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /summarize            summarize a URL (NDJSON stream, or one JSON body with "stream": false)
+    GET  /summaries            history page, BM25 search with ?q= or every summary of ?url=
+    GET  /summaries/{id}       one summary
+    GET  /export/{format}      streamed export (md, json, ndjson, csv; ?compress=true for gzip)
+    GET  /metrics              Prometheus metrics
+    GET  /healthz              liveness check
+
+LLM credentials come from the X-HF-Token / X-Groq-Key headers, falling back to
+the HF_API_TOKEN / GROQ_API_KEY environment variables; the offline repo_ids
+"local/extractive" and "local/distilbart" need neither. Identical summarize
+requests with the same credentials that arrive while one is already running
+share that run (and its single set of LLM calls) instead of starting another.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from cache import SummaryCache, normalize_url
+from database import SUMMARY_LIST_COLUMNS, ExportManager, SummaryDatabase
+from document_store import DocumentStore
+from pipeline import (DEFAULT_REPO_ID, LENGTH_CATEGORIES, LOCAL_BACKENDS, summarize_url,
+                      validate_and_fix_url, validate_word_count)
+from tracing import METRICS
+
+
+SUMMARY_LIST_FIELDS = SUMMARY_LIST_COLUMNS.split(", ")
+DB_PATH = os.getenv("SUMMARIES_DB", "summaries.db")
+WORKERS = int(os.getenv("SERVER_WORKERS", "8"))
+# Exports run on their own threads so long downloads cannot take every summarize worker
+EXPORT_WORKERS = int(os.getenv("SERVER_EXPORT_WORKERS", "2"))
+
+
+class SummarizeRequest(BaseModel):
+    url: str
+    length: str = Field("Medium", description="Short, Medium, Long or Custom")
+    word_count: Optional[int] = Field(None, description="Target words when length is Custom")
+    token_budget: Optional[int] = Field(None, description="Trim the cleaned transcript to this many tokens")
+    repo_id: str = DEFAULT_REPO_ID
+    stream: bool = True
+
+
+class SummaryBroadcast:
+    """One in-flight summary whose chunks are replayed to every request waiting on it.
+
+    Chunks are published from the worker thread through the event loop, so
+    all state is only touched on the loop thread.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.chunks: List[str] = []
+        self.result: Optional[Tuple[Optional[int], str]] = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str) -> None:
+        """Thread-safe: add a chunk"""
+        self.loop.call_soon_threadsafe(self._publish, chunk)
+
+    def _publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, result=None, error: Optional[BaseException] = None) -> None:
+        self.result, self.error, self.done = result, error, True
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Yield every chunk from the start, then new ones until the summary finishes"""
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+def credentials_key(hf_api_key: str, groq_api_key: str, repo_id: str) -> str:
+    """Identity of the credentials paying for a run, so a request only joins runs made with its own.
+
+    Local backends use none, so any request may share their runs.
+    """
+    if repo_id in LOCAL_BACKENDS:
+        return ""
+    return hashlib.sha256(f"{hf_api_key}\0{groq_api_key}".encode("utf-8")).hexdigest()
+
+
+class SummaryService:
+    """Shared database, caches and routers, plus the table of in-flight summaries"""
+
+    def __init__(self, db_path: str = DB_PATH, workers: int = WORKERS, export_workers: int = EXPORT_WORKERS):
+        self.db = SummaryDatabase(db_path)
+        self.cache = SummaryCache(self.db)
+        self.store = DocumentStore(self.db)
+        self.index = None
+        try:
+            from semantic_index import SemanticIndex
+            self.index = SemanticIndex(db_path)
+        except ImportError:
+            pass
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarize")
+        self.export_executor = ThreadPoolExecutor(max_workers=export_workers, thread_name_prefix="export")
+        self._routers = {}
+        self._routers_lock = threading.Lock()
+        self._inflight: Dict[Tuple, SummaryBroadcast] = {}
+
+    def get_router(self, hf_api_key: str, groq_api_key: str, repo_id: str):
+        """Router per credential set, reused so its latency stats accumulate"""
+        from llm_router import build_router
+        key = (hf_api_key, groq_api_key, repo_id)
+        with self._routers_lock:
+            if key not in self._routers:
+                hedge_after = 8.0 if hf_api_key.strip() and groq_api_key.strip() else None
+                self._routers[key] = build_router(hf_api_key, repo_id, groq_api_key, hedge_after=hedge_after)
+            return self._routers[key]
+
+    def summarize(self, url: str, word_count: int, summary_length: str, token_budget: Optional[int],
+                  repo_id: str, hf_api_key: str, groq_api_key: str) -> Tuple[SummaryBroadcast, bool]:
+        """Start a summary, or join the identical one already running.
+
+        Returns (broadcast, coalesced). Must be called on the event loop thread.
+        """
+        key = (normalize_url(url), word_count, summary_length, token_budget, repo_id,
+               credentials_key(hf_api_key, groq_api_key, repo_id))
+        broadcast = self._inflight.get(key)
+        if broadcast is not None:
+            return broadcast, True
+
+        loop = asyncio.get_running_loop()
+        broadcast = self._inflight[key] = SummaryBroadcast(loop)
+        llm = self.get_router(hf_api_key, groq_api_key, repo_id)
+
+        def run():
+            return summarize_url(url, llm, word_count, summary_length, repo_id, self.db,
+                                 cache=self.cache, store=self.store, index=self.index,
+                                 token_budget=token_budget, on_chunk=broadcast.publish, hf_api_key=hf_api_key)
+
+        def finished(future):
+            # Scheduled on the loop after every chunk the worker published, so nothing is lost
+            self._inflight.pop(key, None)
+            error = future.exception()
+            broadcast.finish(None if error else future.result(), error)
+
+        future = loop.run_in_executor(self.executor, run)
+        future.add_done_callback(finished)
+        return broadcast, False
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct summaries currently running"""
+        return len(self._inflight)
+
+    def run_in_thread(self, produce: Callable[[], Iterator[str]], max_buffered: int = 64) -> AsyncIterator[str]:
+        """Run a blocking generator on one export worker thread and stream its items.
+
+        SummaryDatabase connections are per thread, so a cursor must be
+        iterated on the thread that opened it.
+        """
+        buffer = queue.Queue(maxsize=max_buffered)
+        done = object()
+        idle = object()
+        # Set when the client goes away, so a blocked worker gives up instead of leaking
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            while not stopped.is_set():
+                try:
+                    buffer.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def worker():
+            try:
+                for item in produce():
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        def get():
+            # Timed, so the thread waiting here is released soon after a client disconnects
+            try:
+                return buffer.get(timeout=1)
+            except queue.Empty:
+                return idle
+
+        self.export_executor.submit(worker)
+
+        async def items():
+            try:
+                while True:
+                    item = await asyncio.to_thread(get)
+                    if item is idle:
+                        continue
+                    if item is done:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stopped.set()
+        return items()
+
+
+app = FastAPI(title="YouTube Video Summarizer API")
+service = SummaryService()
+
+
+def resolve_word_count(request: SummarizeRequest) -> Tuple[int, str]:
+    """(word_count, summary_length label) for a request's length setting"""
+    if request.length.lower() == "custom":
+        if request.word_count is None:
+            raise HTTPException(422, "word_count is required when length is Custom")
+        return validate_word_count(request.word_count), "Custom"
+    for name, word_count in LENGTH_CATEGORIES.items():
+        if name.lower().startswith(request.length.lower()):
+            return word_count, name
+    raise HTTPException(422, f"Unknown length: {request.length}")
+
+
+@app.post("/summarize")
+async def summarize(request: SummarizeRequest, x_hf_token: Optional[str] = Header(None),
+                    x_groq_key: Optional[str] = Header(None)):
+    hf_api_key = x_hf_token or os.getenv("HF_API_TOKEN", "")
+    groq_api_key = x_groq_key or os.getenv("GROQ_API_KEY", "")
+    if request.repo_id not in LOCAL_BACKENDS and not (hf_api_key.strip() or groq_api_key.strip()):
+        raise HTTPException(401, "Provide X-HF-Token or X-Groq-Key (or set HF_API_TOKEN / GROQ_API_KEY)")
+    url, error_message = validate_and_fix_url(request.url)
+    if error_message:
+        raise HTTPException(422, error_message)
+    word_count, summary_length = resolve_word_count(request)
+
+    broadcast, coalesced = service.summarize(url, word_count, summary_length, request.token_budget,
+                                             request.repo_id, hf_api_key, groq_api_key)
+
+    if not request.stream:
+        try:
+            async for _ in broadcast.subscribe():
+                pass
+        except Exception as e:
+            raise HTTPException(502, f"Summarization failed: {e}")
+        summary_id, summary_text = broadcast.result
+        return {"url": url, "summary_id": summary_id, "summary": summary_text,
+                "summary_length": summary_length, "coalesced": coalesced}
+
+    async def events():
+        # NDJSON: {"type": "chunk"} lines as text arrives, then one "done" or "error" line
+        try:
+            async for chunk in broadcast.subscribe():
+                yield json.dumps({"type": "chunk", "text": chunk}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        summary_id, _ = broadcast.result
+        yield json.dumps({"type": "done", "url": url, "summary_id": summary_id,
+                          "summary_length": summary_length, "coalesced": coalesced}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.get("/summaries")
+async def list_summaries(q: Optional[str] = None, url: Optional[str] = None,
+                         limit: int = Query(20, ge=1, le=500),
+                         after_created_at: Optional[str] = None, after_id: Optional[int] = None):
+    """History page (keyset: pass the last row's created_at and id), ranked search with q,
+    or the summaries of one video or page with url (any URL form)
+    """
+    if url:
+        rows = await asyncio.to_thread(service.db.get_summaries_for_url, url, limit)
+        return {"items": [dict(zip(SUMMARY_LIST_FIELDS, row)) for row in rows]}
+    if q:
+        results = await asyncio.to_thread(service.db.search_summaries_with_snippets, q, limit)
+        items = []
+        for row, snippet in results:
+            # Full rows: drop summary_text to match the list columns
+            item = dict(zip(SUMMARY_LIST_FIELDS, row[:3] + row[4:]))
+            item["snippet"] = snippet
+            items.append(item)
+        return {"items": items}
+
+    after = (after_created_at, after_id) if after_created_at is not None and after_id is not None else None
+    rows = await asyncio.to_thread(service.db.get_summaries_page, limit, after)
+    items = [dict(zip(SUMMARY_LIST_FIELDS, row)) for row in rows]
+    next_cursor = {"after_created_at": rows[-1][6], "after_id": rows[-1][0]} if len(rows) == limit else None
+    return {"items": items, "next": next_cursor}
+
+
+@app.get("/summaries/{summary_id}")
+async def get_summary(summary_id: int):
+    summary = await asyncio.to_thread(service.db.get_summary_by_id, summary_id)
+    if summary is None:
+        raise HTTPException(404, "Summary not found")
+    return ExportManager.summary_to_dict(summary)
+
+
+@app.get("/export/{format_type}")
+async def export(format_type: str, compress: bool = False):
+    if format_type not in ExportManager.FORMATS:
+        raise HTTPException(404, f"Unsupported export format: {format_type}")
+    extension, mime_type = ExportManager.FORMATS[format_type]
+    filename = f"youtube_summaries.{extension}"
+
+    def produce() -> Iterator[bytes]:
+        total = service.db.get_summary_count()
+        chunks = ExportManager.iter_export(format_type, service.db.iter_summaries(), total)
+        if not compress:
+            for chunk in chunks:
+                yield chunk.encode("utf-8")
+            return
+        gzip_stream = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = gzip_stream.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield gzip_stream.flush()
+
+    if compress:
+        filename += ".gz"
+        mime_type = "application/gzip"
+    return StreamingResponse(service.run_in_thread(produce), media_type=mime_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/healthz")
+async def healthz():
+    return JSONResponse({"status": "ok", "in_flight": service.in_flight})
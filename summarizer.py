@@ -0,0 +1,229 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from generation_budget import GenerationBudget, estimate_tokens
+from tracing import current_trace, propagate, record_llm_call
+
+
+MAP_PROMPT = PromptTemplate(template="""
+Write a concise summary of the following part of a longer piece of content.
+Keep every key point, name and number:
+
+Content: {text}
+
+Summary:
+""", input_variables=["text"])
+
+COMBINE_PROMPT = PromptTemplate(template="""
+The following are summaries of consecutive parts of a longer piece of content.
+Merge them into a single concise summary that keeps every key point:
+
+Summaries: {text}
+
+Summary:
+""", input_variables=["text"])
+
+REFINE_PROMPT = PromptTemplate(template="""
+Here is an existing summary of the first part of some content:
+
+{existing_summary}
+
+Refine the summary using the next part of the content below. Keep the same
+length and structure, and only add information that is important:
+
+Content: {text}
+
+Refined summary:
+""", input_variables=["existing_summary", "text"])
+
+
+def llm_text(result) -> str:
+    """Normalize an LLM result (plain string or chat message) to text"""
+    return getattr(result, "content", result).strip()
+
+
+class ChunkedSummarizer:
+    """Summarize documents with stuff, refine or map-reduce depending on their size.
+
+    word_count is the target length of prompt; with it, calls that write the
+    summary get a matching max_new_tokens (see generation_budget), while
+    intermediate map and combine calls get a fixed one.
+    """
+
+    def __init__(self, llm, prompt: PromptTemplate, context_tokens: int = 6000,
+                 chunk_tokens: int = 2000, chunk_overlap_tokens: int = 100,
+                 max_workers: int = 4, refine_max_contexts: int = 2,
+                 word_count: Optional[int] = None, budget: Optional[GenerationBudget] = None):
+        self.llm = llm
+        self.prompt = prompt
+        self.word_count = word_count
+        self.budget = budget or GenerationBudget()
+        # Small local models declare their own (much smaller) input window
+        llm_context = getattr(llm, "context_tokens", None)
+        if llm_context:
+            context_tokens = min(context_tokens, llm_context)
+            # Refine prompts carry the existing summary next to the chunk
+            chunk_tokens = min(chunk_tokens, llm_context // 2)
+        self.context_tokens = context_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.refine_max_contexts = refine_max_contexts
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_tokens * 4,
+            chunk_overlap=chunk_overlap_tokens * 4
+        )
+        # Per-thread, so one summarizer can be shared by concurrent sessions
+        self._local = threading.local()
+
+    @property
+    def last_strategy(self):
+        """Strategy used by the calling thread's most recent summary"""
+        return getattr(self._local, "last_strategy", None)
+
+    @property
+    def last_intermediate(self) -> Optional[str]:
+        """Merged chunk summaries from the calling thread's most recent map-reduce, if any"""
+        return getattr(self._local, "last_intermediate", None)
+
+    def choose_strategy(self, total_tokens: int) -> str:
+        """Pick a strategy from the input's estimated token count.
+
+        Up to context_tokens is "stuff" (one prompt), up to refine_max_contexts
+        times that is "refine" (a few sequential chunks), anything longer is
+        "map_reduce".
+        """
+        if total_tokens <= self.context_tokens:
+            return "stuff"
+        if total_tokens <= self.refine_max_contexts * self.context_tokens:
+            return "refine"
+        return "map_reduce"
+
+    def summarize(self, docs, intermediate: Optional[str] = None) -> str:
+        """Summarize a list of LangChain documents.
+
+        Pass a cached intermediate (see build_intermediate) to skip straight
+        to the final call.
+        """
+        prompt, kwargs = self._prepare_final_step(docs, intermediate)
+        return self._call(prompt, self.word_count, **kwargs)
+
+    def stream(self, docs, intermediate: Optional[str] = None) -> Iterator[str]:
+        """Summarize documents, yielding the final summary token by token.
+
+        Map and intermediate reduce/refine steps run before the first token;
+        only the final LLM call is streamed. With early stopping, the stream is
+        closed (ending generation) once the target length ends a sentence.
+        """
+        prompt, kwargs = self._prepare_final_step(docs, intermediate)
+        text, max_new_tokens, input_tokens = self.budget.fit(prompt, kwargs, self.word_count)
+        output = []
+        chunks = self.llm.stream(text, max_new_tokens=max_new_tokens)
+        for chunk in chunks:
+            output.append(getattr(chunk, "content", chunk))
+            yield output[-1]
+            if self.budget.reached(output, self.word_count):
+                # Closing the generator closes the provider's response, so it stops generating
+                getattr(chunks, "close", lambda: None)()
+                trace = current_trace()
+                if trace is not None:
+                    trace.count("early_stops")
+                break
+        record_llm_call(input_tokens, self.budget.count_tokens("".join(output)), max_new_tokens)
+
+    def build_intermediate(self, docs) -> str:
+        """Condense documents into a length-independent text that fits one prompt.
+
+        Input that already fits the context is returned as is; longer input is
+        mapped and reduced chunk by chunk (map-reduce without its final call).
+        Any summary length can then be derived from it with one LLM call.
+        """
+        text = "\n\n".join(doc.page_content for doc in docs)
+        if estimate_tokens(text) <= self.context_tokens:
+            return text
+        return "\n\n".join(self._map_reduce(self.splitter.split_text(text)))
+
+    def summarize_text(self, text: str, prompt: Optional[PromptTemplate] = None,
+                       word_count: Optional[int] = None) -> str:
+        """One LLM call over text that already fits the context (e.g. an intermediate).
+
+        Pass the word_count of a custom prompt so its generation budget matches.
+        """
+        if prompt is None:
+            prompt, word_count = self.prompt, self.word_count
+        return self._call(prompt, word_count, text=text)
+
+    def _prepare_final_step(self, docs, intermediate: Optional[str] = None) -> Tuple[PromptTemplate, Dict[str, str]]:
+        """Run every step except the last LLM call and return that call's prompt and inputs"""
+        self._local.last_intermediate = None
+        if intermediate is not None:
+            self._local.last_strategy = "intermediate"
+            return self.prompt, {"text": intermediate}
+
+        text = "\n\n".join(doc.page_content for doc in docs)
+        chunks = self.splitter.split_text(text) if text else [""]
+        strategy = self._local.last_strategy = self.choose_strategy(estimate_tokens(text))
+
+        if strategy == "stuff" or len(chunks) == 1:
+            return self.prompt, {"text": text}
+        if strategy == "refine":
+            summary = self._refine(chunks[:-1])
+            return REFINE_PROMPT, {"existing_summary": summary, "text": chunks[-1]}
+        intermediate = self._local.last_intermediate = "\n\n".join(self._map_reduce(chunks))
+        return self.prompt, {"text": intermediate}
+
+    def _call(self, prompt: PromptTemplate, word_count: Optional[int] = None, **kwargs) -> str:
+        """One LLM call; word_count sets its generation budget (None for intermediate steps)"""
+        text, max_new_tokens, input_tokens = self.budget.fit(prompt, kwargs, word_count)
+        result = llm_text(self.llm.invoke(text, max_new_tokens=max_new_tokens))
+        record_llm_call(input_tokens, self.budget.count_tokens(result), max_new_tokens)
+        return result
+
+    def _call_many(self, prompt: PromptTemplate, texts: List[str]) -> List[str]:
+        if hasattr(self.llm, "invoke_batch"):
+            # Local models run every chunk through one batched forward pass
+            prompts = [prompt.format(text=text) for text in texts]
+            results = [llm_text(result) for result in self.llm.invoke_batch(prompts)]
+            for text, result in zip(prompts, results):
+                record_llm_call(estimate_tokens(text), estimate_tokens(result))
+            return results
+        # Worker threads add their LLM calls to the caller's trace
+        call = propagate(lambda text: self._call(prompt, text=text))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(call, texts))
+
+    def _refine(self, chunks: List[str]) -> str:
+        # Every step writes a summary of the final length
+        summary = self._call(self.prompt, self.word_count, text=chunks[0])
+        for chunk in chunks[1:]:
+            summary = self._call(REFINE_PROMPT, self.word_count, existing_summary=summary, text=chunk)
+        return summary
+
+    def _map_reduce(self, chunks: List[str]) -> List[str]:
+        """Map every chunk, then tree-reduce until the partial summaries fit one final prompt"""
+        summaries = self._call_many(MAP_PROMPT, chunks)
+
+        # Tree reduce: merge groups that fit the context until one group remains
+        while True:
+            groups = self._group(summaries)
+            if len(groups) == 1:
+                return groups[0]
+            summaries = self._call_many(COMBINE_PROMPT, ["\n\n".join(group) for group in groups])
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        groups, current, current_tokens = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if current and current_tokens + tokens > self.context_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+        groups.append(current)
+        # Always make progress, even if single summaries exceed the budget
+        if len(groups) == len(summaries) and len(groups) > 1:
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        return groups
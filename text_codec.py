@@ -0,0 +1,105 @@
+import threading
+import zlib
+from typing import Callable, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+ZLIB_TAG = b"z"
+ZSTD_TAG = b"Z"
+# Shorter texts are stored as they are; compression would not pay for its header
+MIN_COMPRESS_CHARS = 64
+DICTIONARY_SIZE = 64 * 1024
+
+
+class TextCodec:
+    """Compress text columns for storage: zstd, with a trained dictionary when one is
+    active, or zlib when zstandard is not installed.
+
+    Compressed values are BLOBs that start with a one-byte codec tag. Plain
+    strings (rows written before compression, or short texts) pass through
+    decompress unchanged, so old and new rows can be mixed freely.
+    """
+
+    def __init__(self, level: int = 3, load_dictionary: Optional[Callable[[int], Optional[bytes]]] = None):
+        self.level = level
+        # Called with a dictionary id found in a frame that is not loaded yet (e.g. trained by another process)
+        self.load_dictionary = load_dictionary
+        self.active_dictionary_id = None
+        self._dictionaries = {}
+        self._lock = threading.Lock()
+        # zstd (de)compressor objects are not thread-safe, so each thread keeps its own
+        self._local = threading.local()
+
+    @property
+    def available(self) -> bool:
+        """Whether zstd (and so dictionaries) can be used"""
+        return zstandard is not None
+
+    def add_dictionary(self, data: bytes, active: bool = False) -> int:
+        """Register a trained zstd dictionary and return its id"""
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dictionary_id = dictionary.dict_id()
+        with self._lock:
+            self._dictionaries[dictionary_id] = dictionary
+            if active:
+                self.active_dictionary_id = dictionary_id
+        return dictionary_id
+
+    def compress(self, text: Optional[str]) -> Union[str, bytes, None]:
+        if text is None or len(text) < MIN_COMPRESS_CHARS:
+            return text
+        data = text.encode("utf-8")
+        if zstandard is None:
+            return ZLIB_TAG + zlib.compress(data, 6)
+        return ZSTD_TAG + self._compressor().compress(data)
+
+    def decompress(self, value: Union[str, bytes, None]) -> Optional[str]:
+        if not isinstance(value, bytes):
+            return value
+        tag, payload = value[:1], value[1:]
+        if tag == ZLIB_TAG:
+            return zlib.decompress(payload).decode("utf-8")
+        if tag == ZSTD_TAG:
+            if zstandard is None:
+                raise RuntimeError("Install zstandard to read zstd-compressed text")
+            dictionary_id = zstandard.get_frame_parameters(payload).dict_id
+            return self._decompressor(dictionary_id).decompress(payload).decode("utf-8")
+        raise ValueError(f"Unknown compression tag {tag!r}")
+
+    def _compressor(self):
+        compressors = getattr(self._local, "compressors", None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        dictionary_id = self.active_dictionary_id or 0
+        if dictionary_id not in compressors:
+            dictionary = self._dictionaries.get(dictionary_id)
+            compressors[dictionary_id] = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+        return compressors[dictionary_id]
+
+    def _decompressor(self, dictionary_id: int):
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        if dictionary_id not in decompressors:
+            dictionary = None
+            if dictionary_id:
+                if dictionary_id not in self._dictionaries and self.load_dictionary is not None:
+                    data = self.load_dictionary(dictionary_id)
+                    if data is not None:
+                        self.add_dictionary(data)
+                dictionary = self._dictionaries.get(dictionary_id)
+                if dictionary is None:
+                    raise ValueError(f"Compression dictionary {dictionary_id} is missing")
+            decompressors[dictionary_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressors[dictionary_id]
+
+
+def train_dictionary(samples: List[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """Train a zstd dictionary on sample texts (a few hundred or more work best)"""
+    if zstandard is None:
+        raise RuntimeError("Install zstandard to train compression dictionaries")
+    return zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples]).as_bytes()
@@ -0,0 +1,263 @@
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], label: str):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+
+    def observe(self, value: float, label_value: str) -> None:
+        series = self._series.setdefault(label_value, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total, count) in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, label: Optional[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+
+    def inc(self, amount: float = 1, label_value: str = "") -> None:
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items()):
+            label = f'{{{self.label}="{label_value}"}}' if self.label else ""
+            lines.append(f"{self.name}{label} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram("summarizer_stage_seconds", "Duration of summarize pipeline stages",
+                                       STAGE_BUCKETS, "stage")
+        self.db_query_seconds = Histogram("summarizer_db_query_seconds", "Duration of database calls",
+                                          QUERY_BUCKETS, "query")
+        self.llm_tokens = Counter("summarizer_llm_tokens_total", "Estimated LLM tokens", "direction")
+        self.llm_calls = Counter("summarizer_llm_calls_total", "LLM calls made by the summarizer")
+        self.llm_retries = Counter("summarizer_llm_retries_total", "LLM calls retried or failed over")
+        self.cache_requests = Counter("summarizer_cache_requests_total", "Summary cache lookups", "result")
+        self._metrics = [self.stage_seconds, self.db_query_seconds, self.llm_tokens,
+                         self.llm_calls, self.llm_retries, self.cache_requests]
+
+    def observe(self, histogram: Histogram, value: float, label_value: str) -> None:
+        with self._lock:
+            histogram.observe(value, label_value)
+
+    def inc(self, counter: Counter, amount: float = 1, label_value: str = "") -> None:
+        with self._lock:
+            counter.inc(amount, label_value)
+
+    def render(self) -> str:
+        with self._lock:
+            return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+METRICS = MetricsRegistry()
+_local = threading.local()
+
+
+class Trace:
+    """Per-request record of stage durations, token counts, cache result, retries and DB time.
+
+    Use it as a context manager around one summarize request; while active it
+    is the calling thread's current trace, so the database, cache, router and
+    summarizer add to it without it being passed around.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.db = {}
+        self._lock = threading.Lock()
+        self._start = None
+        self._previous = None
+        self.total_seconds = None
+
+    def __enter__(self) -> "Trace":
+        self._previous = getattr(_local, "trace", None)
+        _local.trace = self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _local.trace = self._previous
+        self.total_seconds = time.perf_counter() - self._start
+        METRICS.observe(METRICS.stage_seconds, self.total_seconds, "total")
+        logger.info("summarize trace %s", json.dumps(self.to_dict()))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage (durations of repeated stages add up)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            METRICS.observe(METRICS.stage_seconds, elapsed, name)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_query(self, name: str, seconds: float) -> None:
+        with self._lock:
+            calls, total = self.db.get(name, (0, 0.0))
+            self.db[name] = (calls + 1, total + seconds)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            total_seconds = self.total_seconds
+            if total_seconds is None and self._start is not None:
+                # Still running: report the time so far
+                total_seconds = time.perf_counter() - self._start
+            return {
+                "total_seconds": total_seconds,
+                "stages": dict(self.stages),
+                "counters": dict(self.counters),
+                "db": {name: {"calls": calls, "seconds": total} for name, (calls, total) in self.db.items()},
+            }
+
+
+def current_trace() -> Optional[Trace]:
+    """The calling thread's active trace, if any"""
+    return getattr(_local, "trace", None)
+
+
+def propagate(function):
+    """Wrap function so it adds to the caller's current trace when run on another thread"""
+    trace = current_trace()
+    if trace is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "trace", None)
+        _local.trace = trace
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.trace = previous
+    return wrapper
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage on the current trace (a no-op context without one)"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def record_llm_call(input_tokens: int, output_tokens: int, max_new_tokens: Optional[int] = None) -> None:
+    METRICS.inc(METRICS.llm_calls)
+    METRICS.inc(METRICS.llm_tokens, input_tokens, "input")
+    METRICS.inc(METRICS.llm_tokens, output_tokens, "output")
+    trace = current_trace()
+    if trace is not None:
+        trace.count("llm_calls")
+        trace.count("input_tokens", input_tokens)
+        trace.count("output_tokens", output_tokens)
+        if max_new_tokens is not None:
+            # Generation budget granted, to compare against output_tokens
+            trace.count("max_new_tokens", max_new_tokens)
+
+
+def record_retry() -> None:
+    METRICS.inc(METRICS.llm_retries)
+    trace = current_trace()
+    if trace is not None:
+        trace.count("llm_retries")
+
+
+def record_cache(hit: bool) -> None:
+    METRICS.inc(METRICS.cache_requests, 1, "hit" if hit else "miss")
+    trace = current_trace()
+    if trace is not None:
+        trace.count("cache_hits" if hit else "cache_misses")
+
+
+def timed_query(method):
+    """Decorator for SummaryDatabase methods: record call duration in metrics and the current trace"""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            METRICS.observe(METRICS.db_query_seconds, elapsed, name)
+            trace = current_trace()
+            if trace is not None:
+                trace.record_query(name, elapsed)
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics request: " + format, *args)
+
+
+def start_metrics_server(port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics in Prometheus format from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server